@@ -0,0 +1,98 @@
+"""
+Benchmark: throughput de embeddings en CPU (chunks/segundo) con torch y ONNX Runtime
+
+Genera chunks sintéticos del tamaño que produce EmbeddingAnalyzer y mide, para
+cada backend (torch, onnx fp32, onnx int8), el tiempo de `encode` por lotes
+tras un calentamiento. Para los backends ONNX informa además de la similitud
+coseno de sus vectores frente a los de torch sobre los mismos chunks.
+
+La primera ejecución exporta el modelo a ONNX en --onnx-dir.
+
+Uso:
+    python -m benchmarks.bench_embedding_backends --chunks 512 --threads 4
+    python -m benchmarks.bench_embedding_backends --backends onnx onnx-int8 --batch-size 32
+"""
+
+import argparse
+import json
+import random
+import time
+
+WORDS = ("contrato cliente proveedor precio servicio plazo pago cláusula entrega garantía "
+         "agreement party notice liability termination payment schedule annex").split()
+
+
+def make_chunks(count: int, words: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(words // 2, words)))
+            for _ in range(count)]
+
+
+def load_backend(name: str, model_name: str, onnx_dir: str, threads: int):
+    if name == "torch":
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.set_num_threads(threads)
+        return SentenceTransformer(model_name, device="cpu")
+    from src.core.onnx_embeddings import load_onnx_model
+    return load_onnx_model(model_name, onnx_dir, quantize=(name == "onnx-int8"),
+                           num_threads=threads, min_cosine=None)
+
+
+def run(backends, model_name: str, onnx_dir: str, chunks: list, batch_size: int,
+        threads: int, repeat: int):
+    from src.core.onnx_embeddings import compare_embeddings
+
+    results = []
+    reference = None
+    for name in backends:
+        model = load_backend(name, model_name, onnx_dir, threads)
+        encode = lambda: model.encode(chunks, batch_size=batch_size,
+                                      convert_to_numpy=True, show_progress_bar=False)
+        encode()  # calentamiento
+
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            vectors = encode()
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+
+        result = {
+            "backend": name,
+            "chunks": len(chunks),
+            "batch_size": batch_size,
+            "threads": threads,
+            "seconds": best,
+            "chunks_per_second": len(chunks) / best
+        }
+        if name == "torch":
+            reference = vectors
+        elif reference is not None:
+            result["vs_torch"] = compare_embeddings(reference, vectors)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--onnx-dir", default="/tmp/pdf_comparator_onnx")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--chunk-words", type=int, default=90)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.chunk_words)
+    print(json.dumps(run(
+        args.backends, args.model, args.onnx_dir, chunks,
+        args.batch_size, args.threads, args.repeat
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
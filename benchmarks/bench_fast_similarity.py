@@ -0,0 +1,82 @@
+"""
+Benchmark: similitud por shingles vectorizados vs. difflib.SequenceMatcher
+
+Genera pares de documentos sintéticos de tamaño creciente (la revisión
+reescribe un porcentaje de las líneas) y mide la ratio de difflib frente
+a la similitud de Jaccard de TextAnalyzer.fast_comparison.
+
+Uso:
+    python -m benchmarks.bench_fast_similarity --words 2000 5000 100000 500000 --edit-rate 0.05
+"""
+
+import argparse
+import difflib
+import json
+import random
+import time
+
+from src.core.fast_similarity import fast_similarity
+
+VOCABULARY = (
+    "contrato cliente proveedor precio servicio plazo pago cláusula entrega "
+    "garantía responsabilidad confidencialidad vigencia rescisión anexo"
+).split()
+
+
+def make_pair(num_words: int, edit_rate: float, seed: int = 11):
+    """Texto base y revisión con un `edit_rate` de líneas reescritas"""
+    rng = random.Random(seed)
+    lines = [
+        " ".join(rng.choice(VOCABULARY) for _ in range(12))
+        for _ in range(max(num_words // 12, 1))
+    ]
+    revised = [
+        " ".join(rng.choice(VOCABULARY) for _ in range(12)) if rng.random() < edit_rate else line
+        for line in lines
+    ]
+    return "\n".join(lines), "\n".join(revised)
+
+
+def run(word_counts, edit_rate: float, skip_difflib_above: int):
+    results = []
+    for num_words in word_counts:
+        text1, text2 = make_pair(num_words, edit_rate)
+
+        start = time.perf_counter()
+        fast = fast_similarity(text1, text2)
+        fast_seconds = time.perf_counter() - start
+
+        difflib_seconds = difflib_ratio = None
+        if num_words <= skip_difflib_above:
+            start = time.perf_counter()
+            difflib_ratio = difflib.SequenceMatcher(None, text1, text2).ratio()
+            difflib_seconds = time.perf_counter() - start
+
+        results.append({
+            "words": num_words,
+            "chars": len(text1) + len(text2),
+            "fast_seconds": fast_seconds,
+            "difflib_seconds": difflib_seconds,
+            "speedup": difflib_seconds / fast_seconds if difflib_seconds else None,
+            "fast_mb_per_second": (len(text1) + len(text2)) / fast_seconds / 1e6,
+            "jaccard": fast["jaccard"],
+            "containment_doc1": fast["containment_doc1"],
+            "copied_passages": fast["num_copied_passages"],
+            "difflib_ratio": difflib_ratio
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, nargs="+", default=[2000, 5000, 100000, 500000])
+    parser.add_argument("--edit-rate", type=float, default=0.05)
+    parser.add_argument("--skip-difflib-above", type=int, default=5000,
+                        help="No ejecutar difflib por encima de este número de palabras")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.words, args.edit_rate, args.skip_difflib_above), indent=2))
+
+
+if __name__ == "__main__":
+    main()
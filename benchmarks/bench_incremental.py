@@ -0,0 +1,84 @@
+"""
+Benchmark: comparación completa vs. incremental por huellas de página
+
+Genera un documento sintético de N páginas y una revisión con unas pocas
+páginas editadas, y mide TextAnalyzer.basic_comparison sobre el texto
+completo frente a TextAnalyzer.incremental_comparison.
+
+Uso:
+    python -m benchmarks.bench_incremental --pages 100 500 1000 --edits 3
+"""
+
+import argparse
+import json
+import random
+import time
+
+from src.core.pdf_processor import PDFProcessor
+from src.core.text_analyzer import TextAnalyzer
+
+VOCABULARY = (
+    "contrato cliente proveedor precio servicio plazo pago cláusula entrega "
+    "garantía responsabilidad confidencialidad vigencia rescisión anexo"
+).split()
+
+
+def _page(rng: random.Random, lines: int = 40, words: int = 12) -> str:
+    return "\n".join(
+        " ".join(rng.choice(VOCABULARY) for _ in range(words))
+        for _ in range(lines)
+    )
+
+
+def make_revision_pair(num_pages: int, num_edits: int, seed: int = 7):
+    """Documento base y revisión con `num_edits` páginas reescritas"""
+    rng = random.Random(seed)
+    pages1 = [_page(rng) for _ in range(num_pages)]
+    pages2 = list(pages1)
+    for page in rng.sample(range(num_pages), num_edits):
+        pages2[page] = _page(rng)
+    return pages1, pages2
+
+
+def run(page_counts, num_edits: int):
+    analyzer = TextAnalyzer()
+    results = []
+
+    for num_pages in page_counts:
+        pages1, pages2 = make_revision_pair(num_pages, num_edits)
+        text1 = "".join(p + "\n" for p in pages1)
+        text2 = "".join(p + "\n" for p in pages2)
+        fingerprints1 = [PDFProcessor.page_fingerprint(p) for p in pages1]
+        fingerprints2 = [PDFProcessor.page_fingerprint(p) for p in pages2]
+
+        start = time.perf_counter()
+        full = analyzer.basic_comparison(text1, text2)
+        full_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        incremental = analyzer.incremental_comparison(pages1, fingerprints1, pages2, fingerprints2)
+        incremental_seconds = time.perf_counter() - start
+
+        results.append({
+            "pages": num_pages,
+            "edited_pages": num_edits,
+            "full_seconds": full_seconds,
+            "incremental_seconds": incremental_seconds,
+            "speedup": full_seconds / incremental_seconds if incremental_seconds else None,
+            "full_similarity": full["similarity_ratio"],
+            "incremental_similarity": incremental["similarity_ratio"]
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--edits", type=int, default=3)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.pages, args.edits), indent=2))
+
+
+if __name__ == "__main__":
+    main()
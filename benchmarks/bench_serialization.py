@@ -0,0 +1,105 @@
+"""
+Benchmark: serialización de resultados de comparación (json vs. orjson) y compresión
+
+Construye un resultado típico (pocas decenas de hunks) y uno grande (miles
+de hunks y pares similares con floats de numpy) y mide el tiempo de
+codificación/decodificación y los bytes resultantes para json de la
+librería estándar, la capa de src.utils.serialization y cada códec de
+compresión disponible.
+
+Uso:
+    python -m benchmarks.bench_serialization --repeat 20
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from src.utils import serialization
+from src.utils.serialization import CODEC_NAMES, _CODECS
+
+WORDS = "contrato cliente proveedor precio servicio plazo pago cláusula entrega garantía".split()
+
+
+def _line(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(12))
+
+
+def make_result(num_hunks: int, num_pairs: int, seed: int = 5) -> dict:
+    """Resultado con la forma de /api/v1/compare (basic + semantic + structural)"""
+    rng = random.Random(seed)
+    hunks = []
+    line = 0
+    for _ in range(num_hunks):
+        line += rng.randint(1, 40)
+        size = rng.randint(1, 6)
+        hunks.append({
+            'tag': 'replace', 'doc1_start': line, 'doc1_end': line + size,
+            'doc2_start': line, 'doc2_end': line + size,
+            'removed': [_line(rng) for _ in range(size)],
+            'added': [_line(rng) for _ in range(size)]
+        })
+    return {
+        'basic': {
+            'similarity_ratio': np.float64(0.87),
+            'added_lines': sum(len(h['added']) for h in hunks),
+            'removed_lines': sum(len(h['removed']) for h in hunks),
+            'num_hunks': num_hunks,
+            'hunks': hunks
+        },
+        'semantic': {
+            'overall_similarity': np.float32(0.91),
+            'similar_sections': [
+                {'text1': _line(rng), 'text2': _line(rng), 'similarity': np.float32(rng.random())}
+                for _ in range(num_pairs)
+            ]
+        },
+        'structural': 0.75
+    }
+
+
+def _time(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = fn()
+    return (time.perf_counter() - start) / repeat, value
+
+
+def run(repeat: int):
+    cases = {"typical": make_result(50, 20), "large": make_result(20000, 5000)}
+    results = []
+    for name, result in cases.items():
+        # json estándar no admite floats de numpy (np.float32)
+        stdlib_encode, encoded = _time(lambda: json.dumps(result, default=float).encode("utf-8"), repeat)
+        stdlib_decode, _ = _time(lambda: json.loads(encoded), repeat)
+        results.append({"case": name, "format": "stdlib-json", "bytes": len(encoded),
+                        "encode_ms": stdlib_encode * 1000, "decode_ms": stdlib_decode * 1000})
+
+        fast_encode, encoded = _time(lambda: serialization.dumps(result), repeat)
+        fast_decode, _ = _time(lambda: serialization.loads(encoded), repeat)
+        results.append({"case": name, "format": "serialization.dumps", "bytes": len(encoded),
+                        "encode_ms": fast_encode * 1000, "decode_ms": fast_decode * 1000})
+
+        for codec_name, codec in CODEC_NAMES.items():
+            if codec_name == "none" or codec not in _CODECS:
+                continue
+            pack_time, packed = _time(lambda: serialization.pack(result, codec_name), repeat)
+            unpack_time, _ = _time(lambda: serialization.unpack(packed), repeat)
+            results.append({"case": name, "format": f"pack[{codec_name}]", "bytes": len(packed),
+                            "encode_ms": pack_time * 1000, "decode_ms": unpack_time * 1000})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: búsqueda de documentos similares sobre la matriz de vectores en disco
+
+Crea un DocumentVectorIndex con N vectores aleatorios normalizados (dimensión
+del modelo MiniLM) en un directorio temporal y mide la latencia de `search`
+(producto matriz-vector memory-mapped + top-k) para consultas aleatorias,
+además del tiempo de anexar documentos uno a uno.
+
+Uso:
+    python -m benchmarks.bench_similar_search --documents 100000 --queries 50
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from src.core.document_vectors import ID_BYTES, DocumentVectorIndex
+
+
+def build(directory: str, documents: int, dimension: int, seed: int = 3) -> np.ndarray:
+    """Escribe los ficheros del índice de golpe (mucho más rápido que add en bucle)"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((documents, dimension), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    os.makedirs(directory, exist_ok=True)
+    vectors.tofile(os.path.join(directory, "vectors.f32"))
+    ids = np.array([f"{i:064x}".encode("ascii") for i in range(documents)], dtype=f"S{ID_BYTES}")
+    ids.tofile(os.path.join(directory, "ids.bin"))
+    return vectors
+
+
+def run(documents: int, dimension: int, queries: int, top_k: int, appends: int):
+    with tempfile.TemporaryDirectory() as directory:
+        vectors = build(directory, documents, dimension)
+
+        start = time.perf_counter()
+        index = DocumentVectorIndex(directory, dimension)
+        size = len(index)
+        open_seconds = time.perf_counter() - start
+
+        rng = np.random.default_rng(7)
+        timings = []
+        for _ in range(queries):
+            query = vectors[rng.integers(documents)] + 0.1 * rng.standard_normal(dimension, dtype=np.float32)
+            start = time.perf_counter()
+            index.search(query, top_k)
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(appends):
+            vector = rng.standard_normal(dimension, dtype=np.float32)
+            index.add(f"append{i:058d}", vector / np.linalg.norm(vector))
+        append_seconds = time.perf_counter() - start
+
+        timings_ms = np.array(timings) * 1000
+        return {
+            "documents": size,
+            "dimension": dimension,
+            "matrix_mb": size * dimension * 4 / 1024 / 1024,
+            "open_seconds": open_seconds,
+            "top_k": top_k,
+            "search_ms_p50": float(np.percentile(timings_ms, 50)),
+            "search_ms_p95": float(np.percentile(timings_ms, 95)),
+            "search_ms_first": float(timings_ms[0]),
+            "append_ms_mean": append_seconds / appends * 1000 if appends else None
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--appends", type=int, default=100)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.documents, args.dimension, args.queries, args.top_k, args.appends), indent=2))
+
+
+if __name__ == "__main__":
+    main()
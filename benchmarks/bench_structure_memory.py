@@ -0,0 +1,129 @@
+"""
+Benchmark: memoria de PDFContent.structure (dicts por elemento vs. columnas)
+
+Genera un documento sintético con muchas listas y secciones numeradas y
+construye su estructura de las dos formas: la anterior (un dict con claves
+repetidas por cada título, sección, elemento de lista y línea de TOC) y
+DocumentStructure (arrays de numpy con offsets sobre el texto). Mide la
+memoria retenida con tracemalloc (sin contar el texto del documento), el
+tiempo de construcción y el tamaño serializado con pickle y con la capa de
+caché (orjson + compresión).
+
+Uso:
+    python -m benchmarks.bench_structure_memory --pages 1000 --items-per-page 40
+"""
+
+import argparse
+import gc
+import json
+import pickle
+import random
+import re
+import time
+import tracemalloc
+
+from src.core.pdf_processor import PDFProcessor
+from src.core.structure import StructureBuilder
+from src.utils.serialization import pack
+
+WORDS = "contrato cliente proveedor precio servicio plazo pago cláusula entrega garantía".split()
+
+
+def make_pages(pages: int, items_per_page: int, seed: int = 11):
+    rng = random.Random(seed)
+    result = []
+    for page in range(pages):
+        lines = [f"CAPÍTULO {page + 1}", f"{page + 1}. {' '.join(rng.sample(WORDS, 4))}"]
+        for i in range(items_per_page):
+            if i % 10 == 0:
+                lines.append(f"{page + 1}.{i // 10 + 1} {' '.join(rng.sample(WORDS, 3))}")
+            lines.append(f"• {' '.join(rng.choice(WORDS) for _ in range(8))}")
+        lines.append(f"Anexo {page + 1} ........ {page + 2}")
+        result.append("\n".join(lines))
+    return result
+
+
+def legacy_structure(processor: PDFProcessor, pages):
+    """Forma anterior: un dict por elemento"""
+    structure = {'titles': [], 'sections': [], 'lists': [], 'toc': []}
+    patterns = processor.structure_patterns
+    for page_num, page_text in enumerate(pages):
+        for line_num, line in enumerate(page_text.split('\n')):
+            line = line.strip()
+            if not line:
+                continue
+            if any(re.match(p, line) for p in patterns['main_titles']):
+                structure['titles'].append({'text': line, 'page': page_num, 'line': line_num, 'type': 'main_title'})
+            if any(re.match(p, line) for p in patterns['numbered_sections']):
+                structure['sections'].append({'text': line, 'page': page_num, 'line': line_num, 'level': line.count('.')})
+            if any(re.match(p, line) for p in patterns['list_items']):
+                structure['lists'].append({'text': line, 'page': page_num, 'line': line_num})
+            if '....' in line or '----' in line:
+                structure['toc'].append({'text': line, 'page': page_num})
+    return structure
+
+
+def compact_structure(processor: PDFProcessor, pages, text: str):
+    builder = StructureBuilder()
+    offset = 0
+    for page_num, page_text in enumerate(pages):
+        processor._analyze_page_structure(page_text, page_num, builder, offset)
+        offset += len(page_text) + 1
+    return builder.build(text)
+
+
+def measure(build):
+    """(objeto, bytes retenidos, pico de bytes, segundos)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, peak, seconds
+
+
+def run(pages: int, items_per_page: int):
+    processor = PDFProcessor()
+    page_texts = make_pages(pages, items_per_page)
+    text = "".join(page + "\n" for page in page_texts)
+
+    legacy, legacy_bytes, legacy_peak, legacy_seconds = measure(lambda: legacy_structure(processor, page_texts))
+    compact, compact_bytes, compact_peak, compact_seconds = measure(lambda: compact_structure(processor, page_texts, text))
+    assert compact.to_dict() == legacy
+
+    return {
+        "pages": pages,
+        "items": sum(len(items) for items in legacy.values()),
+        "text_mb": len(text.encode("utf-8")) / 1024 / 1024,
+        "legacy": {
+            "retained_mb": legacy_bytes / 1024 / 1024,
+            "peak_mb": legacy_peak / 1024 / 1024,
+            "build_seconds": legacy_seconds,
+            "pickle_mb": len(pickle.dumps(legacy)) / 1024 / 1024,
+            "packed_mb": len(pack(legacy)) / 1024 / 1024
+        },
+        "compact": {
+            "retained_mb": compact_bytes / 1024 / 1024,
+            "peak_mb": compact_peak / 1024 / 1024,
+            "build_seconds": compact_seconds,
+            "array_mb": compact.nbytes / 1024 / 1024,
+            "pickle_mb": len(pickle.dumps(compact.to_columns())) / 1024 / 1024,
+            "packed_mb": len(pack(compact.to_columns())) / 1024 / 1024
+        },
+        "retained_ratio": legacy_bytes / max(compact_bytes, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--items-per-page", type=int, default=40)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.pages, args.items_per_page), indent=2))
+
+
+if __name__ == "__main__":
+    main()
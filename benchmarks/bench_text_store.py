@@ -0,0 +1,113 @@
+"""
+Benchmark: pico de memoria (RSS) al comparar documentos muy grandes, con y sin TextStore
+
+Genera un documento sintético de N páginas y una revisión con unas pocas
+páginas editadas (como bench_incremental) y, en un proceso nuevo por modo,
+compara ambos igual que /api/v1/compare con la ruta incremental: huellas de
+página, TextAnalyzer.incremental_comparison y el render de los hunks.
+  - memory: PDFContent con el texto y las páginas como str (dos copias)
+  - mapped: PDFContent leído desde TextStore (memory-map, páginas perezosas)
+Se informa el RSS pico del proceso (ru_maxrss) menos el RSS tras los imports.
+
+Uso:
+    python -m benchmarks.bench_text_store --pages 2000 --edits 5
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from benchmarks.bench_incremental import make_revision_pair
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def _peak_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _compare(mode: str, directory: str, keys, results):
+    from src.core.diff_store import render_hunks
+    from src.core.pdf_processor import PDFContent, PDFProcessor
+    from src.core.structure import StructureBuilder
+    from src.core.text_analyzer import TextAnalyzer
+    from src.core.text_store import TextStore
+
+    baseline = _rss_mb()
+    store = TextStore(directory, min_pages=0)
+    processor = PDFProcessor()
+    contents = []
+    for key in keys:
+        mapped = store.open(key)
+        if mode == "mapped":
+            text, pages = mapped, mapped.pages
+        else:
+            text, pages = str(mapped), list(mapped.pages)
+        contents.append(PDFContent(
+            text=text,
+            pages=pages,
+            metadata={},
+            structure=StructureBuilder().build(text),
+            page_fingerprints=[processor.page_fingerprint(page) for page in pages]
+        ))
+    loaded = _rss_mb() - baseline
+
+    start = time.perf_counter()
+    content1, content2 = contents
+    basic = TextAnalyzer().incremental_comparison(
+        content1.pages, content1.page_fingerprints,
+        content2.pages, content2.page_fingerprints
+    )
+    hunks = render_hunks(content1.lines(), content2.lines(), basic["hunks"])
+    results.put({
+        "mode": mode,
+        "seconds": time.perf_counter() - start,
+        "num_hunks": len(hunks),
+        "loaded_rss_mb": loaded,
+        "peak_rss_mb": _peak_mb() - baseline
+    })
+
+
+def run(pages: int, edits: int):
+    pages1, pages2 = make_revision_pair(pages, edits)
+    with tempfile.TemporaryDirectory() as directory:
+        from src.core.text_store import TextStore
+        store = TextStore(directory, min_pages=0)
+        keys = []
+        for doc_pages in (pages1, pages2):
+            text = "".join(page + "\n" for page in doc_pages)
+            mapped = store.write(text, doc_pages)
+            keys.append(os.path.basename(mapped.path))
+        text_mb = os.path.getsize(f"{mapped.path}.txt") / 1024 / 1024
+
+        # Un proceso limpio por modo: ru_maxrss es el pico de toda la vida del proceso
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        report = {"pages": pages, "edits": edits, "text_mb_per_document": text_mb}
+        for mode in ("memory", "mapped"):
+            process = context.Process(target=_compare, args=(mode, directory, keys, results))
+            process.start()
+            result = results.get()
+            process.join()
+            report[mode] = result
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--edits", type=int, default=5)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.pages, args.edits), indent=2))
+
+
+if __name__ == "__main__":
+    main()
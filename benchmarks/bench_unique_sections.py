@@ -0,0 +1,103 @@
+"""
+Benchmark: búsqueda de secciones únicas por chunk vs. por lotes
+
+Compara la estrategia anterior (una búsqueda filtrada por chunk sobre el
+índice combinado, volviendo a generar el embedding de cada consulta) con
+la búsqueda k-NN por lotes sobre índices separados por documento.
+
+Uso:
+    python -m benchmarks.bench_unique_sections --chunks 1000 2000 5000
+    python -m benchmarks.bench_unique_sections --chunks 2000 --with-model
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+DIMENSION = 384  # paraphrase-multilingual-MiniLM-L12-v2
+
+
+def _random_embeddings(n: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = rng.standard_normal((n, DIMENSION)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _flat_index(vectors: np.ndarray) -> faiss.IndexFlatL2:
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+def per_chunk_search(emb1: np.ndarray, emb2: np.ndarray, embed_fn=None, texts=None, fetch_k: int = 20):
+    """Estrategia anterior: una consulta por chunk sobre el índice combinado"""
+    merged = _flat_index(np.vstack([emb1, emb2]))
+    n1 = len(emb1)
+    unique = 0
+    for i in range(n1):
+        query = embed_fn(texts[i]) if embed_fn else emb1[i]
+        distances, ids = merged.search(np.asarray(query, dtype=np.float32)[np.newaxis, :], fetch_k)
+        # Filtro por metadata: solo resultados del otro documento
+        other = distances[0][ids[0] >= n1]
+        if len(other) == 0 or other[0] > 0.5:
+            unique += 1
+    return unique
+
+
+def batched_search(emb1: np.ndarray, emb2: np.ndarray):
+    """Estrategia actual: una búsqueda por lotes contra el índice del otro documento"""
+    index2 = _flat_index(emb2)
+    distances, _ = index2.search(emb1, 1)
+    return int((distances[:, 0] > 0.5).sum())
+
+
+def run(chunk_counts, with_model: bool = False, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    embed_fn = None
+    if with_model:
+        from langchain.embeddings import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(
+            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+        embed_fn = model.embed_query
+
+    results = []
+    for n in chunk_counts:
+        emb1 = _random_embeddings(n, rng)
+        emb2 = _random_embeddings(n, rng)
+        texts = [f"Cláusula {i}: el proveedor se compromete a entregar el servicio {i}." for i in range(n)]
+
+        start = time.perf_counter()
+        per_chunk_search(emb1, emb2, embed_fn, texts)
+        per_chunk_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        batched_search(emb1, emb2)
+        batched_seconds = time.perf_counter() - start
+
+        results.append({
+            "chunks_per_document": n,
+            "with_model": with_model,
+            "per_chunk_seconds": per_chunk_seconds,
+            "batched_seconds": batched_seconds,
+            "speedup": per_chunk_seconds / batched_seconds if batched_seconds else None
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 2000, 5000])
+    parser.add_argument("--with-model", action="store_true", help="Incluye el coste de re-embeddear cada consulta")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.chunks, args.with_model), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark: memoria por worker y peticiones/segundo al escalar workers de gunicorn
+
+Para cada número de workers arranca `gunicorn -c src/interfaces/gunicorn_conf.py`
+(con preload), espera a que responda, mide RSS, PSS y memoria compartida del
+master y de cada worker (/proc/<pid>/smaps_rollup, solo Linux) y lanza una
+carga concurrente contra un endpoint durante unos segundos.
+
+Con preload, el PSS por worker debería crecer mucho menos que el RSS: las
+páginas de los modelos cargados en el master se comparten.
+
+Uso:
+    python -m benchmarks.bench_workers --workers 1 2 4 --duration 10 --concurrency 16
+    python -m benchmarks.bench_workers --path /api/v1/compare/documents --method POST \\
+        --body '{"document_id1": "...", "document_id2": "...", "analysis_types": ["basic"]}'
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _memory(pid: int) -> dict:
+    """RSS, PSS y memoria compartida (MB) de un proceso"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Shared_Dirty:"):
+                values[parts[0].rstrip(":").lower()] = int(parts[1]) / 1024
+    return {
+        "rss_mb": values.get("rss", 0.0),
+        "pss_mb": values.get("pss", 0.0),
+        "shared_mb": values.get("shared_clean", 0.0) + values.get("shared_dirty", 0.0)
+    }
+
+
+def _children(pid: int) -> list:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _request(url: str, method: str, body: bytes) -> bool:
+    request = urllib.request.Request(url, data=body, method=method,
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            return response.status < 400
+    except Exception:
+        return False
+
+
+def _wait_ready(url: str, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if _request(url, "GET", None):
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def _load(url: str, method: str, body: bytes, duration: float, concurrency: int) -> dict:
+    ok = errors = 0
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client():
+        nonlocal ok, errors
+        while time.time() < deadline:
+            success = _request(url, method, body)
+            with lock:
+                if success:
+                    ok += 1
+                else:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    elapsed = time.perf_counter() - start
+    return {"requests": ok, "errors": errors, "requests_per_second": ok / elapsed}
+
+
+def run(worker_counts, port: int, path: str, method: str, body: str,
+        duration: float, concurrency: int, startup_timeout: float):
+    base_url = f"http://127.0.0.1:{port}"
+    payload = body.encode("utf-8") if body else None
+    results = []
+
+    for workers in worker_counts:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn",
+             "-c", "src/interfaces/gunicorn_conf.py",
+             "--bind", f"127.0.0.1:{port}",
+             "--workers", str(workers),
+             "src.interfaces.api_server:app"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            if not _wait_ready(base_url + "/", startup_timeout):
+                results.append({"workers": workers, "error": "server did not start"})
+                continue
+            # Esperar a que todos los workers estén vivos
+            deadline = time.time() + startup_timeout
+            while len(_children(server.pid)) < workers and time.time() < deadline:
+                time.sleep(0.5)
+
+            load = _load(base_url + path, method, payload, duration, concurrency)
+            master = _memory(server.pid)
+            worker_memory = [_memory(pid) for pid in _children(server.pid)]
+
+            results.append({
+                "workers": workers,
+                "master": master,
+                "worker_rss_mb": [w["rss_mb"] for w in worker_memory],
+                "worker_pss_mb": [w["pss_mb"] for w in worker_memory],
+                "worker_shared_mb": [w["shared_mb"] for w in worker_memory],
+                "total_pss_mb": master["pss_mb"] + sum(w["pss_mb"] for w in worker_memory),
+                **load
+            })
+        finally:
+            server.send_signal(signal.SIGTERM)
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=int(os.getenv("BENCH_PORT", "8765")))
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", default="")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    print(json.dumps(run(
+        args.workers, args.port, args.path, args.method, args.body,
+        args.duration, args.concurrency, args.startup_timeout
+    ), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Generador determinista de PDF sintéticos para benchmarks (ReportLab)
+
+Cada caso es un documento base y una revisión: N páginas de texto con una
+densidad de estructura dada (fracción de líneas que son títulos, secciones
+numeradas, elementos de lista o entradas de índice) y una fracción de líneas
+editadas en la revisión (palabras cambiadas, líneas insertadas y eliminadas).
+Con la misma semilla se generan siempre los mismos PDF (canvas invariante:
+sin fecha ni identificador aleatorio).
+
+Uso:
+    python -m benchmarks.corpus --output /tmp/corpus --pages 10 100 --density 0.1 --edits 0.02
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+from typing import Dict, List
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+VOCABULARY = (
+    "contrato cliente proveedor precio servicio plazo pago cláusula entrega "
+    "garantía responsabilidad confidencialidad vigencia rescisión anexo "
+    "obligaciones partes importe factura penalización notificación"
+).split()
+
+LINES_PER_PAGE = 45
+WORDS_PER_LINE = 11
+
+
+def _sentence(rng: random.Random, words: int = WORDS_PER_LINE) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def make_document(pages: int, density: float, seed: int = 0) -> List[List[str]]:
+    """Líneas de cada página; `density` es la fracción de líneas de estructura"""
+    rng = random.Random(seed)
+    section = [0, 0]
+    document = []
+    for page in range(pages):
+        lines = []
+        if page == 0:
+            lines.append("ÍNDICE DEL CONTRATO")
+            lines.extend(f"{i + 1}. {_sentence(rng, 3)} ........ {i + 2}" for i in range(min(pages, 10)))
+        while len(lines) < LINES_PER_PAGE:
+            if rng.random() >= density:
+                lines.append(_sentence(rng))
+                continue
+            kind = rng.random()
+            if kind < 0.1:
+                lines.append(f"CAPÍTULO {page + 1}")
+            elif kind < 0.4:
+                section[0] += 1
+                section[1] = 0
+                lines.append(f"{section[0]}. {_sentence(rng, 4).capitalize()}")
+            elif kind < 0.6:
+                section[1] += 1
+                lines.append(f"{section[0]}.{section[1]} {_sentence(rng, 4).capitalize()}")
+            else:
+                lines.append(f"• {_sentence(rng, 8)}")
+        document.append(lines[:LINES_PER_PAGE])
+    return document
+
+
+def revise(document: List[List[str]], edit_ratio: float, seed: int = 1) -> List[List[str]]:
+    """Revisión con `edit_ratio` de líneas cambiadas, insertadas o eliminadas"""
+    rng = random.Random(seed)
+    revision = []
+    for lines in document:
+        revised = []
+        for line in lines:
+            if rng.random() >= edit_ratio:
+                revised.append(line)
+                continue
+            operation = rng.random()
+            if operation < 0.6:
+                words = line.split()
+                words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+                revised.append(" ".join(words))
+            elif operation < 0.8:
+                revised.extend([line, _sentence(rng)])
+            # Si no, la línea se elimina
+        revision.append(revised)
+    return revision
+
+
+def render_pdf(document: List[List[str]], path: str):
+    """Escribe una línea de texto por renglón, una página del PDF por página"""
+    pdf = canvas.Canvas(path, pagesize=A4, invariant=1)
+    width, height = A4
+    for lines in document:
+        text = pdf.beginText(40, height - 50)
+        text.setFont("Helvetica", 9)
+        text.setLeading(16)
+        for line in lines:
+            text.textLine(line)
+        pdf.drawText(text)
+        pdf.showPage()
+    pdf.save()
+
+
+def build_corpus(directory: str, pages: List[int], densities: List[float],
+                 edit_ratios: List[float], seed: int = 0) -> List[Dict]:
+    """Genera (o reutiliza) los PDF de cada combinación y devuelve los casos"""
+    os.makedirs(directory, exist_ok=True)
+    cases = []
+    for case_seed, (num_pages, density, edit_ratio) in enumerate(itertools.product(pages, densities, edit_ratios)):
+        name = f"p{num_pages}_d{density:g}_e{edit_ratio:g}"
+        path1 = os.path.join(directory, f"{name}_v1.pdf")
+        path2 = os.path.join(directory, f"{name}_v2.pdf")
+        if not (os.path.exists(path1) and os.path.exists(path2)):
+            document = make_document(num_pages, density, seed + case_seed)
+            render_pdf(document, path1)
+            render_pdf(revise(document, edit_ratio, seed + case_seed + 1), path2)
+        cases.append({
+            "name": name,
+            "pages": num_pages,
+            "density": density,
+            "edit_ratio": edit_ratio,
+            "path1": path1,
+            "path2": path2,
+            "bytes": os.path.getsize(path1) + os.path.getsize(path2)
+        })
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--density", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--edits", type=float, nargs="+", default=[0.02])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(build_corpus(args.output, args.pages, args.density, args.edits, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Servidor vLLM simulado (API compatible con OpenAI) para benchmarks sin GPU
+
+Responde a ``/v1/completions`` y ``/v1/chat/completions`` (también sin el
+prefijo /v1) con un texto fijo tras una latencia configurable, y a
+``/health`` y ``/v1/models``. Con ``"stream": true`` (LangChainHandler usa
+VLLMOpenAI con streaming) envía el texto palabra a palabra como eventos
+``text/event-stream`` terminados en ``data: [DONE]``. Cuenta las peticiones
+recibidas para que el benchmark pueda comprobar cuántas llamadas al LLM hace
+cada comparación.
+
+Uso:
+    python -m benchmarks.mock_vllm --port 8001 --latency-ms 200
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+RESPONSE_TEXT = (
+    "Los documentos son similares en estructura. Diferencias principales: "
+    "cambios en importes, plazos y una cláusula de penalización añadida. "
+    "Se recomienda revisar las secciones modificadas antes de firmar."
+)
+
+
+class MockVLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency_ms: float = 0.0, model: str = "mock-model"):
+        super().__init__(address, _Handler)
+        self.latency = latency_ms / 1000
+        self.model = model
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockVLLMServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload: dict, status: int = 200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, chunks):
+        """Server-sent events de OpenAI: un `data: {...}` por chunk y `data: [DONE]`"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/health", ""):
+            self._send({"status": "ok"})
+        elif self.path.endswith("/models"):
+            self._send({"object": "list", "data": [{"id": self.server.model, "object": "model"}]})
+        else:
+            self._send({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.count()
+        time.sleep(self.server.latency)
+
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        model = request.get("model", self.server.model)
+        pieces = [word + " " for word in RESPONSE_TEXT.split(" ")]
+        pieces[-1] = pieces[-1].rstrip()
+        created = int(time.time())
+
+        if request.get("stream") and self.path.endswith("/chat/completions"):
+            self._stream(
+                {
+                    "id": "cmpl-mock",
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                for delta, finish_reason in (
+                    [({"role": "assistant"}, None)]
+                    + [({"content": piece}, None) for piece in pieces]
+                    + [({}, "stop")]
+                )
+            )
+        elif request.get("stream") and self.path.endswith("/completions"):
+            prompts = request.get("prompt") or [""]
+            prompts = prompts if isinstance(prompts, list) else [prompts]
+            self._stream(
+                {
+                    "id": "cmpl-mock",
+                    "object": "text_completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {"index": i, "text": text, "logprobs": None, "finish_reason": finish_reason}
+                        for i in range(len(prompts))
+                    ]
+                }
+                for text, finish_reason in [(piece, None) for piece in pieces] + [("", "stop")]
+            )
+        elif self.path.endswith("/chat/completions"):
+            self._send({
+                "id": "cmpl-mock",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": RESPONSE_TEXT},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+        elif self.path.endswith("/completions"):
+            prompts = request.get("prompt") or [""]
+            prompts = prompts if isinstance(prompts, list) else [prompts]
+            self._send({
+                "id": "cmpl-mock",
+                "object": "text_completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": i, "text": RESPONSE_TEXT, "logprobs": None, "finish_reason": "stop"}
+                    for i in range(len(prompts))
+                ],
+                "usage": usage
+            })
+        else:
+            self._send({"error": "not found"}, 404)
+
+
+def start_mock_vllm(latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0) -> MockVLLMServer:
+    """Arranca el servidor en un hilo (puerto libre si `port` es 0)"""
+    server = MockVLLMServer((host, port), latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockVLLMServer((args.host, args.port), args.latency_ms)
+    print(f"Mock vLLM listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+Suite de benchmarks de extremo a extremo sobre un corpus sintético de PDF
+
+Genera (con benchmarks.corpus) pares documento/revisión deterministas de
+distintos tamaños, densidades de estructura y distancias de edición, y mide
+para cada caso:
+  - extract      PDFProcessor.extract_text de ambos PDF
+  - text         cada método de TextAnalyzer
+  - embeddings   cada método de EmbeddingAnalyzer (primera llamada en frío aparte)
+  - reports      ReportGenerator.generate en PDF, HTML, DOCX y JSON
+  - api          POST /api/v1/compare completo (TestClient) contra un vLLM simulado
+Cada medida informa la primera ejecución, la mediana y el mínimo en ms.
+
+El estado del servicio (almacén de documentos, índices, caché de diffs) va a
+un directorio temporal por ejecución; los modelos se cachean en --cache-dir.
+El resultado es JSON; con --baseline se compara con un resultado anterior y
+se listan las medianas que empeoran más que --regression-threshold.
+
+Uso:
+    python -m benchmarks.suite --pages 10 100 --density 0.05 0.3 --edits 0.01 0.1 --output bench.json
+    python -m benchmarks.suite --stages extract text --baseline bench.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.corpus import build_corpus
+from benchmarks.mock_vllm import start_mock_vllm
+
+STAGES = ("extract", "text", "embeddings", "reports", "api")
+REPORT_FORMATS = ("PDF", "HTML", "DOCX", "JSON")
+REPORT_OPTIONS = {"summary": True, "visualizations": True, "recommendations": True, "technical": False}
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Tuple[Any, Dict[str, float]]:
+    """Ejecuta `fn` `repeat` veces; la primera (en frío) se informa aparte"""
+    timings = []
+    result = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, {
+        "first_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "min_ms": min(timings),
+        "runs": len(timings)
+    }
+
+
+def configure_environment(workspace: str, cache_dir: str, vllm_url: str):
+    """Variables de entorno del servicio (antes de importar la configuración)"""
+    os.environ.update({
+        "ENVIRONMENT": "benchmark",
+        "VLLM_ENDPOINT": f"{vllm_url}/v1",
+        "CACHE_DIR": cache_dir,
+        "TEMP_DIR": os.path.join(workspace, "temp"),
+        "DOCUMENT_STORE_BACKEND": "local",
+        "DOCUMENT_STORE_PATH": os.path.join(workspace, "documents"),
+        "DOCUMENT_VECTORS_PATH": os.path.join(workspace, "document_vectors"),
+        "CORPUS_INDEX_PATH": os.path.join(workspace, "corpus_index"),
+        "TEXT_STORE_PATH": os.path.join(workspace, "text"),
+        "DEDUP_DB_PATH": os.path.join(workspace, "corpus_signatures.db"),
+        "OCR_ENABLED": "false",
+    })
+    # Sin Redis: sesiones, diffs y caché de LLM en memoria (el puerto 1 falla al instante)
+    os.environ.setdefault("REDIS_HOST", "127.0.0.1")
+    os.environ.setdefault("REDIS_PORT", "1")
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def bench_extract(case: Dict, repeat: int, tables: bool):
+    from src.core.pdf_processor import PDFProcessor
+
+    processor = PDFProcessor(extract_tables=tables)
+    content1, timing1 = timed(lambda: processor.extract_text(case["path1"]), repeat)
+    content2, timing2 = timed(lambda: processor.extract_text(case["path2"]), repeat)
+    return (content1, content2), {
+        "doc1": timing1,
+        "doc2": timing2,
+        "chars": [len(content1.text), len(content2.text)],
+        "structure_items": [sum(len(items) for items in c.structure.values()) for c in (content1, content2)]
+    }
+
+
+def bench_text(contents, repeat: int, skip: List[str]):
+    from src.core.text_analyzer import TextAnalyzer
+
+    analyzer = TextAnalyzer()
+    c1, c2 = contents
+    text1, text2 = str(c1.text), str(c2.text)
+    methods = {
+        "basic_comparison": lambda: analyzer.basic_comparison(text1, text2),
+        "incremental_comparison": lambda: analyzer.incremental_comparison(
+            c1.pages, c1.page_fingerprints, c2.pages, c2.page_fingerprints
+        ),
+        "fast_comparison": lambda: analyzer.fast_comparison(text1, text2),
+        "tfidf_analysis": lambda: analyzer.tfidf_analysis(text1, text2),
+        "structural_similarity": lambda: analyzer.structural_similarity(c1.structure, c2.structure),
+        "section_comparison": lambda: analyzer.section_comparison(c1.pages, c1.structure, c2.pages, c2.structure),
+        "table_comparison": lambda: analyzer.table_comparison(c1.tables, c2.tables),
+    }
+    timings, results = {}, {}
+    for name, method in methods.items():
+        if name in skip:
+            continue
+        results[name], timings[name] = timed(method, repeat)
+
+    # Forma de resultados que espera ReportGenerator
+    analyses = {}
+    if "basic_comparison" in results:
+        analyses["basic"] = results["basic_comparison"]
+    if "tfidf_analysis" in results:
+        analyses["tfidf"] = results["tfidf_analysis"]
+    if "structural_similarity" in results:
+        analyses["structural"] = results["structural_similarity"]
+    return analyses, timings
+
+
+def bench_embeddings(contents, repeat: int, skip: List[str]):
+    from src.core.chunking import encoder_from_config
+    from src.core.embeddings import EmbeddingAnalyzer
+    from src.core.page_alignment import align_pages
+    from src.utils.config import get_settings
+
+    config = get_settings().get_langchain_config()["embeddings"]
+    analyzer = EmbeddingAnalyzer(config["model_name"], encoder=encoder_from_config(config))
+    c1, c2 = contents
+    text1, text2 = str(c1.text), str(c2.text)
+    alignment = align_pages(c1.page_fingerprints, c2.page_fingerprints)
+
+    timings, results = {}, {}
+    # La primera llamada codifica; las siguientes salen de la caché del encoder
+    encoded1, timings["encode_document"] = timed(lambda: analyzer.encode_document(text1), repeat)
+    encoded2 = analyzer.encode_document(text2)
+    methods = {
+        "compare_encoded": lambda: analyzer.compare_encoded(*encoded1, *encoded2),
+        "semantic_comparison": lambda: analyzer.semantic_comparison(text1, text2),
+        "incremental_semantic_comparison": lambda: analyzer.incremental_semantic_comparison(
+            c1.pages, c2.pages, alignment
+        ),
+    }
+    for name, method in methods.items():
+        if name in skip:
+            continue
+        results[name], timings[name] = timed(method, repeat)
+    analyses = {"semantic": results["semantic_comparison"]} if "semantic_comparison" in results else {}
+    return analyses, timings
+
+
+def bench_reports(analyses: Dict, repeat: int):
+    from src.utils.report_generator import ReportGenerator
+
+    generator = ReportGenerator()
+    timings = {}
+    for report_format in REPORT_FORMATS:
+        report, timings[report_format] = timed(
+            lambda: generator.generate(analyses, "Detallado", REPORT_OPTIONS, report_format), repeat
+        )
+        timings[report_format]["bytes"] = len(report) if report is not None else 0
+    return timings
+
+
+def bench_api(client, server, case: Dict, repeat: int):
+    def compare():
+        with open(case["path1"], "rb") as pdf1, open(case["path2"], "rb") as pdf2:
+            response = client.post(
+                "/api/v1/compare",
+                files={
+                    "pdf1": (os.path.basename(case["path1"]), pdf1, "application/pdf"),
+                    "pdf2": (os.path.basename(case["path2"]), pdf2, "application/pdf"),
+                }
+            )
+        response.raise_for_status()
+        return response
+
+    requests_before = server.requests
+    response, timing = timed(compare, repeat)
+    timing["llm_requests"] = server.requests - requests_before
+    timing["response_bytes"] = len(response.content)
+    return timing
+
+
+def flatten(report: Dict) -> Dict[str, float]:
+    """Medianas por caso/etapa/medida, para comparar ejecuciones"""
+    metrics = {}
+
+    def walk(prefix: str, value: Any):
+        if isinstance(value, dict):
+            if "median_ms" in value:
+                metrics[prefix] = value["median_ms"]
+                return
+            for key, item in value.items():
+                walk(f"{prefix}/{key}", item)
+
+    for case in report["cases"]:
+        for stage in STAGES:
+            if stage in case:
+                walk(f"{case['name']}/{stage}", case[stage])
+    return metrics
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, threshold: float) -> Dict:
+    current, previous = flatten(report), flatten(baseline)
+    ratios = {
+        name: current[name] / previous[name]
+        for name in sorted(current.keys() & previous.keys()) if previous[name] > 0
+    }
+    return {
+        "baseline_commit": baseline.get("environment", {}).get("commit"),
+        "ratios": ratios,
+        "regressions": {name: ratio for name, ratio in ratios.items() if ratio > threshold}
+    }
+
+
+def run(args) -> Dict:
+    workspace = tempfile.mkdtemp(prefix="pdf-bench-")
+    server = start_mock_vllm(args.llm_latency_ms)
+    configure_environment(workspace, args.cache_dir, server.url)
+    try:
+        cases = build_corpus(
+            args.corpus_dir or os.path.join(workspace, "corpus"),
+            args.pages, args.density, args.edits, args.seed
+        )
+        report = {"environment": environment(), "config": vars(args), "cases": []}
+
+        with contextlib.ExitStack() as stack:
+            client = None
+            if "api" in args.stages:
+                from fastapi.testclient import TestClient
+                from src.interfaces.api_server import app
+                # Como contexto para ejecutar los eventos de arranque y parada de la app
+                client = stack.enter_context(TestClient(app))
+
+            for case in cases:
+                report["cases"].append(bench_case(case, args, client, server))
+                print(f"{case['name']}: done", file=sys.stderr)
+        return report
+    finally:
+        server.shutdown()
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def bench_case(case: Dict, args, client, server) -> Dict:
+    result = {key: case[key] for key in ("name", "pages", "density", "edit_ratio", "bytes")}
+    # Las demás etapas necesitan el contenido extraído: la extracción siempre se ejecuta
+    extract_repeat = args.repeat if "extract" in args.stages else 1
+    contents, extract_timings = bench_extract(case, extract_repeat, args.tables)
+    if "extract" in args.stages:
+        result["extract"] = extract_timings
+
+    analyses = {}
+    if "text" in args.stages:
+        text_analyses, result["text"] = bench_text(contents, args.repeat, args.skip)
+        analyses.update(text_analyses)
+    if "embeddings" in args.stages:
+        semantic, result["embeddings"] = bench_embeddings(contents, args.repeat, args.skip)
+        analyses.update(semantic)
+    if "reports" in args.stages:
+        result["reports"] = bench_reports(analyses, args.repeat)
+    if client is not None:
+        result["api"] = bench_api(client, server, case, args.repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--density", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--edits", type=float, nargs="+", default=[0.02])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--skip", nargs="*", default=[], help="Métodos a omitir (p. ej. basic_comparison)")
+    parser.add_argument("--tables", action="store_true", help="Extraer tablas en PDFProcessor")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--corpus-dir", default=None, help="Reutilizar los PDF generados entre ejecuciones")
+    parser.add_argument("--cache-dir", default=os.getenv("CACHE_DIR", os.path.expanduser("~/.cache/pdf-comparator")))
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="JSON de una ejecución anterior")
+    parser.add_argument("--regression-threshold", type=float, default=1.2)
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare_with_baseline(report, json.load(f), args.regression_threshold)
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,65 @@ import argparse
 import uvicorn
 from src.utils.config import Config, logger
 
+def run_dedup(args):
+    """Indexa un directorio de PDFs y emite los casi duplicados como JSON lines"""
+    import json
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from pathlib import Path
+    from src.core.dedup import CorpusDeduplicator, extract_signature
+    from src.core.pdf_processor import PDFProcessor
+    
+    dedup_config = Config.get_dedup_config()
+    if args.db:
+        dedup_config["db_path"] = args.db
+    
+    pdf_processor = PDFProcessor()
+    deduplicator = CorpusDeduplicator(
+        **dedup_config,
+        text_loader=lambda path: pdf_processor.extract_text(path).text if os.path.exists(path) else None
+    )
+    
+    # Firmas de un formato anterior: se recalculan antes de usar el índice
+    if deduplicator.pending_reindex():
+        logger.info(f"Recalculando {deduplicator.pending_reindex()} firmas de un formato anterior")
+        logger.info(f"Reindexado: {deduplicator.reindex()}")
+    if args.reindex:
+        return
+    
+    if not args.corpus_dir:
+        # Sin directorio: listar todos los pares del corpus ya indexado
+        for pair in deduplicator.find_duplicates():
+            print(json.dumps(pair))
+        return
+    
+    # Solo los PDFs que aún no están indexados (indexación incremental)
+    paths = [
+        str(path) for path in sorted(Path(args.corpus_dir).rglob("*.pdf"))
+        if not deduplicator.has_source(str(path))
+    ]
+    workers = args.workers or os.cpu_count()
+    logger.info(f"Indexando {len(paths)} PDFs nuevos con {workers} procesos")
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(extract_signature, path, dedup_config["num_perm"]): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                doc_id, signature, num_shingles = future.result()
+            except Exception as e:
+                logger.error(f"Error procesando {path}: {e}")
+                continue
+            
+            for match in deduplicator.add_signature(doc_id, signature, num_shingles, path):
+                if args.verify:
+                    match = deduplicator.verify(pdf_processor.extract_text(path).text, match)
+                print(json.dumps({"source": path, "doc_id": doc_id, **{f"match_{k}": v for k, v in match.items()}}))
+    
+    logger.info(f"Corpus: {deduplicator.get_stats()}")
+
 def main():
     parser = argparse.ArgumentParser(
         description="PDF Comparator AI - Sistema inteligente con vLLM"
@@ -16,7 +75,7 @@ def main():
     
     parser.add_argument(
         "interface",
-        choices=["api", "streamlit"],
+        choices=["api", "serve", "streamlit", "dedup"],
         default="api",
         nargs="?",
         help="Interfaz a ejecutar (default: api)"
@@ -35,6 +94,36 @@ def main():
         help="Puerto para el servidor"
     )
     
+    parser.add_argument(
+        "--corpus-dir",
+        help="Directorio de PDFs a indexar (solo dedup)"
+    )
+    
+    parser.add_argument(
+        "--db",
+        default=None,
+        help="Base de datos de firmas MinHash (solo dedup, default: DEDUP_DB_PATH)"
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Workers de gunicorn (serve, default: WORKERS) o procesos para extraer PDFs (dedup, default: núcleos)"
+    )
+    
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Verifica los candidatos con el análisis básico (solo dedup)"
+    )
+    
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="Solo recalcula las firmas guardadas con un formato anterior (solo dedup)"
+    )
+    
     args = parser.parse_args()
     
     # Validar configuración
@@ -63,6 +152,18 @@ def main():
                 log_level=Config.LOG_LEVEL.lower(),
                 access_log=True
             )
+        elif args.interface == "serve":
+            # Producción: gunicorn con preload (modelos compartidos entre workers)
+            import subprocess
+            subprocess.run([
+                sys.executable, "-m", "gunicorn",
+                "-c", "src/interfaces/gunicorn_conf.py",
+                "--bind", f"{args.host}:{args.port}",
+                "--workers", str(args.workers or Config.workers),
+                "src.interfaces.api_server:app"
+            ])
+        elif args.interface == "dedup":
+            run_dedup(args)
         elif args.interface == "streamlit":
             import subprocess
             subprocess.run([
@@ -2,15 +2,20 @@
 Chatbot components for conversational interface
 """
 
+# Module constants (defined before the submodules that import them)
+DEFAULT_SESSION_TIMEOUT = 3600  # 1 hour
+MAX_CONVERSATION_HISTORY = 100
+
 from .conversation_manager import ConversationManager, ConversationState
 from .commands import CommandHandler
+from .session_store import SessionStore, InMemorySessionStore, RedisSessionStore, create_session_store
 
 __all__ = [
     "ConversationManager",
     "ConversationState",
     "CommandHandler",
+    "SessionStore",
+    "InMemorySessionStore",
+    "RedisSessionStore",
+    "create_session_store",
 ]
-
-# Module constants
-DEFAULT_SESSION_TIMEOUT = 3600  # 1 hour
-MAX_CONVERSATION_HISTORY = 100
\ No newline at end of file
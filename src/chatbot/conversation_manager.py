@@ -3,6 +3,8 @@ from typing import Dict, List, Optional, Tuple
 import json
 import datetime
 
+from . import MAX_CONVERSATION_HISTORY
+
 class ConversationState(Enum):
     IDLE = "idle"
     AWAITING_DOCUMENTS = "awaiting_documents"
@@ -29,6 +31,9 @@ class ConversationManager:
             'role': role,
             'content': content
         })
+        # Historial acotado
+        if len(self.conversation_history) > MAX_CONVERSATION_HISTORY:
+            del self.conversation_history[:-MAX_CONVERSATION_HISTORY]
     
     def set_state(self, new_state: ConversationState):
         """Cambia el estado de la conversación"""
@@ -56,4 +61,29 @@ class ConversationManager:
         self.documents.clear()
         self.analysis_results.clear()
         self.set_state(ConversationState.IDLE)
-        self.current_session['documents_compared'] += len(self.documents)
\ No newline at end of file
+        self.current_session['documents_compared'] += len(self.documents)
+    
+    def to_session(self, session: Dict) -> Dict:
+        """Vuelca el estado en una sesión del SessionStore (documentos como referencias)
+
+        Solo se guardan los ids del almacén de documentos: el contenido en memoria
+        sin id no se puede recuperar desde otra instancia.
+        """
+        session['state'] = self.state.value
+        session['history'] = self.conversation_history
+        session['documents'] = [doc for doc in self.documents.values() if isinstance(doc, str)]
+        session['analysis_results'] = self.analysis_results
+        return session
+    
+    @classmethod
+    def from_session(cls, session: Dict) -> 'ConversationManager':
+        """Reconstruye el gestor a partir de una sesión guardada"""
+        manager = cls()
+        manager.state = ConversationState(session.get('state', ConversationState.IDLE.value))
+        manager.conversation_history = session.get('history', [])
+        manager.documents = {
+            f"doc{i + 1}": doc_ref for i, doc_ref in enumerate(session.get('documents', []))
+        }
+        manager.analysis_results = session.get('analysis_results', {})
+        manager.current_session['start_time'] = session.get('created_at', manager.current_session['start_time'])
+        return manager
@@ -0,0 +1,165 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+from collections import OrderedDict
+import datetime
+import json
+import logging
+import threading
+import time
+import uuid
+
+from . import DEFAULT_SESSION_TIMEOUT, MAX_CONVERSATION_HISTORY
+
+logger = logging.getLogger(__name__)
+
+MAX_SUMMARY_CHARS = 2000
+
+
+def _default_summarizer(summary: str, dropped: List[Dict]) -> str:
+    """Resume mensajes antiguos conservando un extracto acotado"""
+    lines = [f"{m['role']}: {m['content'][:200]}" for m in dropped]
+    combined = "\n".join(filter(None, [summary] + lines))
+    return combined[-MAX_SUMMARY_CHARS:]
+
+
+class SessionStore(ABC):
+    """Almacén de sesiones de chat con historial acotado y expiración"""
+
+    def __init__(
+        self,
+        ttl_seconds: int = DEFAULT_SESSION_TIMEOUT,
+        max_history: int = MAX_CONVERSATION_HISTORY,
+        summarizer: Callable[[str, List[Dict]], str] = _default_summarizer
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_history = max_history
+        self.summarizer = summarizer
+
+    def new_session(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Crea una sesión vacía (no se guarda hasta llamar a save)"""
+        now = datetime.datetime.now().isoformat()
+        return {
+            'session_id': session_id or f"session_{uuid.uuid4().hex}",
+            'created_at': now,
+            'updated_at': now,
+            'history': [],
+            'summary': '',
+            'documents': [],
+            'analysis_results': {}
+        }
+
+    def get_or_create(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """Obtiene una sesión existente o crea una nueva"""
+        session = self.get(session_id) if session_id else None
+        return session or self.new_session(session_id)
+
+    def append_message(self, session: Dict[str, Any], role: str, content: str):
+        """Agrega un mensaje y resume los que exceden la ventana"""
+        session['history'].append({
+            'timestamp': datetime.datetime.now().isoformat(),
+            'role': role,
+            'content': content
+        })
+
+        overflow = len(session['history']) - self.max_history
+        if overflow > 0:
+            dropped = session['history'][:overflow]
+            session['history'] = session['history'][overflow:]
+            session['summary'] = self.summarizer(session['summary'], dropped)
+
+    def add_documents(self, session: Dict[str, Any], document_ids: List[str]):
+        """Registra documentos referenciados por la sesión"""
+        for doc_id in document_ids:
+            if doc_id not in session['documents']:
+                session['documents'].append(doc_id)
+
+    def render_history(self, session: Dict[str, Any], last_n: int = 10) -> str:
+        """Historial como texto para incluir en el prompt"""
+        parts = []
+        if session['summary']:
+            parts.append(f"(Resumen de la conversación anterior)\n{session['summary']}")
+        parts.extend(f"{m['role']}: {m['content']}" for m in session['history'][-last_n:])
+        return "\n".join(parts)
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, session: Dict[str, Any]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """Almacén en memoria del proceso (desarrollo, tests y una sola réplica)"""
+
+    def __init__(self, max_sessions: int = 10000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, session = entry
+            if expires_at < time.time():
+                del self._sessions[session_id]
+                return None
+            return session
+
+    def save(self, session: Dict[str, Any]):
+        session['updated_at'] = datetime.datetime.now().isoformat()
+        with self._lock:
+            self._sessions[session['session_id']] = (time.time() + self.ttl_seconds, session)
+            self._sessions.move_to_end(session['session_id'])
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class RedisSessionStore(SessionStore):
+    """Almacén en Redis compartido entre réplicas de la API"""
+
+    def __init__(self, redis_url: str, prefix: str = "session:", **kwargs):
+        super().__init__(**kwargs)
+        import redis
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+        self.prefix = prefix
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis.get(self.prefix + session_id)
+        return json.loads(raw) if raw else None
+
+    def save(self, session: Dict[str, Any]):
+        session['updated_at'] = datetime.datetime.now().isoformat()
+        self.redis.setex(
+            self.prefix + session['session_id'],
+            self.ttl_seconds,
+            json.dumps(session, default=str)
+        )
+
+    def delete(self, session_id: str):
+        self.redis.delete(self.prefix + session_id)
+
+
+def create_session_store(backend: str = "redis", redis_url: Optional[str] = None, **kwargs) -> SessionStore:
+    """Crea el almacén de sesiones; usa memoria si Redis no está disponible"""
+    if backend == "redis" and redis_url:
+        try:
+            store = RedisSessionStore(redis_url, **kwargs)
+            store.redis.ping()
+            logger.info("Using Redis session store")
+            return store
+        except Exception as e:
+            logger.warning(f"Redis unavailable for sessions, using in-memory store: {e}")
+    return InMemorySessionStore(**kwargs)
@@ -0,0 +1,161 @@
+"""
+Chunking por tokens del modelo de embeddings, compartido por el análisis semántico y LangChain
+
+Los chunks se dimensionan con el tokenizer del propio modelo para que quepan en
+su longitud máxima de secuencia (128 tokens en MiniLM): un chunk más largo se
+trunca en silencio al codificarlo. Los límites de cada documento y sus
+embeddings se cachean por hash de contenido, de modo que EmbeddingAnalyzer y
+el VectorIndexStore de LangChainHandler reutilizan los mismos chunks y vectores.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import logging
+import threading
+
+import numpy as np
+from langchain.text_splitter import TextSplitter
+
+from src.utils.hashing import content_hash
+from src.utils.tracing import span
+from .embedding_batcher import batcher_from_config
+from .llm_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+Span = Tuple[int, int]
+
+
+class TokenChunker(TextSplitter):
+    """Ventanas de como máximo `max_tokens` tokens con `overlap_tokens` de solape
+
+    Los cortes se ajustan a inicio de palabra (no parten subpalabras) salvo
+    palabras más largas que la ventana. Los chunks de `min_chars` caracteres o
+    menos (sin espacios a los lados) se descartan. Requiere un tokenizer "fast"
+    (offsets).
+    """
+
+    def __init__(self, tokenizer, max_tokens: int = 128, overlap_tokens: int = 32,
+                 cache_entries: int = 1024, min_chars: int = 50):
+        # Tokens especiales ([CLS]/[SEP], <s>/</s>) que añade el modelo al codificar
+        max_tokens -= tokenizer.num_special_tokens_to_add()
+        super().__init__(
+            chunk_size=max_tokens,
+            chunk_overlap=min(overlap_tokens, max_tokens // 2),
+            length_function=self.count_tokens
+        )
+        self.tokenizer = tokenizer
+        self.max_tokens = max_tokens
+        self.overlap_tokens = self._chunk_overlap
+        self.min_chars = min_chars
+        self._spans = LRUCache(cache_entries, ttl_seconds=86400)
+
+    @classmethod
+    def for_model(cls, model, overlap_tokens: int = 32, max_tokens: int = 0,
+                  cache_entries: int = 1024) -> "TokenChunker":
+        """Chunker del tokenizer y longitud máxima de un modelo (SentenceTransformer u ONNX)"""
+        limit = model.max_seq_length
+        return cls(model.tokenizer, min(max_tokens, limit) if max_tokens > 0 else limit,
+                   overlap_tokens, cache_entries)
+
+    @property
+    def profile(self) -> str:
+        """Identifica la configuración de chunking (invalida cachés incompatibles)"""
+        return f"tok{self.max_tokens}-{self.overlap_tokens}-min{self.min_chars}"
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+
+    def _compute_spans(self, text: str) -> List[Span]:
+        offsets = self.tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            return_attention_mask=False,
+            verbose=False
+        )["offset_mapping"]
+        # Tokens vacíos (p. ej. "▁" suelto) no aportan texto
+        offsets = [(start, end) for start, end in offsets if end > start]
+        count = len(offsets)
+        word_start = [i == 0 or offsets[i][0] > offsets[i - 1][1] for i in range(count)]
+
+        spans = []
+        start = 0
+        while start < count:
+            end = min(start + self.max_tokens, count)
+            if end < count:
+                cut = end
+                while cut > start + 1 and not word_start[cut]:
+                    cut -= 1
+                if cut > start + 1:
+                    end = cut
+            spans.append((offsets[start][0], offsets[end - 1][1]))
+            if end >= count:
+                break
+            following = max(end - self.overlap_tokens, start + 1)
+            while following < end and not word_start[following]:
+                following += 1
+            start = following
+        return spans
+
+    def spans(self, text: str, doc_hash: Optional[str] = None) -> List[Span]:
+        """Límites (inicio, fin) en caracteres de cada chunk, cacheados por hash"""
+        doc_hash = doc_hash or content_hash(text)
+        spans = self._spans.get(doc_hash)
+        if spans is None:
+            # Mismo filtro para todos los caminos (documento completo, incremental, LangChain)
+            spans = [
+                (start, end) for start, end in self._compute_spans(text)
+                if len(text[start:end].strip()) > self.min_chars
+            ]
+            self._spans.set(doc_hash, spans)
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.spans(text)]
+
+
+class DocumentEncoder:
+    """Chunks y embeddings por documento (hash de contenido), calculados una sola vez"""
+
+    def __init__(self, batcher, chunker: TokenChunker, max_entries: int = 64):
+        self.batcher = batcher
+        self.chunker = chunker
+        self._embeddings = LRUCache(max_entries, ttl_seconds=86400)
+
+    def encode(self, text: str) -> Tuple[List[str], np.ndarray]:
+        """Chunks del documento y sus embeddings (sin normalizar, como el modelo)"""
+        doc_hash = content_hash(text)
+        with span("embeddings.chunk"):
+            chunks = [text[start:end] for start, end in self.chunker.spans(text, doc_hash)]
+        vectors = self._embeddings.get(doc_hash)
+        if vectors is None:
+            with span("embeddings.encode", chunks=len(chunks)):
+                vectors = self.batcher.encode(chunks)
+            self._embeddings.set(doc_hash, vectors)
+        return chunks, vectors
+
+
+_encoders: Dict[int, DocumentEncoder] = {}
+_encoders_lock = threading.Lock()
+
+
+def get_document_encoder(batcher, overlap_tokens: int = 32, max_tokens: int = 0,
+                         cache_entries: int = 64) -> DocumentEncoder:
+    """DocumentEncoder compartido por proceso para cada batcher (modelo) de embeddings"""
+    with _encoders_lock:
+        encoder = _encoders.get(id(batcher))
+        if encoder is None:
+            chunker = TokenChunker.for_model(batcher.model, overlap_tokens, max_tokens)
+            encoder = _encoders[id(batcher)] = DocumentEncoder(batcher, chunker, cache_entries)
+            logger.info(f"Token chunker: {chunker.max_tokens} tokens, overlap {chunker.overlap_tokens}")
+        return encoder
+
+
+def encoder_from_config(config: Dict) -> DocumentEncoder:
+    """DocumentEncoder a partir de la sección "embeddings" de Settings.get_langchain_config()"""
+    return get_document_encoder(
+        batcher_from_config(config),
+        overlap_tokens=config.get("chunk_overlap_tokens", 32),
+        max_tokens=config.get("chunk_max_tokens", 0),
+        cache_entries=config.get("cache_entries", 64)
+    )
@@ -0,0 +1,380 @@
+"""
+Índice vectorial persistente de chunks de todo el corpus (FAISS HNSW/IVF + tabla SQLite)
+
+    corpus.db     chunks (vector_id, documento, páginas, offsets, texto, embedding,
+                  marca de borrado), documents, excluded (documentos borrados)
+                  y meta (generación del índice)
+    index.faiss   IndexIDMap2 cuyos ids son el vector_id de SQLite
+
+SQLite es la fuente de verdad: los documentos nuevos se anexan al índice sin
+reconstruirlo y cada proceso incorpora las filas que otros hayan añadido. Los
+borrados solo marcan las filas (tombstones) y se filtran al consultar; la
+compactación reconstruye el índice con las filas vivas (y entrena IVF). Un
+documento borrado queda excluido: no se vuelve a añadir aunque se ingiera otra vez.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_right
+from datetime import datetime
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Span = Tuple[int, int]
+
+
+def page_offsets(pages: Sequence[str]) -> List[int]:
+    """Carácter del texto completo (páginas unidas con "\\n") en el que empieza cada página"""
+    offsets = [0]
+    for page in pages[:-1]:
+        offsets.append(offsets[-1] + len(page) + 1)
+    return offsets
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class CorpusIndex:
+    """Índice de chunks de todos los documentos ingeridos, con ubicación por página"""
+
+    def __init__(
+        self,
+        directory: str,
+        dimension: int,
+        index_type: str = "hnsw",
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        nlist: int = 1024,
+        nprobe: int = 16,
+        save_every: int = 1024
+    ):
+        if index_type not in ("hnsw", "ivf"):
+            raise ValueError(f"Unknown corpus index type: {index_type}")
+        self.directory = directory
+        self.dimension = dimension
+        self.index_type = index_type
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.save_every = save_every
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "index.faiss")
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(os.path.join(directory, "corpus.db"), check_same_thread=False)
+        self._create_schema()
+        self._index = None
+        self._max_id = 0
+        self._generation = None
+        self._unsaved = 0
+        with self._lock:
+            self._load()
+
+    def _create_schema(self):
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    source TEXT,
+                    num_chunks INTEGER NOT NULL,
+                    added_at TEXT NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    vector_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    doc_id TEXT NOT NULL,
+                    chunk INTEGER NOT NULL,
+                    page_start INTEGER,
+                    page_end INTEGER,
+                    char_start INTEGER,
+                    char_end INTEGER,
+                    text TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    deleted INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS chunks_doc ON chunks (doc_id);
+                CREATE TABLE IF NOT EXISTS excluded (
+                    doc_id TEXT PRIMARY KEY,
+                    excluded_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0');
+            """)
+
+    # Índice FAISS
+    def _new_index(self, training: Optional[np.ndarray] = None):
+        import faiss
+        if self.index_type == "hnsw":
+            base = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        elif training is not None and len(training) >= self.nlist:
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            base = faiss.IndexIVFFlat(quantizer, self.dimension, self.nlist, faiss.METRIC_INNER_PRODUCT)
+            base.train(training)
+        else:
+            # IVF sin entrenar: búsqueda exacta hasta que la compactación tenga vectores suficientes
+            base = faiss.IndexFlatIP(self.dimension)
+        index = faiss.IndexIDMap2(base)
+        self._configure(index)
+        return index
+
+    def _configure(self, index):
+        import faiss
+        base = faiss.downcast_index(index.index)
+        if isinstance(base, faiss.IndexHNSW):
+            base.hnsw.efSearch = self.ef_search
+        elif isinstance(base, faiss.IndexIVF):
+            base.nprobe = self.nprobe
+
+    def _trained_ivf(self) -> bool:
+        import faiss
+        return isinstance(faiss.downcast_index(self._index.index), faiss.IndexIVF)
+
+    def _read_generation(self) -> str:
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def _load(self):
+        """Carga index.faiss (si existe) e incorpora las filas posteriores de SQLite"""
+        import faiss
+        self._generation = self._read_generation()
+        self._index = None
+        if os.path.exists(self.index_path):
+            try:
+                self._index = faiss.read_index(self.index_path)
+                self._configure(self._index)
+            except Exception as e:
+                logger.warning(f"Corrupt corpus index {self.index_path}, rebuilding: {e}")
+        if self._index is None:
+            self._index = self._new_index()
+            self._max_id = 0
+        else:
+            ids = faiss.vector_to_array(self._index.id_map)
+            self._max_id = int(ids.max()) if len(ids) else 0
+        self._catch_up()
+
+    def _catch_up(self):
+        """Añade al índice las filas vivas con vector_id mayor que el último indexado"""
+        added = 0
+        while True:
+            rows = self.conn.execute(
+                "SELECT vector_id, embedding FROM chunks WHERE vector_id > ? AND deleted = 0 "
+                "ORDER BY vector_id LIMIT 8192",
+                (self._max_id,)
+            ).fetchall()
+            if not rows:
+                break
+            ids = np.array([row[0] for row in rows], dtype=np.int64)
+            vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32)
+            self._index.add_with_ids(vectors.reshape(len(rows), self.dimension), ids)
+            self._max_id = int(ids[-1])
+            added += len(rows)
+        self._unsaved += added
+        return added
+
+    def _sync(self):
+        """Recoge la compactación o los documentos añadidos por otros procesos"""
+        if self._read_generation() != self._generation:
+            self._load()
+        else:
+            self._catch_up()
+
+    def save(self):
+        import faiss
+        with self._lock:
+            if self._generation is not None and self._read_generation() != self._generation:
+                # Otro proceso ha compactado: no pisar su índice con uno anterior
+                return
+            tmp_path = f"{self.index_path}.tmp{os.getpid()}"
+            faiss.write_index(self._index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+            self._unsaved = 0
+
+    # Documentos
+    def __contains__(self, doc_id: str) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM documents WHERE doc_id = ? AND deleted = 0", (doc_id,)
+        ).fetchone()
+        return row is not None
+
+    def is_excluded(self, doc_id: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM excluded WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row is not None
+
+    def add_document(self, doc_id: str, chunks: Sequence[str], embeddings,
+                     spans: Optional[Sequence[Span]] = None,
+                     pages: Optional[Sequence[str]] = None,
+                     source: Optional[str] = None) -> int:
+        """Anexa los chunks de un documento (sin reconstruir el índice); devuelve cuántos"""
+        if hasattr(embeddings, "cpu"):
+            embeddings = embeddings.cpu().numpy()
+        vectors = _normalize(embeddings)
+        if len(chunks) != len(vectors):
+            raise ValueError("chunks and embeddings must have the same length")
+        if spans is not None and len(spans) != len(chunks):
+            spans = None
+        starts = page_offsets(pages) if pages else None
+
+        rows = []
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors)):
+            char_start, char_end = spans[i] if spans is not None else (None, None)
+            page_start = page_end = None
+            if starts is not None and spans is not None:
+                page_start = bisect_right(starts, char_start) - 1
+                page_end = bisect_right(starts, max(char_end - 1, char_start)) - 1
+            rows.append((doc_id, i, page_start, page_end, char_start, char_end, chunk, vector.tobytes()))
+
+        with self._lock:
+            with self.conn:
+                # Reserva de escritura: otro worker puede estar añadiendo el mismo documento
+                self.conn.execute("BEGIN IMMEDIATE")
+                if doc_id in self or self.is_excluded(doc_id):
+                    return 0
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO documents (doc_id, source, num_chunks, added_at, deleted) "
+                    "VALUES (?, ?, ?, ?, 0)",
+                    (doc_id, source, len(rows), datetime.now().isoformat())
+                )
+                self.conn.executemany(
+                    "INSERT INTO chunks (doc_id, chunk, page_start, page_end, char_start, char_end, "
+                    "text, embedding) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            self._sync()
+            if self.index_type == "ivf" and not self._trained_ivf() and self._index.ntotal >= 39 * self.nlist:
+                # Vectores suficientes para entrenar los centroides IVF
+                self.compact()
+            elif self._unsaved >= self.save_every:
+                self.save()
+        return len(rows)
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Marca los chunks del documento como borrados (se eliminan al compactar) y lo excluye"""
+        with self._lock, self.conn:
+            updated = self.conn.execute(
+                "UPDATE documents SET deleted = 1 WHERE doc_id = ? AND deleted = 0", (doc_id,)
+            ).rowcount
+            self.conn.execute("UPDATE chunks SET deleted = 1 WHERE doc_id = ?", (doc_id,))
+            if updated:
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO excluded (doc_id, excluded_at) VALUES (?, ?)",
+                    (doc_id, datetime.now().isoformat())
+                )
+        return updated > 0
+
+    def compact(self) -> Dict[str, int]:
+        """Reconstruye el índice solo con las filas vivas y purga los tombstones"""
+        with self._lock:
+            total, removed = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM chunks"
+            ).fetchone()
+
+            training = None
+            if self.index_type == "ivf":
+                sample = self.conn.execute(
+                    "SELECT embedding FROM chunks WHERE deleted = 0 ORDER BY RANDOM() LIMIT ?",
+                    (64 * self.nlist,)
+                ).fetchall()
+                if sample:
+                    training = np.frombuffer(b"".join(row[0] for row in sample), dtype=np.float32)
+                    training = training.reshape(len(sample), self.dimension)
+
+            with self.conn:
+                self.conn.execute("DELETE FROM chunks WHERE deleted = 1")
+                self.conn.execute("DELETE FROM documents WHERE deleted = 1")
+
+            self._index = self._new_index(training)
+            self._max_id = 0
+            self._catch_up()
+            self.save()
+            # La nueva generación se publica con index.faiss ya escrito: los demás procesos lo recargan
+            with self.conn:
+                generation = int(self._read_generation()) + 1
+                self.conn.execute(
+                    "UPDATE meta SET value = ? WHERE key = 'generation'", (str(generation),)
+                )
+            self._generation = str(generation)
+            logger.info(f"Compacted corpus index: {total - removed} chunks kept, {removed} removed")
+            return {"chunks": total - removed, "removed": removed}
+
+    # Consultas
+    def search(self, vector: np.ndarray, top_k: int = 10,
+               exclude: Iterable[str] = (), oversample: int = 4) -> List[Dict]:
+        """Pasajes más parecidos (coseno) con documento, páginas y offsets"""
+        exclude = set(exclude)
+        query = _normalize(np.asarray(vector).reshape(1, -1))
+        with self._lock:
+            self._sync()
+            total = self._index.ntotal
+            if not total or top_k <= 0:
+                return []
+            # Ampliar la búsqueda mientras los tombstones/exclusiones dejen huecos
+            k = min(total, top_k * oversample)
+            while True:
+                scores, ids = self._index.search(query, k)
+                results = self._passages(ids[0], scores[0], exclude)
+                if len(results) >= top_k or k >= total:
+                    return results[:top_k]
+                k = min(total, k * 4)
+
+    def _passages(self, ids: np.ndarray, scores: np.ndarray, exclude: set) -> List[Dict]:
+        hits = [(int(i), float(s)) for i, s in zip(ids, scores) if i >= 0]
+        if not hits:
+            return []
+        placeholders = ",".join("?" * len(hits))
+        rows = self.conn.execute(
+            f"SELECT c.vector_id, c.doc_id, d.source, c.chunk, c.page_start, c.page_end, "
+            f"c.char_start, c.char_end, c.text FROM chunks c JOIN documents d ON d.doc_id = c.doc_id "
+            f"WHERE c.vector_id IN ({placeholders}) AND c.deleted = 0",
+            [vector_id for vector_id, _ in hits]
+        ).fetchall()
+        by_id = {row[0]: row for row in rows}
+
+        passages = []
+        for vector_id, score in hits:
+            row = by_id.get(vector_id)
+            if row is None or row[1] in exclude:
+                continue
+            passages.append({
+                "document_id": row[1],
+                "source": row[2],
+                "chunk": row[3],
+                "page_start": row[4],
+                "page_end": row[5],
+                "char_start": row[6],
+                "char_end": row[7],
+                "text": row[8],
+                "score": score
+            })
+        return passages
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents = self.conn.execute("SELECT COUNT(*) FROM documents WHERE deleted = 0").fetchone()[0]
+            chunks, tombstones = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM chunks"
+            ).fetchone()
+            return {
+                "documents": documents,
+                "chunks": chunks - tombstones,
+                "tombstones": tombstones,
+                "indexed_vectors": self._index.ntotal,
+                "index_type": self.index_type,
+                "generation": int(self._generation)
+            }
+
+    def close(self):
+        with self._lock:
+            if self._unsaved:
+                self.save()
+            self.conn.close()
@@ -0,0 +1,337 @@
+"""
+Detección de documentos casi duplicados en un corpus con MinHash + LSH
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+import hashlib
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+
+from .fast_similarity import shingle_hashes
+
+logger = logging.getLogger(__name__)
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Versión del cálculo de firmas (shingling + MinHash); subirla invalida las firmas guardadas
+SIGNATURE_VERSION = 2
+
+
+class MinHasher:
+    """Firmas MinHash vectorizadas con permutaciones (a*x + b) mod p"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1, block_size: int = 8192):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.block_size = block_size
+        self.a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        """Firma MinHash (uint32) de un conjunto de hashes de shingles"""
+        signature = np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # Por bloques para acotar la memoria en documentos grandes
+        for start in range(0, len(shingles), self.block_size):
+            block = shingles[start:start + self.block_size, np.newaxis]
+            permuted = np.bitwise_and((block * self.a + self.b) % MERSENNE_PRIME, MAX_HASH)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+        """Estimación de la similitud de Jaccard a partir de dos firmas"""
+        return float(np.mean(signature1 == signature2))
+
+
+class CorpusDeduplicator:
+    """Índice LSH persistente (SQLite) de firmas MinHash del corpus"""
+
+    def __init__(
+        self,
+        db_path: str,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        threshold: float = 0.8,
+        text_loader: Optional[Callable[[str], Optional[str]]] = None,
+        document_loader: Optional[Callable[[str], Optional[str]]] = None
+    ):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        # Recupera el texto de un documento indexado por su origen (verificación y re-firmado)
+        self.text_loader = text_loader
+        # Recupera el texto de un documento indexado por su id (re-firmado)
+        self.document_loader = document_loader
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._create_schema()
+        self._check_signature_format()
+
+    def _create_schema(self):
+        with self._lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    doc_id TEXT PRIMARY KEY,
+                    source TEXT,
+                    signature BLOB NOT NULL,
+                    num_shingles INTEGER,
+                    added_at TEXT
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    doc_id TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_buckets ON buckets (band, bucket);
+                CREATE INDEX IF NOT EXISTS idx_documents_source ON documents (source);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS stale (
+                    doc_id TEXT PRIMARY KEY
+                );
+            """)
+
+    @property
+    def signature_format(self) -> str:
+        """Todo lo que determina las firmas y los buckets guardados"""
+        return f"{SIGNATURE_VERSION}:{self.hasher.num_perm}:{self.bands}:{self.shingle_size}"
+
+    def _check_signature_format(self):
+        """Marca como pendientes las firmas guardadas con otro formato (o sin versión)
+
+        Solo marca: el re-firmado (reindex) lo lanza quien crea el índice, en segundo
+        plano o desde la CLI. Mientras tanto esos documentos no tienen buckets y no
+        aparecen como candidatos.
+        """
+        with self._lock, self.conn:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'signature_format'").fetchone()
+            if row is not None and row[0] == self.signature_format:
+                return
+            stale = self.conn.execute(
+                "INSERT OR IGNORE INTO stale (doc_id) SELECT doc_id FROM documents"
+            ).rowcount
+            self.conn.execute("DELETE FROM buckets")
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('signature_format', ?)",
+                (self.signature_format,)
+            )
+        if stale:
+            logger.warning(
+                f"Dedup signatures have format {row[0] if row else 'unversioned'}, "
+                f"expected {self.signature_format}: {stale} documents pending re-signing"
+            )
+
+    def pending_reindex(self) -> int:
+        """Documentos cuya firma hay que recalcular"""
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM stale").fetchone()[0]
+
+    def reindex(self) -> Dict[str, int]:
+        """Recalcula las firmas pendientes a partir del texto de cada documento
+
+        Los documentos cuyo texto no se puede cargar se eliminan del índice para
+        que se indexen de nuevo.
+        """
+        with self._lock:
+            documents = self.conn.execute(
+                "SELECT d.doc_id, d.source FROM stale s JOIN documents d ON d.doc_id = s.doc_id"
+            ).fetchall()
+
+        resigned = dropped = 0
+        for doc_id, source in documents:
+            text = self._load_text(doc_id, source)
+            if text is None:
+                with self._lock, self.conn:
+                    self.conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+                    self.conn.execute("DELETE FROM stale WHERE doc_id = ?", (doc_id,))
+                dropped += 1
+                continue
+            signature, num_shingles = self.compute_signature(text)
+            self._store_signature(doc_id, signature, num_shingles, source)
+            resigned += 1
+
+        # Filas marcadas de documentos que ya no existen
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM stale WHERE doc_id NOT IN (SELECT doc_id FROM documents)")
+        if dropped:
+            logger.warning(f"Dropped {dropped} dedup documents whose text is unavailable; index them again")
+        logger.info(f"Re-signed {resigned} dedup documents")
+        return {"resigned": resigned, "dropped": dropped}
+
+    def _load_text(self, doc_id: str, source: str) -> Optional[str]:
+        for loader, key in ((self.document_loader, doc_id), (self.text_loader, source)):
+            if loader is None:
+                continue
+            try:
+                text = loader(key)
+            except Exception as e:
+                logger.warning(f"Could not load text of {doc_id[:12]}: {e}")
+                continue
+            if text is not None:
+                return text
+        return None
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        """Clave (int64) de cada banda de la firma"""
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            digest = hashlib.blake2b(chunk.tobytes(), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    def compute_signature(self, text: str) -> Tuple[np.ndarray, int]:
+        shingles = shingle_hashes(text, self.shingle_size)
+        return self.hasher.signature(shingles), len(shingles)
+
+    def has_source(self, source: str) -> bool:
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM documents WHERE source = ?", (source,)).fetchone()
+        return row is not None
+
+    def add(self, doc_id: str, text: str, source: str = "") -> List[Dict]:
+        """Indexa un documento y devuelve sus casi duplicados ya presentes"""
+        signature, num_shingles = self.compute_signature(text)
+        return self.add_signature(doc_id, signature, num_shingles, source)
+
+    def add_signature(self, doc_id: str, signature: np.ndarray, num_shingles: int, source: str = "") -> List[Dict]:
+        """Indexa una firma ya calculada (p. ej. en un proceso worker)"""
+        # Sin shingles (PDF escaneado o vacío) la firma es siempre la misma: no es duplicado de nada
+        matches = self._query_signature(signature, exclude=doc_id) if num_shingles else []
+        self._store_signature(doc_id, signature, num_shingles, source)
+        return matches
+
+    def _store_signature(self, doc_id: str, signature: np.ndarray, num_shingles: int, source: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE doc_id = ?", (doc_id,))
+            self.conn.execute("DELETE FROM stale WHERE doc_id = ?", (doc_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)",
+                (doc_id, source, signature.tobytes(), num_shingles, datetime.now().isoformat())
+            )
+            if num_shingles:
+                self.conn.executemany(
+                    "INSERT INTO buckets VALUES (?, ?, ?)",
+                    [(band, key, doc_id) for band, key in enumerate(self._band_keys(signature))]
+                )
+
+    def query(self, text: str, exclude: Optional[str] = None) -> List[Dict]:
+        """Busca casi duplicados de un texto sin indexarlo"""
+        signature, num_shingles = self.compute_signature(text)
+        if not num_shingles:
+            return []
+        return self._query_signature(signature, exclude)
+
+    def _query_signature(self, signature: np.ndarray, exclude: Optional[str] = None) -> List[Dict]:
+        candidates = set()
+        with self._lock:
+            for band, key in enumerate(self._band_keys(signature)):
+                rows = self.conn.execute(
+                    "SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?", (band, key)
+                ).fetchall()
+                candidates.update(row[0] for row in rows)
+        candidates.discard(exclude)
+
+        matches = []
+        for doc_id, source, other in self._load_signatures(candidates):
+            similarity = self.hasher.jaccard(signature, other)
+            if similarity >= self.threshold:
+                matches.append({'doc_id': doc_id, 'source': source, 'estimated_jaccard': similarity})
+
+        matches.sort(key=lambda m: m['estimated_jaccard'], reverse=True)
+        return matches
+
+    def _load_signatures(self, doc_ids: Iterable[str]) -> List[Tuple[str, str, np.ndarray]]:
+        doc_ids = list(doc_ids)
+        rows = []
+        # Por lotes: SQLite limita el número de parámetros de una consulta
+        for start in range(0, len(doc_ids), 500):
+            batch = doc_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows.extend(self.conn.execute(
+                    f"SELECT doc_id, source, signature FROM documents WHERE doc_id IN ({placeholders})",
+                    batch
+                ).fetchall())
+        return [(doc_id, source, np.frombuffer(blob, dtype=np.uint32)) for doc_id, source, blob in rows]
+
+    def find_duplicates(self) -> List[Dict]:
+        """Todos los pares candidatos del corpus (mismo bucket en alguna banda)"""
+        with self._lock:
+            # Los documentos sin shingles no tienen buckets, salvo en índices anteriores
+            rows = self.conn.execute("""
+                SELECT b1.doc_id, b2.doc_id
+                FROM buckets b1 JOIN buckets b2
+                  ON b1.band = b2.band AND b1.bucket = b2.bucket AND b1.doc_id < b2.doc_id
+                JOIN documents d1 ON d1.doc_id = b1.doc_id AND d1.num_shingles > 0
+                JOIN documents d2 ON d2.doc_id = b2.doc_id AND d2.num_shingles > 0
+                GROUP BY b1.doc_id, b2.doc_id
+            """).fetchall()
+
+        # Una sola consulta para las firmas de todos los candidatos
+        signatures = {
+            doc_id: (source, signature)
+            for doc_id, source, signature in self._load_signatures({doc_id for row in rows for doc_id in row})
+        }
+        pairs = []
+        for doc_id1, doc_id2 in rows:
+            (source1, sig1), (source2, sig2) = signatures[doc_id1], signatures[doc_id2]
+            similarity = self.hasher.jaccard(sig1, sig2)
+            if similarity >= self.threshold:
+                pairs.append({
+                    'doc_id1': doc_id1, 'source1': source1,
+                    'doc_id2': doc_id2, 'source2': source2,
+                    'estimated_jaccard': similarity
+                })
+
+        pairs.sort(key=lambda p: p['estimated_jaccard'], reverse=True)
+        return pairs
+
+    def verify(self, text: str, match: Dict, text_analyzer=None) -> Dict:
+        """Confirma un candidato con el análisis básico de TextAnalyzer"""
+        if self.text_loader is None:
+            return match
+        other_text = self.text_loader(match['source'])
+        if other_text is None:
+            return match
+
+        if text_analyzer is None:
+            from .text_analyzer import TextAnalyzer
+            text_analyzer = TextAnalyzer()
+        basic = text_analyzer.basic_comparison(text, other_text)
+        return {**match, 'verified_similarity': basic['similarity_ratio']}
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            documents = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {
+            'documents': documents, 'pending_reindex': self.pending_reindex(),
+            'bands': self.bands, 'rows_per_band': self.rows
+        }
+
+
+def extract_signature(pdf_path: str, num_perm: int = 128, shingle_size: int = 5) -> Tuple[str, np.ndarray, int]:
+    """Extrae un PDF y calcula su firma (pensado para ProcessPoolExecutor)
+
+    El id es el del almacén de documentos (sha256 del PDF), el mismo que usa la API.
+    """
+    from .document_store import hash_stream
+    from .pdf_processor import PDFProcessor
+
+    with open(pdf_path, "rb") as f:
+        doc_id = hash_stream(f)
+    text = PDFProcessor().extract_text(pdf_path).text
+    shingles = shingle_hashes(text, shingle_size)
+    return doc_id, MinHasher(num_perm).signature(shingles), len(shingles)
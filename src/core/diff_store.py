@@ -0,0 +1,125 @@
+"""
+Diff compacto por rangos de líneas (opcodes) y almacenamiento paginado del diff completo
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import difflib
+import logging
+
+from src.utils.serialization import dumps, loads
+from .llm_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Hunk compacto: [tag, inicio_doc1, fin_doc1, inicio_doc2, fin_doc2] (líneas, fin exclusivo)
+Hunk = List[Any]
+
+
+def line_hunks(lines1: List[str], lines2: List[str]) -> List[Hunk]:
+    """Rangos de líneas que difieren entre dos textos (sin copiar el contenido)"""
+    matcher = difflib.SequenceMatcher(None, lines1, lines2)
+    return [
+        [tag, i1, i2, j1, j2]
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def count_changes(hunks: List[Hunk]) -> Tuple[int, int]:
+    """Líneas añadidas y eliminadas de una lista de hunks"""
+    added = sum(j2 - j1 for _, _, _, j1, j2 in hunks)
+    removed = sum(i2 - i1 for _, i1, i2, _, _ in hunks)
+    return added, removed
+
+
+def render_hunks(lines1: List[str], lines2: List[str], hunks: List[Hunk]) -> List[Dict]:
+    """Hunks con el texto de las líneas eliminadas y añadidas"""
+    return [
+        {
+            'tag': tag,
+            'doc1_start': i1,
+            'doc1_end': i2,
+            'doc2_start': j1,
+            'doc2_end': j2,
+            'removed': lines1[i1:i2],
+            'added': lines2[j1:j2]
+        }
+        for tag, i1, i2, j1, j2 in hunks
+    ]
+
+
+class DiffStore:
+    """Guarda el diff completo de un resultado y lo sirve por páginas (Redis o memoria)"""
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl_seconds: int = 3600,
+        max_entries: int = 256,
+        namespace: str = "diff"
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.redis = self._connect_redis(redis_url)
+
+    def _connect_redis(self, redis_url: Optional[str]):
+        if not redis_url:
+            return None
+        try:
+            import redis
+            client = redis.Redis.from_url(redis_url, socket_timeout=1.0)
+            client.ping()
+            return client
+        except Exception as e:
+            logger.warning(f"Redis unavailable for diff store, using memory only: {e}")
+            return None
+
+    def _key(self, diff_id: str) -> str:
+        return f"{self.namespace}:{diff_id}"
+
+    def save(self, diff_id: str, hunks: List[Dict]):
+        """Guarda los hunks renderizados (uno por elemento de lista en Redis)"""
+        if self.redis is not None and hunks:
+            try:
+                key = self._key(diff_id)
+                pipe = self.redis.pipeline()
+                pipe.delete(key)
+                for start in range(0, len(hunks), 500):
+                    pipe.rpush(key, *[dumps(h) for h in hunks[start:start + 500]])
+                pipe.expire(key, self.ttl_seconds)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.warning(f"Error writing diff to Redis, keeping it in memory: {e}")
+        self.memory.set(diff_id, hunks)
+
+    def page(self, diff_id: str, offset: int = 0, limit: int = 50) -> Optional[Dict]:
+        """Página de hunks de un diff guardado, o None si no existe o expiró"""
+        if self.redis is not None:
+            try:
+                key = self._key(diff_id)
+                pipe = self.redis.pipeline()
+                pipe.llen(key)
+                pipe.lrange(key, offset, offset + limit - 1)
+                total, items = pipe.execute()
+                if total:
+                    return self._page(diff_id, total, offset, limit, [loads(i) for i in items])
+            except Exception as e:
+                logger.warning(f"Error reading diff from Redis: {e}")
+
+        hunks = self.memory.get(diff_id)
+        if hunks is None:
+            return None
+        return self._page(diff_id, len(hunks), offset, limit, hunks[offset:offset + limit])
+
+    @staticmethod
+    def _page(diff_id: str, total: int, offset: int, limit: int, hunks: List[Dict]) -> Dict:
+        return {
+            'diff_id': diff_id,
+            'total_hunks': total,
+            'offset': offset,
+            'limit': limit,
+            'next_offset': offset + limit if offset + limit < total else None,
+            'hunks': hunks
+        }
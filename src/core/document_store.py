@@ -0,0 +1,314 @@
+"""
+Almacén de documentos por hash de contenido (MinIO/S3 o sistema de ficheros local)
+
+Cada documento se guarda bajo ``documents/{doc_id}/``:
+    original.pdf              PDF subido (sin duplicados: mismo contenido, mismo id)
+    content.bin               PDFContent extraído (orjson + compresión)
+    embeddings/{clave}.npz    chunks, embeddings y vector de documento (modelo + chunking)
+
+El contenido guarda la configuración de extracción (tablas, OCR); si no coincide
+con la del PDFProcessor actual se vuelve a extraer del PDF original.
+"""
+
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+import dataclasses
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from src.utils.hashing import content_hash
+from src.utils.serialization import pack, unpack
+from .document_vectors import document_vector
+from .pdf_processor import PDFContent
+from .structure import load_structure
+from .text_store import TextStore
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+PART_SIZE = 10 * 1024 * 1024
+
+
+def hash_stream(stream: BinaryIO, chunk_size: int = CHUNK_SIZE) -> str:
+    """sha256 de un fichero leído por bloques; deja el cursor al inicio"""
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class DocumentStore(ABC):
+    """Interfaz común; las subclases implementan el acceso a objetos por clave"""
+
+    # Si está configurado, el texto de los documentos grandes se carga mapeado desde disco
+    text_store: Optional[TextStore] = None
+
+    @abstractmethod
+    def _put_stream(self, key: str, stream: BinaryIO, length: int, content_type: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _iter(self, key: str, chunk_size: int) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _download(self, key: str, path: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def _exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @staticmethod
+    def _pdf_key(doc_id: str) -> str:
+        return f"documents/{doc_id}/original.pdf"
+
+    @staticmethod
+    def _content_key(doc_id: str) -> str:
+        return f"documents/{doc_id}/content.bin"
+
+    @staticmethod
+    def _embeddings_key(doc_id: str, key: str) -> str:
+        return f"documents/{doc_id}/embeddings/{key.replace('/', '__')}.npz"
+
+    def _put_bytes(self, key: str, data: bytes, content_type: str = "application/octet-stream"):
+        self._put_stream(key, io.BytesIO(data), len(data), content_type)
+
+    # PDF original
+    def put_pdf(self, stream: BinaryIO) -> Tuple[str, bool]:
+        """Guarda un PDF bajo su hash; devuelve (doc_id, creado)"""
+        doc_id = hash_stream(stream)
+        if self._exists(self._pdf_key(doc_id)):
+            return doc_id, False
+
+        stream.seek(0, os.SEEK_END)
+        length = stream.tell()
+        stream.seek(0)
+        self._put_stream(self._pdf_key(doc_id), stream, length, "application/pdf")
+        stream.seek(0)
+        return doc_id, True
+
+    @staticmethod
+    def _is_current(content: PDFContent, processor) -> bool:
+        """El contenido se extrajo con la misma configuración que tiene `processor`"""
+        return content.metadata.get("extraction") == processor.extraction_profile
+
+    def ingest(self, stream: BinaryIO, processor) -> Tuple[str, PDFContent, bool]:
+        """Guarda el PDF y devuelve (doc_id, contenido, creado); solo se extrae si falta o cambió la configuración"""
+        doc_id, created = self.put_pdf(stream)
+        content = None if created else self.load_content(doc_id)
+        if content is None or not self._is_current(content, processor):
+            content = processor.extract_text(stream)
+            self.save_content(doc_id, content)
+        return doc_id, content, created
+
+    def load_current_content(self, doc_id: str, processor) -> Optional[PDFContent]:
+        """Contenido guardado, re-extraído del PDF original si la configuración cambió"""
+        content = self.load_content(doc_id)
+        if content is not None and self._is_current(content, processor):
+            return content
+        data = self._get_bytes(self._pdf_key(doc_id))
+        if data is None:
+            return content
+        content = processor.extract_text(io.BytesIO(data))
+        self.save_content(doc_id, content)
+        return content
+
+    def has_pdf(self, doc_id: str) -> bool:
+        return self._exists(self._pdf_key(doc_id))
+
+    def iter_pdf(self, doc_id: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Lee el PDF por bloques (para respuestas en streaming)"""
+        return self._iter(self._pdf_key(doc_id), chunk_size)
+
+    def download_pdf(self, doc_id: str, path: str):
+        self._download(self._pdf_key(doc_id), path)
+
+    # Contenido extraído
+    def save_content(self, doc_id: str, content: PDFContent):
+        fields = {field.name: getattr(content, field.name) for field in dataclasses.fields(content)}
+        # La estructura se guarda en columnas; sus textos son offsets sobre `text`
+        fields["structure"] = content.structure.to_columns()
+        fields["text"] = str(content.text)
+        fields["pages"] = list(content.pages)
+        self._put_bytes(self._content_key(doc_id), pack(fields))
+
+    def load_content(self, doc_id: str) -> Optional[PDFContent]:
+        data = self._get_bytes(self._content_key(doc_id))
+        if data is None:
+            return None
+        fields = unpack(data)
+        if self.text_store is not None:
+            fields["text"], fields["pages"] = self.text_store.map(fields["text"], fields["pages"])
+        fields["structure"] = load_structure(fields["text"], fields.get("structure"))
+        return PDFContent(**fields)
+
+    # Embeddings
+    def save_embeddings(self, doc_id: str, key: str, chunks: List[str], embeddings,
+                        text_hash: Optional[str] = None) -> None:
+        if hasattr(embeddings, "cpu"):
+            embeddings = embeddings.cpu().numpy()
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            text_hash=np.array(text_hash or ""),
+            chunks=np.array(chunks, dtype=str),
+            embeddings=np.asarray(embeddings, dtype=np.float32),
+            document_vector=document_vector(chunks, embeddings)
+        )
+        self._put_bytes(self._embeddings_key(doc_id, key), buffer.getvalue())
+
+    def load_embeddings(self, doc_id: str, key: str,
+                        text_hash: Optional[str] = None) -> Optional[Tuple[List[str], np.ndarray]]:
+        """Chunks y embeddings guardados; None si faltan o (con `text_hash`) son de otro texto"""
+        data = self._get_bytes(self._embeddings_key(doc_id, key))
+        if data is None:
+            return None
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            if text_hash is not None and ("text_hash" not in archive.files or str(archive["text_hash"]) != text_hash):
+                return None
+            return archive["chunks"].tolist(), archive["embeddings"]
+
+    def load_document_vector(self, doc_id: str, key: str) -> Optional[np.ndarray]:
+        """Vector de documento guardado junto a los embeddings de sus chunks"""
+        data = self._get_bytes(self._embeddings_key(doc_id, key))
+        if data is None:
+            return None
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            if "document_vector" in archive.files:
+                return archive["document_vector"]
+            return document_vector(archive["chunks"].tolist(), archive["embeddings"])
+
+    def get_or_encode(self, doc_id: str, text: str, analyzer) -> Tuple[List[str], object]:
+        """Chunks y embeddings del documento, calculados con `analyzer` solo si faltan"""
+        # El texto cambia si el documento se re-extrae con otra configuración
+        text_hash = content_hash(text)
+        cached = self.load_embeddings(doc_id, analyzer.cache_key, text_hash)
+        if cached is not None:
+            return cached
+        chunks, embeddings = analyzer.encode_document(text)
+        self.save_embeddings(doc_id, analyzer.cache_key, chunks, embeddings, text_hash)
+        return chunks, embeddings
+
+
+class LocalDocumentStore(DocumentStore):
+    """Sustituto en sistema de ficheros (desarrollo y tests)"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _put_stream(self, key: str, stream: BinaryIO, length: int, content_type: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: nunca se lee un objeto a medio escribir
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _iter(self, key: str, chunk_size: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+    def _download(self, key: str, path: str):
+        shutil.copyfile(self._path(key), path)
+
+    def _exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+
+class MinioDocumentStore(DocumentStore):
+    """Almacén en MinIO/S3 compartido entre réplicas"""
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str,
+                 bucket: str, secure: bool = False):
+        from minio import Minio
+        self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        self.bucket = bucket
+        if not self.client.bucket_exists(bucket):
+            self.client.make_bucket(bucket)
+
+    def _put_stream(self, key: str, stream: BinaryIO, length: int, content_type: str):
+        # Subida multipart por partes: no se carga el fichero entero en memoria
+        self.client.put_object(
+            self.bucket, key, stream, length,
+            part_size=PART_SIZE,
+            content_type=content_type
+        )
+
+    def _get_bytes(self, key: str) -> Optional[bytes]:
+        from minio.error import S3Error
+        try:
+            response = self.client.get_object(self.bucket, key)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _iter(self, key: str, chunk_size: int) -> Iterator[bytes]:
+        response = self.client.get_object(self.bucket, key)
+        try:
+            yield from response.stream(chunk_size)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _download(self, key: str, path: str):
+        self.client.fget_object(self.bucket, key, path)
+
+    def _exists(self, key: str) -> bool:
+        from minio.error import S3Error
+        try:
+            self.client.stat_object(self.bucket, key)
+            return True
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject"):
+                return False
+            raise
+
+
+def create_document_store(backend: str = "minio", local_path: str = "/app/cache/documents",
+                          text_store: Optional[TextStore] = None, **minio_kwargs) -> DocumentStore:
+    """Crea el almacén de documentos; usa el sistema de ficheros si MinIO no está disponible"""
+    store = None
+    if backend == "minio":
+        try:
+            store = MinioDocumentStore(**minio_kwargs)
+            logger.info("Using MinIO document store")
+        except Exception as e:
+            logger.warning(f"MinIO unavailable, using local document store: {e}")
+    if store is None:
+        store = LocalDocumentStore(local_path)
+    store.text_store = text_store
+    return store
@@ -0,0 +1,188 @@
+"""
+Vectores de documento y matriz de corpus en disco para búsqueda de documentos similares
+
+El vector de un documento es la media de los embeddings de sus chunks ponderada
+por la longitud de cada chunk y normalizada (L2): el coseno entre dos vectores
+de documento es la similitud general de EmbeddingAnalyzer.
+
+DocumentVectorIndex guarda todos los vectores en una matriz float32 de solo
+anexado que se lee con memory-map; buscar los más parecidos a un documento es
+un único producto matriz-vector más una selección top-k:
+    vectors.f32   filas de `dimension` float32
+    ids.bin       doc_id (64 bytes ASCII) de cada fila
+    deleted.bin   doc_id de los documentos borrados (no aparecen ni se vuelven a añadir)
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import fcntl
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ID_BYTES = 64
+
+
+def document_vector(chunks: Sequence[str], embeddings) -> np.ndarray:
+    """Media de los embeddings ponderada por longitud de chunk, normalizada"""
+    if hasattr(embeddings, "cpu"):
+        embeddings = embeddings.cpu().numpy()
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    weights = np.array([len(chunk) for chunk in chunks], dtype=np.float32)
+    if not len(embeddings) or weights.sum() == 0:
+        return np.zeros(embeddings.shape[1] if embeddings.ndim == 2 else 0, dtype=np.float32)
+    vector = weights @ embeddings / weights.sum()
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class DocumentVectorIndex:
+    """Matriz de vectores de documento en disco (memory-map), con anexado entre procesos"""
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.ids_path = os.path.join(directory, "ids.bin")
+        self.deleted_path = os.path.join(directory, "deleted.bin")
+        self.lock_path = os.path.join(directory, ".lock")
+        for path in (self.vectors_path, self.ids_path, self.deleted_path):
+            open(path, "ab").close()
+        self._lock = threading.Lock()
+        self._rows = 0
+        self._matrix = np.empty((0, dimension), dtype=np.float32)
+        self._ids = np.empty(0, dtype=f"S{ID_BYTES}")
+        self._positions: Dict[str, int] = {}
+        self._deleted: Set[str] = set()
+        self._deleted_bytes = 0
+
+    @contextmanager
+    def _file_lock(self):
+        # Varios workers de gunicorn anexan sobre los mismos ficheros
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _truncate_partial_rows(self):
+        """Descarta vectores o ids sin pareja (escritura interrumpida); requiere el flock"""
+        rows = min(
+            os.path.getsize(self.vectors_path) // (4 * self.dimension),
+            os.path.getsize(self.ids_path) // ID_BYTES
+        )
+        deleted = os.path.getsize(self.deleted_path) // ID_BYTES * ID_BYTES
+        for path, size in ((self.vectors_path, rows * 4 * self.dimension), (self.ids_path, rows * ID_BYTES),
+                           (self.deleted_path, deleted)):
+            if os.path.getsize(path) != size:
+                logger.warning(f"Truncating {path} to {rows} complete rows")
+                os.truncate(path, size)
+
+    def _refresh_deleted(self):
+        """Lee los ids borrados que otros procesos hayan anexado"""
+        size = os.path.getsize(self.deleted_path) // ID_BYTES * ID_BYTES
+        if size == self._deleted_bytes:
+            return
+        with self._lock:
+            if size <= self._deleted_bytes:
+                return
+            with open(self.deleted_path, "rb") as f:
+                f.seek(self._deleted_bytes)
+                data = f.read(size - self._deleted_bytes)
+            for start in range(0, len(data), ID_BYTES):
+                self._deleted.add(data[start:start + ID_BYTES].rstrip(b"\0").decode("ascii"))
+            self._deleted_bytes = size
+
+    def _refresh(self):
+        """Vuelve a mapear los ficheros si otro proceso ha añadido filas"""
+        self._refresh_deleted()
+        rows = min(
+            os.path.getsize(self.vectors_path) // (4 * self.dimension),
+            os.path.getsize(self.ids_path) // ID_BYTES
+        )
+        if rows == self._rows:
+            return
+        with self._lock:
+            if rows <= self._rows:
+                return
+            matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+            ids = np.memmap(self.ids_path, dtype=f"S{ID_BYTES}", mode="r", shape=(rows,))
+            for row in range(self._rows, rows):
+                self._positions[ids[row].decode("ascii")] = row
+            self._matrix, self._ids, self._rows = matrix, ids, rows
+
+    def __len__(self) -> int:
+        self._refresh()
+        return self._rows - len(self._deleted)
+
+    def __contains__(self, doc_id: str) -> bool:
+        self._refresh()
+        return doc_id in self._positions and doc_id not in self._deleted
+
+    def add(self, doc_id: str, vector: np.ndarray) -> bool:
+        """Añade el vector de un documento; devuelve False si ya estaba o se borró"""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dimension:
+            raise ValueError(f"Expected vector of dimension {self.dimension}, got {vector.shape[0]}")
+        encoded_id = doc_id.encode("ascii")
+        if len(encoded_id) > ID_BYTES:
+            raise ValueError(f"Document id longer than {ID_BYTES} bytes: {doc_id}")
+
+        with self._file_lock():
+            self._truncate_partial_rows()
+            self._refresh()
+            if doc_id in self._positions or doc_id in self._deleted:
+                return False
+            # Primero el vector y después el id: una fila solo es visible con ambos escritos
+            with open(self.vectors_path, "ab") as f:
+                f.write(vector.tobytes())
+            with open(self.ids_path, "ab") as f:
+                f.write(encoded_id.ljust(ID_BYTES, b"\0"))
+        self._refresh()
+        return True
+
+    def delete(self, doc_id: str) -> bool:
+        """Excluye un documento de las búsquedas (su fila se conserva); False si no estaba"""
+        with self._file_lock():
+            self._truncate_partial_rows()
+            self._refresh()
+            if doc_id not in self._positions or doc_id in self._deleted:
+                return False
+            with open(self.deleted_path, "ab") as f:
+                f.write(doc_id.encode("ascii").ljust(ID_BYTES, b"\0"))
+        self._refresh()
+        return True
+
+    def search(self, vector: np.ndarray, top_k: int = 10,
+               exclude: Iterable[str] = ()) -> List[Tuple[str, float]]:
+        """Documentos con mayor similitud coseno al vector, de mayor a menor"""
+        self._refresh()
+        matrix, ids = self._matrix, self._ids
+        exclude = set(exclude) | self._deleted
+        if not len(matrix) or top_k <= 0:
+            return []
+
+        scores = matrix @ np.asarray(vector, dtype=np.float32).reshape(-1)
+        k = min(top_k + len(exclude), len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            doc_id = ids[row].decode("ascii")
+            if doc_id in exclude:
+                continue
+            results.append((doc_id, float(scores[row])))
+            if len(results) == top_k:
+                break
+        return results
+
+    def get(self, doc_id: str) -> Optional[np.ndarray]:
+        self._refresh()
+        row = self._positions.get(doc_id)
+        return None if row is None or doc_id in self._deleted else np.array(self._matrix[row])
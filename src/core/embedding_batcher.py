@@ -0,0 +1,246 @@
+"""
+Micro-batching de embeddings: un único worker agrupa las peticiones concurrentes
+"""
+
+from typing import Dict, List, Optional
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics
+embedding_queue_depth = Histogram(
+    'pdf_comparator_embedding_queue_depth',
+    'Pending embedding requests when a batch is formed',
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128)
+)
+embedding_batch_size = Histogram(
+    'pdf_comparator_embedding_batch_size',
+    'Texts encoded per model call',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+embedding_batch_requests = Histogram(
+    'pdf_comparator_embedding_batch_requests',
+    'Caller requests coalesced per model call',
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+embedding_queue_wait = Histogram(
+    'pdf_comparator_embedding_queue_wait_seconds',
+    'Time a request waits before its batch is encoded',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingBatcher:
+    """Agrupa peticiones de embeddings en lotes dentro de una ventana de espera máxima"""
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 result_timeout: float = 120.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.result_timeout = result_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue: "queue.Queue[_Request]" = None
+        self._worker: Optional[threading.Thread] = None
+
+    def _ensure_worker(self):
+        # Arranque perezoso y tras fork (gunicorn preload): los hilos no sobreviven al fork
+        if self._pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._worker is not None and self._worker.is_alive():
+                return
+            # Tras un fork la cola heredada no es fiable; si el worker murió en este
+            # proceso se conserva para no perder las peticiones ya encoladas
+            if self._pid != os.getpid() or self._queue is None:
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Encola textos; el future se resuelve con un array (len(texts), dim)"""
+        request = _Request(list(texts))
+        if not request.texts:
+            request.future.set_result(np.empty((0, self.dimension), dtype=np.float32))
+            return request.future
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Espera el resultado como mucho `timeout` segundos (result_timeout por defecto)"""
+        return self.submit(texts).result(timeout=timeout or self.result_timeout)
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _collect(self) -> List[_Request]:
+        """Primera petición disponible más las que lleguen dentro de la ventana"""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                self._process(batch)
+            except Exception as e:
+                # Ningún error debe matar al worker: las peticiones pendientes esperarían para siempre
+                logger.exception(f"Embedding batcher worker error: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _process(self, batch: List[_Request]):
+        # Las peticiones canceladas por quien esperaba no se codifican
+        batch[:] = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request in batch for text in request.texts]
+
+        now = time.monotonic()
+        embedding_queue_depth.observe(len(batch) + self._queue.qsize())
+        embedding_batch_size.observe(len(texts))
+        embedding_batch_requests.observe(len(batch))
+        for request in batch:
+            embedding_queue_wait.observe(now - request.enqueued_at)
+
+        try:
+            vectors = self.model.encode(
+                texts,
+                batch_size=self.max_batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} texts failed: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request in batch:
+            request.future.set_result(vectors[offset:offset + len(request.texts)])
+            offset += len(request.texts)
+
+
+class BatchedEmbeddings(Embeddings):
+    """Embeddings de LangChain servidos por un EmbeddingBatcher compartido"""
+
+    def __init__(self, batcher: EmbeddingBatcher, model_name: str, normalize: bool = True):
+        self.batcher = batcher
+        self.model_name = model_name
+        self.normalize = normalize
+
+    def postprocess(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalización aplicada a la salida del modelo (también a embeddings ya calculados)"""
+        if self.normalize and len(vectors):
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self.postprocess(self.batcher.encode(texts))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+
+_batchers: Dict[str, EmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def _load_model(model_name: str, device: Optional[str], backend: str, num_threads: int,
+                onnx_dir: str, onnx_quantize: bool, onnx_min_cosine: float):
+    if backend == "onnx":
+        from .onnx_embeddings import load_onnx_model
+        try:
+            model = load_onnx_model(model_name, onnx_dir, onnx_quantize, num_threads, onnx_min_cosine)
+            return model, "onnx-int8" if onnx_quantize else "onnx"
+        except Exception as e:
+            logger.warning(f"ONNX embedding backend unavailable, using torch: {e}")
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    return SentenceTransformer(model_name, device=device), f"torch/{device}"
+
+
+def get_embedding_batcher(model_name: str, device: Optional[str] = None,
+                          max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                          backend: str = "torch", num_threads: int = 0,
+                          onnx_dir: str = "/app/cache/onnx", onnx_quantize: bool = False,
+                          onnx_min_cosine: float = 0.98, result_timeout: float = 120.0) -> EmbeddingBatcher:
+    """Batcher (y modelo) compartido por proceso para cada modelo de embeddings"""
+    with _batchers_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            model, backend_name = _load_model(
+                model_name, device, backend, num_threads, onnx_dir, onnx_quantize, onnx_min_cosine
+            )
+            batcher = _batchers[model_name] = EmbeddingBatcher(
+                model, max_batch_size, max_wait_ms, result_timeout
+            )
+            logger.info(f"Embedding batcher for {model_name} on {backend_name} "
+                        f"(max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})")
+        return batcher
+
+
+def batcher_from_config(config: Dict) -> EmbeddingBatcher:
+    """Batcher a partir de la sección "embeddings" de Settings.get_langchain_config()"""
+    return get_embedding_batcher(
+        config["model_name"],
+        max_batch_size=config.get("batch_max_size", 64),
+        max_wait_ms=config.get("batch_max_wait_ms", 5.0),
+        backend=config.get("backend", "torch"),
+        num_threads=config.get("num_threads", 0),
+        onnx_dir=config.get("onnx_dir", "/app/cache/onnx"),
+        onnx_quantize=config.get("onnx_quantize", False),
+        onnx_min_cosine=config.get("onnx_min_cosine", 0.98),
+        result_timeout=config.get("batch_timeout", 120.0)
+    )
+
+
+def set_inference_threads(num_threads: int):
+    """Hilos de inferencia de los modelos ya cargados (p. ej. tras el fork de un worker)"""
+    for batcher in _batchers.values():
+        if hasattr(batcher.model, "set_num_threads"):
+            batcher.model.set_num_threads(num_threads)
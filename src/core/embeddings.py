@@ -1,26 +1,102 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+import difflib
 import torch
 
+from src.utils.tracing import span, traced
+from .chunking import DocumentEncoder, get_document_encoder
+from .embedding_batcher import EmbeddingBatcher, get_embedding_batcher
+from .page_alignment import PageAlignment, changed_texts, unchanged_chars
+
 class EmbeddingAnalyzer:
-    def __init__(self, model_name: str = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2'):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = 'sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2',
+                 batcher: Optional[EmbeddingBatcher] = None,
+                 encoder: Optional[DocumentEncoder] = None):
+        self.model_name = model_name
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model.to(self.device)
+        # Modelo, chunks y embeddings compartidos con LangChainHandler; las peticiones
+        # concurrentes se agrupan en el batcher
+        if encoder is None:
+            encoder = get_document_encoder(batcher or get_embedding_batcher(model_name, self.device))
+        self.encoder = encoder
+        self.batcher = encoder.batcher
+        self.chunker = encoder.chunker
+        self.model = self.batcher.model
+        # Clave de los embeddings guardados: cambian con el modelo y con el chunking
+        self.cache_key = f"{model_name}__{self.chunker.profile}"
+    
+    def _encode(self, chunks: List[str]) -> torch.Tensor:
+        with span("embeddings.encode", chunks=len(chunks)):
+            return torch.as_tensor(self.batcher.encode(chunks), device=self.device)
     
-    def semantic_comparison(self, text1: str, text2: str, chunk_size: int = 512) -> Dict:
+    @traced("embeddings.semantic")
+    def semantic_comparison(self, text1: str, text2: str) -> Dict:
         """Comparación semántica usando embeddings"""
-        # Dividir textos en chunks
-        chunks1 = self._create_chunks(text1, chunk_size)
-        chunks2 = self._create_chunks(text2, chunk_size)
+        chunks1, embeddings1 = self.encode_document(text1)
+        chunks2, embeddings2 = self.encode_document(text2)
+        
+        if not chunks1 or not chunks2:
+            # Documentos demasiado cortos para generar chunks
+            return self._results_without_chunks(
+                chunks1, chunks2, difflib.SequenceMatcher(None, text1, text2).ratio()
+            )
+        return self.compare_encoded(chunks1, embeddings1, chunks2, embeddings2)
+    
+    @traced("embeddings.incremental")
+    def incremental_semantic_comparison(self, pages1: List[str], pages2: List[str],
+                                        alignment: PageAlignment) -> Dict:
+        """Comparación semántica solo de las páginas cambiadas
+        
+        La similitud general pondera por caracteres: las páginas idénticas
+        aportan similitud 1 y las cambiadas la similitud de sus embeddings.
+        """
+        text1, text2 = changed_texts(pages1, pages2, alignment)
+        total_chars = sum(len(p) + 1 for p in pages1) + sum(len(p) + 1 for p in pages2)
+        same_chars = unchanged_chars(pages1, pages2, alignment)
+        
+        chunks1 = self.chunker.split_text(text1)
+        chunks2 = self.chunker.split_text(text2)
+        
+        if chunks1 and chunks2:
+            results = self.compare_encoded(
+                chunks1, self._encode(chunks1),
+                chunks2, self._encode(chunks2)
+            )
+            changed_similarity = results['overall_similarity']
+        else:
+            # Cambios demasiado cortos para generar chunks
+            changed_similarity = difflib.SequenceMatcher(None, text1, text2).ratio() if text1 or text2 else 1.0
+            results = self._results_without_chunks(chunks1, chunks2, changed_similarity)
+        
+        changed_chars = total_chars - same_chars
+        results['overall_similarity'] = (
+            (same_chars + changed_chars * changed_similarity) / total_chars if total_chars else 1.0
+        )
+        results['changed_similarity'] = changed_similarity
+        return results
+    
+    def encode_document(self, text: str) -> Tuple[List[str], torch.Tensor]:
+        """Divide un documento en chunks y genera sus embeddings (cacheados por hash)"""
+        chunks, embeddings = self.encoder.encode(text)
+        return chunks, torch.as_tensor(embeddings, device=self.device)
+    
+    @traced("embeddings.similarity")
+    def compare_encoded(self, chunks1: List[str], embeddings1: torch.Tensor,
+                        chunks2: List[str], embeddings2: torch.Tensor) -> Dict:
+        """Comparación semántica a partir de chunks y embeddings ya calculados"""
+        if not len(chunks1) or not len(chunks2):
+            # Sin chunks no hay embeddings que comparar (p. ej. embeddings guardados de un PDF escaneado)
+            return self._results_without_chunks(chunks1, chunks2, 1.0 if len(chunks1) == len(chunks2) else 0.0)
         
-        # Generar embeddings
-        embeddings1 = self.model.encode(chunks1, convert_to_tensor=True)
-        embeddings2 = self.model.encode(chunks2, convert_to_tensor=True)
+        # Admite embeddings guardados como arrays de numpy
+        embeddings1 = torch.as_tensor(embeddings1, device=self.device)
+        embeddings2 = torch.as_tensor(embeddings2, device=self.device)
         
         # Calcular similitud general
-        overall_similarity = self._calculate_overall_similarity(embeddings1, embeddings2)
+        overall_similarity = self._calculate_overall_similarity(
+            embeddings1, embeddings2,
+            self._chunk_weights(chunks1), self._chunk_weights(chunks2)
+        )
         
         # Encontrar pares más similares
         similar_pairs = self._find_similar_pairs(chunks1, chunks2, embeddings1, embeddings2)
@@ -37,24 +113,36 @@ class EmbeddingAnalyzer:
             'unique_chunks_doc2': unique_chunks['doc2'][:5]
         }
     
-    def _create_chunks(self, text: str, chunk_size: int) -> List[str]:
-        """Divide el texto en chunks con overlap"""
-        words = text.split()
-        chunks = []
-        overlap = chunk_size // 4
-        
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = ' '.join(words[i:i + chunk_size])
-            if len(chunk.strip()) > 50:  # Mínimo 50 caracteres
-                chunks.append(chunk)
-        
-        return chunks
+    @staticmethod
+    def _results_without_chunks(chunks1: List[str], chunks2: List[str], similarity: float) -> Dict:
+        """Resultado cuando alguno de los documentos no tiene chunks"""
+        return {
+            'overall_similarity': similarity,
+            'num_chunks_doc1': len(chunks1),
+            'num_chunks_doc2': len(chunks2),
+            'similar_pairs': [],
+            'unique_chunks_doc1': list(chunks1[:5]),
+            'unique_chunks_doc2': list(chunks2[:5])
+        }
     
-    def _calculate_overall_similarity(self, embeddings1: torch.Tensor, embeddings2: torch.Tensor) -> float:
-        """Calcula similitud general entre conjuntos de embeddings"""
-        # Promedio de embeddings
-        mean_emb1 = embeddings1.mean(dim=0)
-        mean_emb2 = embeddings2.mean(dim=0)
+    def _chunk_weights(self, chunks: List[str]) -> torch.Tensor:
+        return torch.tensor([len(chunk) for chunk in chunks], dtype=torch.float32, device=self.device)
+    
+    def _calculate_overall_similarity(self, embeddings1: torch.Tensor, embeddings2: torch.Tensor,
+                                      weights1: Optional[torch.Tensor] = None,
+                                      weights2: Optional[torch.Tensor] = None) -> float:
+        """Calcula similitud general entre conjuntos de embeddings
+        
+        Con pesos (longitud de cada chunk) es el coseno entre los vectores de
+        documento de src.core.document_vectors.
+        """
+        # Promedio de embeddings (ponderado por longitud si hay pesos)
+        if weights1 is not None and weights2 is not None:
+            mean_emb1 = weights1 @ embeddings1 / weights1.sum()
+            mean_emb2 = weights2 @ embeddings2 / weights2.sum()
+        else:
+            mean_emb1 = embeddings1.mean(dim=0)
+            mean_emb2 = embeddings2.mean(dim=0)
         
         # Similitud coseno
         similarity = torch.nn.functional.cosine_similarity(
@@ -0,0 +1,166 @@
+"""
+Similitud rápida por shingles de palabras vectorizados con numpy y
+localización de pasajes copiados con Winnowing
+"""
+
+from typing import Dict, List, Tuple
+import re
+import zlib
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+SHINGLE_PRIME = np.uint64(1099511628211)  # FNV-64 prime
+
+
+def tokenize(text: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hash (uint64) y offsets de caracteres de cada palabra del texto"""
+    cache: Dict[str, int] = {}
+    hashes, starts, ends = [], [], []
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group().lower()
+        value = cache.get(word)
+        if value is None:
+            value = cache[word] = zlib.crc32(word.encode("utf-8"))
+        hashes.append(value)
+        starts.append(match.start())
+        ends.append(match.end())
+    return (
+        np.asarray(hashes, dtype=np.uint64),
+        np.asarray(starts, dtype=np.int64),
+        np.asarray(ends, dtype=np.int64)
+    )
+
+
+def rolling_shingles(word_hashes: np.ndarray, shingle_size: int = 5) -> np.ndarray:
+    """Hash de cada n-grama de palabras en su posición (sin deduplicar)"""
+    if len(word_hashes) == 0:
+        return np.empty(0, dtype=np.uint64)
+    shingle_size = min(shingle_size, len(word_hashes))
+    count = len(word_hashes) - shingle_size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(shingle_size):
+        # Aritmética uint64 con desbordamiento intencionado
+        shingles = shingles * SHINGLE_PRIME + word_hashes[offset:offset + count]
+    return shingles
+
+
+def shingle_hashes(text: str, shingle_size: int = 5) -> np.ndarray:
+    """Hashes únicos y ordenados de los shingles de palabras del texto"""
+    word_hashes, _, _ = tokenize(text)
+    return np.unique(rolling_shingles(word_hashes, shingle_size))
+
+
+def intersection_size(sorted1: np.ndarray, sorted2: np.ndarray) -> int:
+    """Tamaño de la intersección de dos arrays ordenados sin duplicados"""
+    if len(sorted1) == 0 or len(sorted2) == 0:
+        return 0
+    if len(sorted1) > len(sorted2):
+        sorted1, sorted2 = sorted2, sorted1
+    positions = np.searchsorted(sorted2, sorted1)
+    positions[positions == len(sorted2)] = 0
+    return int(np.count_nonzero(sorted2[positions] == sorted1))
+
+
+def winnow(shingles: np.ndarray, window: int = 8, block_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """Huellas Winnowing: mínimo de cada ventana, procesado por bloques"""
+    if len(shingles) == 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    if len(shingles) <= window:
+        position = int(np.argmin(shingles))
+        return shingles[position:position + 1], np.array([position], dtype=np.int64)
+
+    windows = np.lib.stride_tricks.sliding_window_view(shingles, window)
+    selected = []
+    for start in range(0, len(windows), block_size):
+        block = windows[start:start + block_size]
+        selected.append(np.arange(start, start + len(block)) + block.argmin(axis=1))
+    positions = np.unique(np.concatenate(selected))
+    return shingles[positions], positions
+
+
+def copied_passages(
+    fingerprints1: Tuple[np.ndarray, np.ndarray],
+    fingerprints2: Tuple[np.ndarray, np.ndarray],
+    max_gap: int
+) -> List[Tuple[int, int, int, int]]:
+    """Agrupa huellas compartidas en pasajes (shingle inicial/final en cada documento)"""
+    hashes1, positions1 = fingerprints1
+    hashes2, positions2 = fingerprints2
+
+    order2 = np.argsort(hashes2, kind="stable")
+    sorted2 = hashes2[order2]
+    left = np.searchsorted(sorted2, hashes1, side="left")
+    right = np.searchsorted(sorted2, hashes1, side="right")
+
+    matches = [
+        (int(positions1[i]), int(positions2[order2[k]]))
+        for i in np.nonzero(right > left)[0]
+        for k in range(left[i], right[i])
+    ]
+    if not matches:
+        return []
+
+    matches.sort()
+    passages = []
+    start1, start2 = matches[0]
+    end1, end2 = start1, start2
+    for pos1, pos2 in matches[1:]:
+        if 0 <= pos1 - end1 <= max_gap and 0 <= pos2 - end2 <= max_gap:
+            end1, end2 = pos1, pos2
+        elif pos1 == end1:
+            continue
+        else:
+            passages.append((start1, end1, start2, end2))
+            start1, start2, end1, end2 = pos1, pos2, pos1, pos2
+    passages.append((start1, end1, start2, end2))
+    return passages
+
+
+def fast_similarity(
+    text1: str,
+    text2: str,
+    shingle_size: int = 5,
+    window: int = 8,
+    min_passage_words: int = 20,
+    max_passages: int = 20
+) -> Dict:
+    """Jaccard/contención de shingles y pasajes copiados entre dos textos"""
+    words1, starts1, ends1 = tokenize(text1)
+    words2, starts2, ends2 = tokenize(text2)
+    shingles1 = rolling_shingles(words1, shingle_size)
+    shingles2 = rolling_shingles(words2, shingle_size)
+    unique1 = np.unique(shingles1)
+    unique2 = np.unique(shingles2)
+
+    common = intersection_size(unique1, unique2)
+    union = len(unique1) + len(unique2) - common
+
+    passages = []
+    for start1, end1, start2, end2 in copied_passages(
+        winnow(shingles1, window), winnow(shingles2, window), max_gap=window
+    ):
+        # Posiciones de shingle -> offsets de caracteres
+        last1 = min(end1 + shingle_size - 1, len(ends1) - 1)
+        last2 = min(end2 + shingle_size - 1, len(ends2) - 1)
+        if last1 - start1 + 1 < min_passage_words:
+            continue
+        passages.append({
+            'doc1_start': int(starts1[start1]),
+            'doc1_end': int(ends1[last1]),
+            'doc2_start': int(starts2[start2]),
+            'doc2_end': int(ends2[last2]),
+            'words': int(last1 - start1 + 1),
+            'preview': text1[starts1[start1]:ends1[last1]][:200]
+        })
+    passages.sort(key=lambda p: p['words'], reverse=True)
+
+    return {
+        'jaccard': common / union if union else 1.0,
+        'containment_doc1': common / len(unique1) if len(unique1) else 0.0,
+        'containment_doc2': common / len(unique2) if len(unique2) else 0.0,
+        'num_shingles_doc1': int(len(unique1)),
+        'num_shingles_doc2': int(len(unique2)),
+        'num_copied_passages': len(passages),
+        'copied_passages': passages[:max_passages]
+    }
@@ -1,20 +1,22 @@
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from langchain.llms.base import LLM
 from langchain.llms import VLLMOpenAI
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import LLMChain, RetrievalQA
+from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferMemory
-from langchain.vectorstores import FAISS
 from langchain.callbacks.base import BaseCallbackHandler
-from langchain.schema import Document
 import os
 import logging
 from datetime import datetime
 import asyncio
+import time
 from concurrent.futures import ThreadPoolExecutor
 
+from src.utils.tracing import span, traced
+from .chunking import TokenChunker, encoder_from_config
+from .embedding_batcher import BatchedEmbeddings
+from .llm_cache import LLMResponseCache, SemanticAnswerCache, estimate_tokens
+from .vector_store import VectorIndexStore, DocumentIndex
+
 logger = logging.getLogger(__name__)
 
 class MetricsCallbackHandler(BaseCallbackHandler):
@@ -42,14 +44,13 @@ class MetricsCallbackHandler(BaseCallbackHandler):
 class LangChainHandler:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+        self.callback_handler = MetricsCallbackHandler()
         self.llm = self._initialize_llm()
         self.embeddings = self._initialize_embeddings()
         self.text_splitter = self._initialize_text_splitter()
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-        self.callback_handler = MetricsCallbackHandler()
+        self.vector_store = self._initialize_vector_store()
+        self.response_cache = self._initialize_response_cache()
+        self.semantic_cache = self._initialize_semantic_cache()
         self.executor = ThreadPoolExecutor(max_workers=4)
         
     def _initialize_llm(self) -> LLM:
@@ -73,39 +74,85 @@ class LangChainHandler:
             logger.error(f"Error initializing LLM: {e}")
             raise
     
-    def _initialize_embeddings(self) -> HuggingFaceEmbeddings:
-        """Inicializa el modelo de embeddings"""
-        return HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
+    def _initialize_embeddings(self) -> BatchedEmbeddings:
+        """Inicializa el modelo de embeddings (compartido con EmbeddingAnalyzer vía el batcher)"""
+        embeddings_config = self.config.get("embeddings", {})
+        model_name = embeddings_config.get(
+            "model_name", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
         )
+        # Mismos chunks y embeddings por documento que EmbeddingAnalyzer
+        self.encoder = encoder_from_config({**embeddings_config, "model_name": model_name})
+        return BatchedEmbeddings(self.encoder.batcher, model_name, normalize=True)
     
-    def _initialize_text_splitter(self) -> RecursiveCharacterTextSplitter:
-        """Inicializa el text splitter"""
-        return RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+    def _initialize_vector_store(self) -> VectorIndexStore:
+        """Inicializa el almacén persistente de índices por documento"""
+        store_config = self.config.get("vector_store", {})
+        return VectorIndexStore(
+            embeddings=self.embeddings,
+            text_splitter=self.text_splitter,
+            encoder=self.encoder,
+            index_dir=store_config.get("index_dir", "/app/cache/vector_indexes"),
+            max_disk_mb=store_config.get("max_disk_mb", 2048),
+            profile=f"{self.embeddings.model_name}:{self.text_splitter.profile}"
         )
     
+    def _initialize_response_cache(self) -> Optional[LLMResponseCache]:
+        """Inicializa la caché de respuestas del LLM"""
+        cache_config = self.config.get("cache", {})
+        if not cache_config.get("enabled", True):
+            return None
+        return LLMResponseCache(
+            max_entries=cache_config.get("max_entries", 512),
+            ttl_seconds=cache_config.get("ttl_seconds", 86400),
+            redis_url=cache_config.get("redis_url")
+        )
+    
+    def _initialize_semantic_cache(self) -> Optional[SemanticAnswerCache]:
+        """Inicializa la caché semántica de preguntas (opcional)"""
+        cache_config = self.config.get("cache", {})
+        if not cache_config.get("semantic_enabled", False):
+            return None
+        return SemanticAnswerCache(
+            embed_fn=self.embeddings.embed_query,
+            threshold=cache_config.get("semantic_threshold", 0.95),
+            ttl_seconds=cache_config.get("ttl_seconds", 86400)
+        )
+    
+    def _sampling_params(self) -> Dict[str, Any]:
+        """Parámetros de muestreo que forman parte de la clave de caché"""
+        return {
+            "temperature": self.llm.temperature,
+            "max_tokens": self.llm.max_tokens,
+            "top_p": self.llm.top_p,
+            "frequency_penalty": self.llm.frequency_penalty,
+            "presence_penalty": self.llm.presence_penalty
+        }
+    
+    def _initialize_text_splitter(self) -> TokenChunker:
+        """Text splitter por tokens del modelo de embeddings (compartido con EmbeddingAnalyzer)"""
+        return self.encoder.chunker
+    
+    @traced("llm.compare")
     async def compare_documents_intelligent(
         self,
         doc1_content: str,
         doc2_content: str,
         analysis_type: str = "general",
-        language: str = "es"
+        language: str = "es",
+        doc_ids: Optional[Tuple[str, str]] = None,
+        persist: bool = True
     ) -> Dict[str, Any]:
-        """Comparación inteligente de documentos usando LangChain"""
-        
-        # Crear documentos
-        docs1 = self.text_splitter.create_documents([doc1_content], metadatas=[{"source": "doc1"}])
-        docs2 = self.text_splitter.create_documents([doc2_content], metadatas=[{"source": "doc2"}])
+        """Comparación inteligente de documentos usando LangChain
+
+        Con `persist=False` los índices de textos efímeros no se guardan en el almacén.
+        """
+        doc_id1, doc_id2 = doc_ids or (None, None)
         
-        # Crear vectorstore
-        all_docs = docs1 + docs2
-        vectorstore = await self._create_vectorstore(all_docs)
+        # Obtener (o construir) el índice persistente de cada documento
+        index1, index2 = await asyncio.gather(
+            self.get_document_index(doc1_content, doc_id1, persist),
+            self.get_document_index(doc2_content, doc_id2, persist)
+        )
         
         # Definir prompts según el tipo de análisis
         prompts = self._get_analysis_prompts(analysis_type, language)
@@ -146,7 +193,7 @@ class LangChainHandler:
         )
         
         # Búsqueda semántica de secciones únicas
-        results["unique_sections"] = await self._find_unique_sections(vectorstore, docs1, docs2)
+        results["unique_sections"] = await self._find_unique_sections(index1, index2)
         
         # Generar recomendaciones
         recommendations_chain = LLMChain(
@@ -261,69 +308,161 @@ Documento 2:
         
         return base_prompts
     
-    async def _create_vectorstore(self, documents: List[Document]) -> FAISS:
-        """Crea un vectorstore para búsqueda semántica"""
+    @traced("llm.index")
+    async def get_document_index(
+        self,
+        content: str,
+        doc_id: Optional[str] = None,
+        persist: bool = True
+    ) -> DocumentIndex:
+        """Obtiene el índice vectorial cacheado de un documento (por id del almacén si se da)"""
         loop = asyncio.get_event_loop()
         return await loop.run_in_executor(
             self.executor,
-            lambda: FAISS.from_documents(documents, self.embeddings)
+            self.vector_store.get_or_create,
+            content,
+            doc_id,
+            persist
         )
     
     async def _run_chain_async(self, chain: LLMChain, inputs: Dict[str, Any]) -> str:
         """Ejecuta una chain de forma asíncrona"""
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            self.executor,
-            chain.run,
-            inputs
+        # En el event loop: run_in_executor no propaga el contexto de la traza al hilo
+        with span("llm.chain"):
+            return await loop.run_in_executor(
+                self.executor,
+                self._run_chain_cached,
+                chain,
+                inputs
+            )
+    
+    def _run_chain_cached(self, chain: LLMChain, inputs: Dict[str, Any]) -> str:
+        """Ejecuta una chain consultando antes la caché de respuestas"""
+        if self.response_cache is None:
+            return chain.run(inputs)
+        
+        prompt_text = chain.prompt.format(**inputs)
+        key = self.response_cache.make_key(
+            self.llm.model_name,
+            self._sampling_params(),
+            prompt_text
         )
+        
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        response = chain.run(inputs)
+        self.response_cache.set(
+            key,
+            response,
+            estimate_tokens(prompt_text) + estimate_tokens(response)
+        )
+        return response
     
+    @traced("llm.unique_sections")
     async def _find_unique_sections(
         self,
-        vectorstore: FAISS,
-        docs1: List[Document],
-        docs2: List[Document]
+        index1: DocumentIndex,
+        index2: DocumentIndex,
+        threshold: float = 0.5
     ) -> Dict[str, List[str]]:
         """Encuentra secciones únicas en cada documento"""
+        max_sections = self.config.get("comparison", {}).get("max_unique_sections", 20)
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            self._find_unique_sections_batched,
+            index1,
+            index2,
+            threshold,
+            max_sections
+        )
+    
+    def _find_unique_sections_batched(
+        self,
+        index1: DocumentIndex,
+        index2: DocumentIndex,
+        threshold: float,
+        max_sections: int = 20
+    ) -> Dict[str, List[str]]:
+        """Búsqueda k-NN por lotes de cada documento contra el índice del otro
+
+        Devuelve como mucho `max_sections` secciones por documento, las más alejadas primero.
+        """
         unique_sections = {"doc1": [], "doc2": []}
         
-        # Buscar chunks de doc1 que no tienen similar en doc2
-        for doc in docs1[:10]:  # Limitar a los primeros 10 chunks
-            similar = vectorstore.similarity_search_with_score(
-                doc.page_content,
-                k=3,
-                filter={"source": "doc2"}
-            )
+        for key, source, target in (("doc1", index1, index2), ("doc2", index2, index1)):
+            if not source.documents:
+                continue
             
-            if not similar or similar[0][1] > 0.5:  # Si no hay similares o son muy diferentes
-                unique_sections["doc1"].append(doc.page_content[:200] + "...")
-        
-        # Buscar chunks de doc2 que no tienen similar en doc1
-        for doc in docs2[:10]:
-            similar = vectorstore.similarity_search_with_score(
-                doc.page_content,
-                k=3,
-                filter={"source": "doc1"}
-            )
+            if target.documents:
+                # Reutiliza los embeddings ya almacenados en el índice
+                distances, _ = target.vectorstore.index.search(source.embeddings, 1)
+                nearest = distances[:, 0]
+            else:
+                nearest = [float("inf")] * len(source.documents)
             
-            if not similar or similar[0][1] > 0.5:
-                unique_sections["doc2"].append(doc.page_content[:200] + "...")
+            # Si el vecino más cercano está lejos, la sección es única
+            unique = [
+                (distance, doc) for doc, distance in zip(source.documents, nearest)
+                if distance > threshold
+            ]
+            unique.sort(key=lambda item: item[0], reverse=True)
+            unique_sections[key] = [
+                doc.page_content[:200] + "..." for _, doc in unique[:max_sections]
+            ]
         
         return unique_sections
     
-    async def answer_question(self, question: str, context: str) -> str:
-        """Responde preguntas sobre los documentos"""
-        qa_prompt = PromptTemplate(
-            input_variables=["question", "context"],
+    def _get_qa_prompt(self) -> PromptTemplate:
+        """Prompt para preguntas sobre los documentos"""
+        return PromptTemplate(
+            input_variables=["question", "context", "chat_history"],
             template="""Basándote en el siguiente contexto, responde la pregunta de forma clara y concisa.
 
 Contexto:
 {context}
-
+{chat_history}
 Pregunta: {question}
 
 Respuesta:"""
         )
+    
+    def _qa_inputs(self, question: str, context: str, chat_history: str) -> Dict[str, str]:
+        """Variables del prompt de preguntas"""
+        return {
+            "question": question,
+            "context": context,
+            "chat_history": f"\nConversación previa:\n{chat_history}\n" if chat_history else ""
+        }
+    
+    @traced("llm.answer")
+    async def answer_question(
+        self,
+        question: str,
+        context: str,
+        question_vector: Optional[List[float]] = None,
+        chat_history: str = ""
+    ) -> str:
+        """Responde preguntas sobre los documentos"""
+        qa_prompt = self._get_qa_prompt()
+        qa_inputs = self._qa_inputs(question, context, chat_history)
+        
+        # Caché semántica: preguntas equivalentes sobre el mismo contexto
+        if self.semantic_cache is not None:
+            loop = asyncio.get_event_loop()
+            cached, question_vector = await loop.run_in_executor(
+                self.executor,
+                self.semantic_cache.lookup,
+                question,
+                context,
+                question_vector,
+                chat_history
+            )
+            if cached is not None:
+                return cached
         
         qa_chain = LLMChain(
             llm=self.llm,
@@ -331,15 +470,120 @@ Respuesta:"""
             callbacks=[self.callback_handler]
         )
         
-        return await self._run_chain_async(
-            qa_chain,
-            {"question": question, "context": context}
+        answer = await self._run_chain_async(qa_chain, qa_inputs)
+        
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(
+                question_vector,
+                context,
+                answer,
+                estimate_tokens(qa_prompt.format(**qa_inputs)) + estimate_tokens(answer),
+                chat_history
+            )
+        
+        return answer
+    
+    @traced("llm.answer_retrieval")
+    async def answer_question_with_retrieval(
+        self,
+        question: str,
+        document_ids: List[str],
+        top_k: Optional[int] = None,
+        max_context_tokens: Optional[int] = None,
+        chat_history: str = ""
+    ) -> Dict[str, Any]:
+        """Responde usando solo los chunks más relevantes de los documentos indicados"""
+        chat_config = self.config.get("chat", {})
+        top_k = top_k or chat_config.get("top_k", 4)
+        max_context_tokens = max_context_tokens or chat_config.get("max_context_tokens", 1500)
+        
+        loop = asyncio.get_event_loop()
+        start_time = time.perf_counter()
+        
+        chunks, question_vector = await loop.run_in_executor(
+            self.executor,
+            self._retrieve_chunks,
+            question,
+            document_ids,
+            top_k
+        )
+        
+        # Ensamblar el contexto respetando el presupuesto de tokens
+        selected = []
+        context_tokens = 0
+        for doc_hash, doc, distance in chunks:
+            tokens = estimate_tokens(doc.page_content)
+            if selected and context_tokens + tokens > max_context_tokens:
+                break
+            selected.append((doc_hash, doc, distance))
+            context_tokens += tokens
+        
+        context = "\n\n".join(
+            f"[{doc_hash[:8]} · fragmento {doc.metadata.get('chunk')}]\n{doc.page_content}"
+            for doc_hash, doc, _ in selected
+        )
+        retrieval_seconds = time.perf_counter() - start_time
+        
+        answer = await self.answer_question(question, context, question_vector, chat_history)
+        prompt_tokens = estimate_tokens(
+            self._get_qa_prompt().format(**self._qa_inputs(question, context, chat_history))
         )
+        
+        return {
+            "answer": answer,
+            "sources": [
+                {
+                    "document_id": doc_hash,
+                    "chunk": doc.metadata.get("chunk"),
+                    "distance": float(distance),
+                    "preview": doc.page_content[:200]
+                }
+                for doc_hash, doc, distance in selected
+            ],
+            "retrieval": {
+                "latency_seconds": retrieval_seconds,
+                "chunks_retrieved": len(chunks),
+                "chunks_used": len(selected),
+                "context_tokens": context_tokens,
+                "prompt_tokens": prompt_tokens
+            }
+        }
+    
+    def _retrieve_chunks(
+        self,
+        question: str,
+        document_ids: List[str],
+        top_k: int
+    ) -> tuple:
+        """Recupera los top-k chunks de cada documento, ordenados por distancia"""
+        indexes = []
+        for doc_id in document_ids:
+            index = self.vector_store.get(doc_id)
+            if index is None:
+                raise KeyError(doc_id)
+            indexes.append(index)
+        
+        question_vector = self.embeddings.embed_query(question)
+        
+        chunks = []
+        for index in indexes:
+            if index.vectorstore is None:
+                continue
+            for doc, distance in index.vectorstore.similarity_search_with_score_by_vector(
+                question_vector, k=top_k
+            ):
+                chunks.append((index.doc_hash, doc, distance))
+        
+        chunks.sort(key=lambda item: item[2])
+        return chunks, question_vector
     
     def get_metrics(self) -> Dict[str, Any]:
         """Obtiene métricas del handler"""
         return {
             "langchain_metrics": self.callback_handler.metrics,
+            "llm_cache": self.response_cache.get_stats() if self.response_cache else None,
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "vector_store": self.vector_store.get_stats(),
             "model_name": os.getenv("VLLM_MODEL_NAME"),
             "endpoint": os.getenv("VLLM_ENDPOINT"),
             "timestamp": datetime.now().isoformat()
@@ -0,0 +1,263 @@
+"""
+Caché de respuestas del LLM con niveles en memoria (LRU) y Redis
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# Prometheus metrics
+llm_cache_lookups = Counter(
+    'pdf_comparator_llm_cache_lookups_total',
+    'LLM cache lookups',
+    ['cache', 'result']
+)
+llm_cache_saved_tokens = Counter(
+    'pdf_comparator_llm_cache_saved_tokens_total',
+    'Estimated LLM tokens saved by cache hits',
+    ['cache']
+)
+llm_cache_hit_ratio = Gauge(
+    'pdf_comparator_llm_cache_hit_ratio',
+    'LLM cache hit ratio since process start',
+    ['cache']
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimación aproximada de tokens (~4 caracteres por token)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class LRUCache:
+    """Caché LRU en memoria con expiración por TTL (thread-safe)"""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class _CacheStats:
+    """Contadores de aciertos y tokens ahorrados para una caché"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    def hit(self, tier: str, tokens: int):
+        self.hits += 1
+        self.saved_tokens += tokens
+        llm_cache_lookups.labels(cache=self.name, result=f"hit_{tier}").inc()
+        llm_cache_saved_tokens.labels(cache=self.name).inc(tokens)
+        self._update_ratio()
+
+    def miss(self):
+        self.misses += 1
+        llm_cache_lookups.labels(cache=self.name, result="miss").inc()
+        self._update_ratio()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _update_ratio(self):
+        llm_cache_hit_ratio.labels(cache=self.name).set(self.hit_ratio)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hit_ratio,
+            "saved_tokens": self.saved_tokens
+        }
+
+
+class LLMResponseCache:
+    """Caché de respuestas del LLM indexada por (modelo, parámetros, hash del prompt)"""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: int = 86400,
+        redis_url: Optional[str] = None,
+        namespace: str = "llm_cache"
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.memory = LRUCache(max_entries, ttl_seconds)
+        self.redis = self._connect_redis(redis_url)
+        self.stats = _CacheStats("response")
+
+    def _connect_redis(self, redis_url: Optional[str]):
+        """Conecta con Redis (opcional); sin Redis se usa solo la memoria"""
+        if not redis_url:
+            return None
+        try:
+            import redis
+            client = redis.Redis.from_url(redis_url, socket_timeout=1.0)
+            client.ping()
+            logger.info("LLM response cache using Redis tier")
+            return client
+        except Exception as e:
+            logger.warning(f"Redis unavailable for LLM cache, using memory only: {e}")
+            return None
+
+    def make_key(self, model: str, params: Dict[str, Any], prompt: str) -> str:
+        """Construye la clave a partir del modelo, parámetros de muestreo y prompt"""
+        header = json.dumps({"model": model, "params": params}, sort_keys=True)
+        digest = hashlib.sha256()
+        digest.update(header.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(prompt.encode("utf-8"))
+        return f"{self.namespace}:{digest.hexdigest()}"
+
+    def get(self, key: str) -> Optional[str]:
+        """Busca una respuesta en memoria y luego en Redis"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.stats.hit("memory", entry["tokens"])
+            return entry["response"]
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(key)
+                if raw is not None:
+                    entry = json.loads(raw)
+                    self.memory.set(key, entry)
+                    self.stats.hit("redis", entry["tokens"])
+                    return entry["response"]
+            except Exception as e:
+                logger.warning(f"Error reading LLM cache from Redis: {e}")
+
+        self.stats.miss()
+        return None
+
+    def set(self, key: str, response: str, tokens: int):
+        """Guarda una respuesta en ambos niveles"""
+        entry = {"response": response, "tokens": tokens}
+        self.memory.set(key, entry)
+
+        if self.redis is not None:
+            try:
+                self.redis.setex(key, self.ttl_seconds, json.dumps(entry))
+            except Exception as e:
+                logger.warning(f"Error writing LLM cache to Redis: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.as_dict()
+        stats["memory_entries"] = len(self.memory)
+        stats["redis_enabled"] = self.redis is not None
+        return stats
+
+
+class SemanticAnswerCache:
+    """Reutiliza respuestas a preguntas semánticamente equivalentes sobre el mismo contexto"""
+
+    def __init__(
+        self,
+        embed_fn: Callable[[str], List[float]],
+        threshold: float = 0.95,
+        max_contexts: int = 256,
+        max_questions_per_context: int = 64,
+        ttl_seconds: int = 86400
+    ):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.max_questions_per_context = max_questions_per_context
+        # context_hash -> (matriz de embeddings, [(respuesta, tokens)])
+        self.contexts = LRUCache(max_contexts, ttl_seconds)
+        self.stats = _CacheStats("semantic")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _context_key(context: str, chat_history: str = "") -> str:
+        # El historial forma parte del prompt: sin él, un seguimiento de otra sesión acertaría
+        digest = hashlib.sha256(context.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(chat_history.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(
+        self,
+        question: str,
+        context: str,
+        question_vector: Optional[List[float]] = None,
+        chat_history: str = ""
+    ) -> Tuple[Optional[str], np.ndarray]:
+        """Devuelve (respuesta o None, embedding de la pregunta)"""
+        if question_vector is None:
+            question_vector = self.embed_fn(question)
+        vector = self._normalize(question_vector)
+        entry = self.contexts.get(self._context_key(context, chat_history))
+
+        if entry is not None:
+            matrix, answers = entry
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                answer, tokens = answers[best]
+                self.stats.hit("memory", tokens)
+                return answer, vector
+
+        self.stats.miss()
+        return None, vector
+
+    def store(self, vector: np.ndarray, context: str, answer: str, tokens: int, chat_history: str = ""):
+        """Guarda la respuesta asociada al embedding de la pregunta"""
+        key = self._context_key(context, chat_history)
+        with self._lock:
+            entry = self.contexts.get(key)
+            if entry is None:
+                matrix, answers = vector[np.newaxis, :], [(answer, tokens)]
+            else:
+                matrix, answers = entry
+                matrix = np.vstack([matrix, vector])[-self.max_questions_per_context:]
+                answers = (answers + [(answer, tokens)])[-self.max_questions_per_context:]
+            self.contexts.set(key, (matrix, answers))
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.stats.as_dict()
+        stats["threshold"] = self.threshold
+        return stats
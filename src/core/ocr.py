@@ -0,0 +1,172 @@
+"""
+OCR de páginas escaneadas (sin capa de texto) con Tesseract en un pool de procesos acotado
+
+Solo se rasterizan las páginas sin texto, una a una y con un número acotado de
+páginas en vuelo: mientras Tesseract reconoce unas, se rasteriza la siguiente.
+Cada imagen se identifica por su hash (sha256 del PNG junto con idioma, opciones
+de Tesseract y DPI) y el texto reconocido se guarda en ``{cache_dir}/{hash}.txt``,
+así que volver a subir el mismo escaneo no repite el OCR.
+"""
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _run_tesseract(image: bytes, command: str, language: str, config: str, timeout: float) -> str:
+    """Ejecuta el binario de Tesseract sobre un PNG (en un proceso del pool)"""
+    result = subprocess.run(
+        [command, "stdin", "stdout", "-l", language, *config.split()],
+        input=image,
+        capture_output=True,
+        timeout=timeout,
+        # Un hilo por página: el paralelismo lo da el pool de procesos
+        env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+        check=True
+    )
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+class OCREngine:
+    """Reconocimiento de páginas con caché por hash de imagen"""
+
+    def __init__(self, cache_dir: str, workers: int = 2, language: str = "spa+eng",
+                 dpi: int = 300, timeout_seconds: float = 120.0, command: str = "tesseract",
+                 config: str = ""):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.language = language
+        # Opciones adicionales de Tesseract (p. ej. "--psm 6")
+        self.config = config
+        self.dpi = dpi
+        self.timeout = timeout_seconds
+        self.command = command
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # Un pool por proceso (los workers de gunicorn se crean con fork); forkserver
+        # evita que los workers hereden hilos y locks del proceso del servidor
+        if self._pid != os.getpid() or self._pool is None:
+            with self._lock:
+                if self._pid != os.getpid() or self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("forkserver")
+                    )
+                    self._pid = os.getpid()
+        return self._pool
+
+    @property
+    def profile(self) -> Dict:
+        """Parámetros que cambian el texto reconocido"""
+        return {"language": self.language, "config": self.config, "dpi": self.dpi}
+
+    def render(self, page) -> bytes:
+        """Rasteriza una página de pdfplumber a PNG en escala de grises"""
+        image = page.to_image(resolution=self.dpi).original.convert("L")
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def _cache_key(self, image: bytes) -> str:
+        """Hash de la imagen y de los parámetros del reconocimiento"""
+        digest = hashlib.sha256(image)
+        digest.update(f"|{self.language}|{self.config}|{self.dpi}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _cache_path(self, image_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{image_hash}.txt")
+
+    def _cached(self, image_hash: str) -> Optional[str]:
+        try:
+            with open(self._cache_path(image_hash), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _store(self, image_hash: str, text: str):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, self._cache_path(image_hash))
+
+    def _collect(self, i: int, future: Future, hashes: List[str], texts: List[Optional[str]]) -> bool:
+        """Espera el OCR de una página y lo guarda en caché; devuelve False si falló"""
+        try:
+            texts[i] = future.result()
+            self._store(hashes[i], texts[i])
+            return True
+        except Exception as e:
+            logger.warning(f"OCR failed for page image {hashes[i][:12]}: {e}")
+            texts[i] = ""
+            return False
+
+    def recognize(self, pages: Sequence) -> Tuple[List[str], Dict]:
+        """Texto de cada página de pdfplumber dada (en el mismo orden) y estadísticas"""
+        start_time = time.time()
+        render_seconds = 0.0
+        hashes: List[str] = []
+        texts: List[Optional[str]] = []
+        # Como mucho dos páginas por worker en memoria esperando a Tesseract
+        max_pending = max(1, self.workers * 2)
+        pending: Deque[Tuple[int, Future]] = deque()
+        submitted = failed = 0
+
+        for i, page in enumerate(pages):
+            render_start = time.time()
+            image = self.render(page)
+            render_seconds += time.time() - render_start
+
+            hashes.append(self._cache_key(image))
+            texts.append(self._cached(hashes[i]))
+            if texts[i] is not None:
+                continue
+            pending.append((i, self.pool.submit(
+                _run_tesseract, image, self.command, self.language, self.config, self.timeout
+            )))
+            submitted += 1
+            if len(pending) >= max_pending:
+                failed += not self._collect(*pending.popleft(), hashes, texts)
+
+        while pending:
+            failed += not self._collect(*pending.popleft(), hashes, texts)
+
+        return texts, {
+            "pages": len(pages),
+            "cached_pages": len(pages) - submitted,
+            "failed_pages": failed,
+            "render_seconds": render_seconds,
+            "seconds": time.time() - start_time
+        }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def create_ocr_engine(enabled: bool = True, command: str = "tesseract", **kwargs) -> Optional[OCREngine]:
+    """OCREngine si está habilitado y el binario de Tesseract existe; si no, None"""
+    if not enabled:
+        return None
+    if shutil.which(command) is None:
+        logger.warning(f"OCR disabled: '{command}' binary not found")
+        return None
+    return OCREngine(command=command, **kwargs)
@@ -0,0 +1,257 @@
+"""
+Backend ONNX Runtime (CPU, cuantización int8 dinámica opcional) para el modelo de embeddings
+
+El transformer del modelo de sentence-transformers se exporta una sola vez a
+``{onnx_dir}/{modelo}/``:
+    model.onnx          grafo fp32 (ejes dinámicos de lote y secuencia)
+    model.int8.onnx     pesos cuantizados a int8 (si se pide)
+    export.json         pooling, normalización y longitud máxima del pipeline original
+    reference.npy       embeddings de torch de REFERENCE_TEXTS, para validar cada variante
+    tokenizer files     tokenizer del modelo
+
+El pooling y la normalización se hacen en numpy igual que en sentence-transformers,
+de modo que los vectores son intercambiables con los del backend de torch dentro
+de una tolerancia (coseno mínimo frente a la referencia).
+"""
+
+from typing import Dict, List, Optional, Union
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_TEXTS = [
+    "El contrato entra en vigor el día de su firma.",
+    "The agreement may be terminated by either party with thirty days notice.",
+    "Le présent avenant modifie l'article 4 du contrat initial.",
+    "Die Haftung ist auf grobe Fahrlässigkeit beschränkt.",
+    "Tabla 3: resultados trimestrales por región y línea de producto.",
+    " ".join(["Cláusula de confidencialidad aplicable a todas las partes."] * 40),
+]
+
+
+def _model_dir(onnx_dir: str, model_name: str) -> str:
+    return os.path.join(onnx_dir, model_name.replace("/", "__"))
+
+
+def _model_file(quantize: bool) -> str:
+    return "model.int8.onnx" if quantize else "model.onnx"
+
+
+def _pipeline_config(model) -> Dict:
+    """Pooling y normalización de un SentenceTransformer cargado"""
+    from sentence_transformers.models import Normalize, Pooling
+
+    config = {
+        "pooling": "mean",
+        "normalize": False,
+        "max_seq_length": model.max_seq_length,
+        "dimension": model.get_sentence_embedding_dimension(),
+    }
+    for module in model:
+        if isinstance(module, Pooling):
+            if module.pooling_mode_cls_token:
+                config["pooling"] = "cls"
+            elif module.pooling_mode_max_tokens:
+                config["pooling"] = "max"
+        elif isinstance(module, Normalize):
+            config["normalize"] = True
+    return config
+
+
+def export_onnx(model_name: str, onnx_dir: str, opset: int = 14) -> str:
+    """Exporta el transformer a ONNX con sus embeddings de referencia; devuelve el directorio"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model_dir = _model_dir(onnx_dir, model_name)
+    path = os.path.join(model_dir, _model_file(False))
+    if os.path.exists(path):
+        return model_dir
+    os.makedirs(model_dir, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    dummy = tokenizer(["exportación onnx"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+
+    class TokenEmbeddings(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs)))[0]
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+    tmp_path = path + ".tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(),
+            tuple(dummy[name] for name in input_names),
+            tmp_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+
+    tokenizer.save_pretrained(model_dir)
+    with open(os.path.join(model_dir, "export.json"), "w") as f:
+        json.dump(_pipeline_config(model), f)
+    np.save(
+        os.path.join(model_dir, "reference.npy"),
+        model.encode(REFERENCE_TEXTS, convert_to_numpy=True, show_progress_bar=False)
+    )
+    # El .onnx se publica el último: su presencia indica una exportación completa
+    os.replace(tmp_path, path)
+    logger.info(f"Exported {model_name} to ONNX at {model_dir}")
+    return model_dir
+
+
+def quantize_onnx(model_dir: str) -> str:
+    """Cuantización dinámica int8 de los pesos (MatMul/Gemm) del modelo fp32"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = os.path.join(model_dir, _model_file(True))
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        quantize_dynamic(
+            os.path.join(model_dir, _model_file(False)),
+            tmp_path,
+            weight_type=QuantType.QInt8
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"Quantized ONNX model written to {path}")
+    return path
+
+
+def compare_embeddings(reference: np.ndarray, candidate: np.ndarray) -> Dict:
+    """Similitud coseno fila a fila entre dos matrices de embeddings"""
+    reference = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    candidate = candidate / np.maximum(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12)
+    cosine = np.sum(reference * candidate, axis=1)
+    return {
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+    }
+
+
+class OnnxEmbeddingModel:
+    """Sustituto de SentenceTransformer (encode / get_sentence_embedding_dimension) sobre ONNX Runtime"""
+
+    def __init__(self, model_dir: str, quantize: bool = False, num_threads: int = 0):
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(model_dir, "export.json")) as f:
+            config = json.load(f)
+        self.model_dir = model_dir
+        self.path = os.path.join(model_dir, _model_file(quantize))
+        self.quantized = quantize
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+        self.max_seq_length = config["max_seq_length"]
+        self.dimension = config["dimension"]
+        self.num_threads = num_threads
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+
+    def set_num_threads(self, num_threads: int):
+        """Hilos intra-op; se aplica al crear la siguiente sesión"""
+        with self._lock:
+            self.num_threads = num_threads
+            self._session = None
+
+    @property
+    def session(self):
+        # Una sesión por proceso: el pool de hilos de ONNX Runtime no sobrevive al fork
+        if self._pid != os.getpid() or self._session is None:
+            with self._lock:
+                if self._pid != os.getpid() or self._session is None:
+                    import onnxruntime as ort
+                    options = ort.SessionOptions()
+                    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    options.inter_op_num_threads = 1
+                    if self.num_threads > 0:
+                        options.intra_op_num_threads = self.num_threads
+                    self._session = ort.InferenceSession(
+                        self.path, options, providers=["CPUExecutionProvider"]
+                    )
+                    self._input_names = [i.name for i in self._session.get_inputs()]
+                    self._pid = os.getpid()
+        return self._session
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def _pool(self, token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        if self.pooling == "cls":
+            return token_embeddings[:, 0]
+        mask = attention_mask[..., None].astype(token_embeddings.dtype)
+        if self.pooling == "max":
+            return np.where(mask > 0, token_embeddings, -1e9).max(axis=1)
+        return (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        session = self.session
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self._input_names}
+        token_embeddings = session.run(None, feeds)[0]
+        vectors = self._pool(token_embeddings, encoded["attention_mask"])
+        if self.normalize:
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Misma firma que SentenceTransformer.encode; siempre devuelve numpy float32"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        output = np.empty((len(sentences), self.dimension), dtype=np.float32)
+        # Lotes de longitud parecida para minimizar el padding
+        order = np.argsort([-len(text) for text in sentences], kind="stable")
+        for start in range(0, len(sentences), batch_size):
+            index = order[start:start + batch_size]
+            output[index] = self._encode_batch([sentences[i] for i in index])
+        return output[0] if single else output
+
+    def verify(self, min_cosine: float) -> Dict:
+        """Compara con los embeddings de torch guardados al exportar; falla fuera de tolerancia"""
+        reference = np.load(os.path.join(self.model_dir, "reference.npy"))
+        stats = compare_embeddings(reference, self.encode(REFERENCE_TEXTS))
+        if stats["min_cosine"] < min_cosine:
+            raise ValueError(
+                f"ONNX embeddings diverge from torch reference "
+                f"(min cosine {stats['min_cosine']:.4f} < {min_cosine})"
+            )
+        return stats
+
+
+def load_onnx_model(model_name: str, onnx_dir: str, quantize: bool = False,
+                    num_threads: int = 0, min_cosine: Optional[float] = 0.98) -> OnnxEmbeddingModel:
+    """Exporta (si hace falta), cuantiza (opcional) y carga el modelo validado"""
+    model_dir = export_onnx(model_name, onnx_dir)
+    if quantize:
+        quantize_onnx(model_dir)
+    model = OnnxEmbeddingModel(model_dir, quantize, num_threads)
+    if min_cosine is not None:
+        stats = model.verify(min_cosine)
+        logger.info(f"ONNX embedding model {os.path.basename(model.path)} matches torch: {stats}")
+    return model
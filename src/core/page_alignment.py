@@ -0,0 +1,98 @@
+"""
+Alineación de páginas por huella para comparaciones incrementales
+"""
+
+from typing import Dict, List, Tuple
+from collections import defaultdict
+from dataclasses import dataclass, field
+import difflib
+
+
+@dataclass
+class PageAlignment:
+    """Resultado de alinear las páginas de dos documentos por huella"""
+    unchanged: List[Tuple[int, int]] = field(default_factory=list)
+    moved: List[Tuple[int, int]] = field(default_factory=list)
+    # Regiones contiguas de páginas que cambiaron: (páginas doc1, páginas doc2)
+    changed: List[Tuple[List[int], List[int]]] = field(default_factory=list)
+    # Página de inicio (doc1, doc2) de cada región cambiada, para ubicar inserciones
+    anchors: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def changed_pages(self) -> Tuple[List[int], List[int]]:
+        pages1 = [p for region1, _ in self.changed for p in region1]
+        pages2 = [p for _, region2 in self.changed for p in region2]
+        return pages1, pages2
+
+    def summary(self) -> Dict[str, int]:
+        pages1, pages2 = self.changed_pages
+        return {
+            'unchanged_pages': len(self.unchanged),
+            'moved_pages': len(self.moved),
+            'changed_pages_doc1': len(pages1),
+            'changed_pages_doc2': len(pages2),
+            'changed_regions': len(self.changed)
+        }
+
+
+def align_pages(fingerprints1: List[str], fingerprints2: List[str]) -> PageAlignment:
+    """Alinea páginas idénticas, detecta páginas movidas y agrupa las cambiadas"""
+    alignment = PageAlignment()
+    matcher = difflib.SequenceMatcher(None, fingerprints1, fingerprints2, autojunk=False)
+
+    regions = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            alignment.unchanged.extend(zip(range(i1, i2), range(j1, j2)))
+        else:
+            regions.append((list(range(i1, i2)), list(range(j1, j2)), (i1, j1)))
+
+    # Páginas idénticas que cambiaron de posición
+    available = defaultdict(list)
+    for _, region2, _ in regions:
+        for page in region2:
+            available[fingerprints2[page]].append(page)
+
+    moved1, moved2 = set(), set()
+    for region1, _, _ in regions:
+        for page in region1:
+            candidates = available.get(fingerprints1[page])
+            if candidates:
+                target = candidates.pop(0)
+                alignment.moved.append((page, target))
+                moved1.add(page)
+                moved2.add(target)
+
+    for region1, region2, anchor in regions:
+        region1 = [p for p in region1 if p not in moved1]
+        region2 = [p for p in region2 if p not in moved2]
+        if region1 or region2:
+            alignment.changed.append((region1, region2))
+            alignment.anchors.append(anchor)
+
+    return alignment
+
+
+def region_texts(pages1: List[str], pages2: List[str],
+                 region: Tuple[List[int], List[int]]) -> Tuple[str, str]:
+    """Texto de las páginas de una región cambiada en cada documento"""
+    region1, region2 = region
+    return (
+        "".join(pages1[p] + "\n" for p in region1),
+        "".join(pages2[p] + "\n" for p in region2)
+    )
+
+
+def changed_texts(pages1: List[str], pages2: List[str], alignment: PageAlignment) -> Tuple[str, str]:
+    """Texto de todas las páginas cambiadas de cada documento"""
+    pages_changed1, pages_changed2 = alignment.changed_pages
+    return (
+        "".join(pages1[p] + "\n" for p in pages_changed1),
+        "".join(pages2[p] + "\n" for p in pages_changed2)
+    )
+
+
+def unchanged_chars(pages1: List[str], pages2: List[str], alignment: PageAlignment) -> int:
+    """Caracteres (ambos documentos) en páginas idénticas o movidas"""
+    pairs = alignment.unchanged + alignment.moved
+    return sum(len(pages1[p1]) + 1 + len(pages2[p2]) + 1 for p1, p2 in pairs)
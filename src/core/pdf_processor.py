@@ -1,18 +1,53 @@
 import PyPDF2
 import pdfplumber
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 import re
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
+
+from prometheus_client import Histogram
+
+from src.utils.hashing import content_hash
+from src.utils.tracing import span
+from .ocr import OCREngine
+from .structure import DocumentStructure, StructureBuilder
+from .text_store import MappedPages, MappedText, TextStore
+
+table_extraction_duration = Histogram(
+    'pdf_table_extraction_seconds',
+    'Table detection and extraction time per page',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
 
 @dataclass
 class PDFContent:
-    text: str
-    pages: List[str]
+    # En documentos grandes con TextStore, texto y páginas se leen del disco bajo demanda
+    text: Union[str, MappedText]
+    pages: Union[List[str], MappedPages]
     metadata: Dict
-    structure: Dict
+    # Vista compatible con el dict {'titles', 'sections', 'lists', 'toc'}
+    structure: DocumentStructure
+    page_fingerprints: List[str] = field(default_factory=list)
+    # Tablas: {"page", "bbox", "shape": [filas, columnas], "cells": textos fila a fila}
+    tables: List[Dict] = field(default_factory=list)
+    
+    def page(self, number: int) -> str:
+        return self.pages[number]
+    
+    def lines(self) -> Sequence[str]:
+        """Líneas del texto completo (perezosas si el texto está en disco)"""
+        return self.text.splitlines()
 
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, ocr: Optional[OCREngine] = None, ocr_min_chars: int = 20,
+                 extract_tables: bool = False, text_store: Optional[TextStore] = None):
+        # OCR de las páginas sin capa de texto (PDF escaneados)
+        self.ocr = ocr
+        self.ocr_min_chars = ocr_min_chars
+        # Extraer tablas (y sacarlas del texto) tiene un coste por página
+        self.extract_tables = extract_tables
+        # Texto de documentos grandes en disco en lugar de dos copias en memoria
+        self.text_store = text_store
         self.structure_patterns = {
             'main_titles': [
                 r'^[A-Z\s]+$',  # TODO EN MAYÚSCULAS
@@ -33,80 +68,132 @@ class PDFProcessor:
             ]
         }
     
+    @property
+    def extraction_profile(self) -> Dict:
+        """Configuración que cambia el contenido extraído (se guarda en los metadatos)"""
+        return {
+            "tables": self.extract_tables,
+            "ocr": {**self.ocr.profile, "min_chars": self.ocr_min_chars} if self.ocr is not None else None
+        }
+    
     def extract_text(self, pdf_path: str) -> PDFContent:
         """Extrae texto y estructura de un PDF"""
         text = ""
         pages = []
+        page_fingerprints = []
+        tables = []
         metadata = {}
-        structure = {
-            'titles': [],
-            'sections': [],
-            'lists': [],
-            'toc': []
-        }
+        structure = StructureBuilder()
         
         with pdfplumber.open(pdf_path) as pdf:
             metadata = pdf.metadata or {}
+            with span("pdf.extract_text", pages=len(pdf.pages)):
+                raw_pages = [page.extract_text() or "" for page in pdf.pages]
+            pages = list(raw_pages)
             
-            for i, page in enumerate(pdf.pages):
-                page_text = page.extract_text() or ""
-                pages.append(page_text)
-                text += page_text + "\n"
+            if self.extract_tables:
+                with span("pdf.tables"):
+                    tables, table_stats = self._extract_tables(pdf.pages, pages)
+                metadata = {**metadata, "tables": table_stats}
+            
+            # Páginas escaneadas: solo esas se rasterizan y pasan por OCR
+            scanned = [i for i, page_text in enumerate(raw_pages) if len(page_text.strip()) < self.ocr_min_chars]
+            if self.ocr is not None and scanned:
+                with span("pdf.ocr", pages=len(scanned)):
+                    ocr_texts, ocr_stats = self.ocr.recognize([pdf.pages[i] for i in scanned])
+                for i, page_text in zip(scanned, ocr_texts):
+                    if len(page_text.strip()) > len(pages[i].strip()):
+                        pages[i] = page_text
+                metadata = {**metadata, "ocr": {**ocr_stats, "page_numbers": scanned}}
+        
+        with span("pdf.structure"):
+            for i, page_text in enumerate(pages):
+                page_fingerprints.append(self.page_fingerprint(page_text))
                 
-                # Analizar estructura
-                self._analyze_page_structure(page_text, i, structure)
+                # Analizar estructura (offsets sobre el texto completo)
+                self._analyze_page_structure(page_text, i, structure, len(text))
+                text += page_text + "\n"
+        
+        if self.text_store is not None:
+            with span("pdf.text_store"):
+                text, pages = self.text_store.map(text, pages)
         
         return PDFContent(
             text=text,
             pages=pages,
-            metadata=metadata,
-            structure=structure
+            metadata={**metadata, "extraction": self.extraction_profile},
+            structure=structure.build(text),
+            page_fingerprints=page_fingerprints,
+            tables=tables
         )
     
-    def _analyze_page_structure(self, text: str, page_num: int, structure: Dict):
-        """Analiza la estructura de una página"""
+    def _extract_tables(self, pdf_pages, pages: List[str]) -> Tuple[List[Dict], Dict]:
+        """Extrae las tablas de cada página y deja en `pages` solo el texto fuera de ellas"""
+        tables = []
+        page_seconds = []
+        for i, page in enumerate(pdf_pages):
+            start_time = time.perf_counter()
+            outside = page
+            for table in page.find_tables():
+                rows = [[" ".join((cell or "").split()) for cell in row] for row in table.extract()]
+                width = max((len(row) for row in rows), default=0)
+                if len(rows) < 2 or width < 2:
+                    continue
+                tables.append({
+                    'page': i,
+                    'bbox': [float(v) for v in table.bbox],
+                    'shape': [len(rows), width],
+                    'cells': [cell for row in rows for cell in row + [""] * (width - len(row))]
+                })
+                outside = outside.outside_bbox(table.bbox)
+            if outside is not page:
+                # El texto de las tablas ya no genera cambios de línea en el diff básico
+                pages[i] = outside.extract_text() or ""
+            elapsed = time.perf_counter() - start_time
+            table_extraction_duration.observe(elapsed)
+            page_seconds.append(round(elapsed, 4))
+        
+        return tables, {
+            'count': len(tables),
+            'seconds': sum(page_seconds),
+            'max_page_seconds': max(page_seconds, default=0.0),
+            'page_seconds': page_seconds
+        }
+    
+    @staticmethod
+    def page_fingerprint(page_text: str) -> str:
+        """Hash del texto normalizado de una página (ignora espacios)"""
+        return content_hash(" ".join(page_text.split()))[:32]
+    
+    def _analyze_page_structure(self, text: str, page_num: int, structure: StructureBuilder, offset: int = 0):
+        """Analiza la estructura de una página (`offset`: posición de la página en el texto completo)"""
         lines = text.split('\n')
         
-        for line_num, line in enumerate(lines):
-            line = line.strip()
+        for line_num, raw_line in enumerate(lines):
+            line = raw_line.strip()
+            start = offset + len(raw_line) - len(raw_line.lstrip())
+            offset += len(raw_line) + 1
             if not line:
                 continue
             
             # Detectar títulos principales
             for pattern in self.structure_patterns['main_titles']:
                 if re.match(pattern, line):
-                    structure['titles'].append({
-                        'text': line,
-                        'page': page_num,
-                        'line': line_num,
-                        'type': 'main_title'
-                    })
+                    structure.add('titles', page_num, line_num, start, len(line))
                     break
             
             # Detectar secciones numeradas
             for pattern in self.structure_patterns['numbered_sections']:
                 if re.match(pattern, line):
-                    structure['sections'].append({
-                        'text': line,
-                        'page': page_num,
-                        'line': line_num,
-                        'level': line.count('.')
-                    })
+                    structure.add('sections', page_num, line_num, start, len(line), level=line.count('.'))
                     break
             
             # Detectar elementos de lista
             for pattern in self.structure_patterns['list_items']:
                 if re.match(pattern, line):
-                    structure['lists'].append({
-                        'text': line,
-                        'page': page_num,
-                        'line': line_num
-                    })
+                    structure.add('lists', page_num, line_num, start, len(line))
                     break
             
             # Detectar posible tabla de contenidos
             if '....' in line or '----' in line:
-                structure['toc'].append({
-                    'text': line,
-                    'page': page_num
-                })
\ No newline at end of file
+                structure.add('toc', page_num, line_num, start, len(line))
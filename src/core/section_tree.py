@@ -0,0 +1,134 @@
+"""
+Árbol de secciones a partir de la estructura detectada y diff por sección
+"""
+
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+import difflib
+import re
+
+NUMBER_PATTERN = re.compile(
+    r'^(?:(?:CAP[IÍ]TULO|SECCI[OÓ]N|CHAPTER)\s+)?(\d+(?:\.\d+)*|[IVX]+)[\.\)]?\s+',
+    re.IGNORECASE
+)
+MAX_DIFF_LINES_PER_SECTION = 200
+
+
+@dataclass
+class Section:
+    heading: str
+    number: Optional[str]
+    level: int
+    page: int
+    line: int
+    path: str = ""
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    @property
+    def title(self) -> str:
+        """Encabezado sin numeración, normalizado para comparar"""
+        return " ".join(NUMBER_PATTERN.sub("", self.heading).lower().split())
+
+
+def build_sections(pages: List[str], structure: Dict) -> List[Section]:
+    """Divide el documento en secciones usando los encabezados detectados"""
+    headings = {}
+    for item in structure.get('titles', []) + structure.get('sections', []):
+        headings.setdefault((item['page'], item['line']), item)
+
+    sections = [Section(heading="", number=None, level=0, page=0, line=0, path="(preámbulo)")]
+    stack: List[Section] = []
+
+    for page_num, page_text in enumerate(pages):
+        for line_num, line in enumerate(page_text.split('\n')):
+            item = headings.get((page_num, line_num))
+            if item is None:
+                sections[-1].lines.append(line)
+                continue
+
+            heading = item['text']
+            match = NUMBER_PATTERN.match(heading)
+            number = match.group(1) if match else None
+            level = number.count('.') + 1 if number and number[0].isdigit() else 1
+            if item.get('type') == 'main_title':
+                level = 0
+
+            # Ruta jerárquica a partir de los encabezados abiertos
+            while stack and stack[-1].level >= level:
+                stack.pop()
+            section = Section(heading=heading, number=number, level=level, page=page_num, line=line_num)
+            section.path = " > ".join([s.heading for s in stack] + [heading])
+            stack.append(section)
+            sections.append(section)
+
+    if not sections[0].text.strip():
+        sections.pop(0)
+    return sections
+
+
+def align_sections(sections1: List[Section], sections2: List[Section],
+                   min_similarity: float = 0.6) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Empareja secciones por número y, si no, por similitud de encabezado"""
+    pairs = []
+    used2 = set()
+
+    # 1. Mismo número de sección y encabezado razonablemente parecido
+    by_number: Dict[str, List[int]] = {}
+    for j, section in enumerate(sections2):
+        if section.number:
+            by_number.setdefault(section.number, []).append(j)
+
+    unmatched1 = []
+    for i, section in enumerate(sections1):
+        candidates = [j for j in by_number.get(section.number, []) if j not in used2] if section.number else []
+        if candidates:
+            used2.add(candidates[0])
+            pairs.append((i, candidates[0]))
+        else:
+            unmatched1.append(i)
+
+    # 2. Similitud de encabezado (mejor candidato primero)
+    scored = []
+    for i in unmatched1:
+        for j, section in enumerate(sections2):
+            if j in used2:
+                continue
+            matcher = difflib.SequenceMatcher(None, sections1[i].title, section.title)
+            if matcher.quick_ratio() < min_similarity:
+                continue
+            score = matcher.ratio()
+            if score >= min_similarity:
+                scored.append((score, i, j))
+
+    matched1 = set()
+    for score, i, j in sorted(scored, reverse=True):
+        if i in matched1 or j in used2:
+            continue
+        matched1.add(i)
+        used2.add(j)
+        pairs.append((i, j))
+
+    pairs.extend((i, None) for i in unmatched1 if i not in matched1)
+    pairs.extend((None, j) for j in range(len(sections2)) if j not in used2)
+
+    # Orden del documento original (y del segundo para las añadidas)
+    pairs.sort(key=lambda p: (p[0] if p[0] is not None else float('inf'), p[1] if p[1] is not None else -1))
+    return pairs
+
+
+def diff_section(lines1: List[str], lines2: List[str]) -> Dict:
+    """Diff acotado entre dos secciones (función pura para ejecutar en otro proceso)"""
+    text1 = "\n".join(lines1)
+    text2 = "\n".join(lines2)
+    diff_lines = list(difflib.unified_diff(lines1, lines2, lineterm='', n=1))[2:]
+    return {
+        'similarity': difflib.SequenceMatcher(None, text1, text2).ratio() if text1 or text2 else 1.0,
+        'added_lines': len([l for l in diff_lines if l.startswith('+')]),
+        'removed_lines': len([l for l in diff_lines if l.startswith('-')]),
+        'diff_lines': diff_lines[:MAX_DIFF_LINES_PER_SECTION],
+        'diff_truncated': len(diff_lines) > MAX_DIFF_LINES_PER_SECTION
+    }
@@ -0,0 +1,164 @@
+"""
+Estructura de un documento (títulos, secciones, listas, TOC) en formato columnar
+
+Cada elemento detectado es una fila de arrays de numpy (tipo, página, línea,
+nivel, inicio y longitud del texto) y el texto no se copia: son offsets sobre
+``PDFContent.text``. DocumentStructure se comporta como el dict de antes
+(``structure['titles']`` devuelve una secuencia de dicts construidos al vuelo),
+así que los analizadores y las respuestas de la API no cambian.
+"""
+
+from array import array
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+KINDS = ("titles", "sections", "lists", "toc")
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+NO_LEVEL = -1
+
+_COLUMNS = (
+    ("kind", np.uint8, "B"),
+    ("page", np.int32, "i"),
+    ("line", np.int32, "i"),
+    ("level", np.int16, "h"),
+    ("start", np.int64, "q"),
+    ("length", np.int32, "i"),
+)
+
+
+class StructureBuilder:
+    """Acumula elementos durante la extracción (arrays de tipo fijo, sin dicts)"""
+
+    def __init__(self):
+        self._columns = {name: array(typecode) for name, _, typecode in _COLUMNS}
+
+    def add(self, kind: str, page: int, line: int, start: int, length: int, level: int = NO_LEVEL):
+        columns = self._columns
+        columns["kind"].append(KIND_CODES[kind])
+        columns["page"].append(page)
+        columns["line"].append(line)
+        columns["level"].append(level)
+        columns["start"].append(start)
+        columns["length"].append(length)
+
+    def build(self, text) -> "DocumentStructure":
+        return DocumentStructure(text, {
+            name: np.frombuffer(self._columns[name], dtype=dtype) if len(self._columns[name]) else np.empty(0, dtype)
+            for name, dtype, _ in _COLUMNS
+        })
+
+
+class StructureItems(Sequence):
+    """Vista de los elementos de un tipo; cada acceso construye el dict de compatibilidad"""
+
+    __slots__ = ("_structure", "_kind", "_rows")
+
+    def __init__(self, structure: "DocumentStructure", kind: str, rows: np.ndarray):
+        self._structure = structure
+        self._kind = kind
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._structure.item(row) for row in self._rows[index]]
+        return self._structure.item(self._rows[index])
+
+    def __iter__(self) -> Iterator[Dict]:
+        item = self._structure.item
+        return (item(row) for row in self._rows)
+
+    def __add__(self, other) -> List[Dict]:
+        return list(self) + list(other)
+
+    def texts(self) -> List[str]:
+        """Solo los textos, sin construir los dicts"""
+        text = self._structure.text
+        starts, lengths = self._structure.columns["start"], self._structure.columns["length"]
+        return [text[starts[row]:starts[row] + lengths[row]] for row in self._rows.tolist()]
+
+
+class DocumentStructure(Mapping):
+    """Elementos de estructura en columnas, con vista compatible con el dict anterior"""
+
+    __slots__ = ("text", "columns", "_rows")
+
+    def __init__(self, text, columns: Dict[str, np.ndarray]):
+        self.text = text
+        self.columns = columns
+        kinds = columns["kind"]
+        self._rows = {kind: np.flatnonzero(kinds == code) for kind, code in KIND_CODES.items()}
+
+    def __getitem__(self, kind: str) -> StructureItems:
+        if kind not in self._rows:
+            raise KeyError(kind)
+        return StructureItems(self, kind, self._rows[kind])
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(KINDS)
+
+    def __len__(self) -> int:
+        return len(KINDS)
+
+    def item(self, row: int) -> Dict[str, Any]:
+        """Dict de un elemento con la misma forma que generaba PDFProcessor"""
+        columns = self.columns
+        start = int(columns["start"][row])
+        kind = KINDS[columns["kind"][row]]
+        item = {"text": self.text[start:start + int(columns["length"][row])], "page": int(columns["page"][row])}
+        if kind == "toc":
+            return item
+        item["line"] = int(columns["line"][row])
+        if kind == "titles":
+            item["type"] = "main_title"
+        elif kind == "sections":
+            item["level"] = int(columns["level"][row])
+        return item
+
+    def to_dict(self) -> Dict[str, List[Dict]]:
+        """Forma de dict de listas (respuestas de la API)"""
+        return {kind: list(self[kind]) for kind in KINDS}
+
+    def to_columns(self) -> Dict[str, np.ndarray]:
+        """Columnas para serializar (sin el texto, que se guarda aparte)"""
+        return dict(self.columns)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+    @classmethod
+    def from_columns(cls, text, columns: Dict[str, Any]) -> "DocumentStructure":
+        return cls(text, {name: np.asarray(columns[name], dtype=dtype) for name, dtype, _ in _COLUMNS})
+
+    @classmethod
+    def from_dict(cls, text, structure: Dict[str, List[Dict]]) -> "DocumentStructure":
+        """Convierte la forma antigua (contenido guardado antes del formato columnar)"""
+        builder = StructureBuilder()
+        for kind in KINDS:
+            # Los elementos de cada tipo están en orden de documento
+            cursor = 0
+            for item in structure.get(kind, []):
+                start = text.find(item["text"], cursor)
+                if start < 0:
+                    start = text.find(item["text"])
+                length = len(item["text"]) if start >= 0 else 0
+                cursor = max(start, 0) + length
+                builder.add(kind, item["page"], item.get("line", 0), max(start, 0), length,
+                            item.get("level", NO_LEVEL))
+        return builder.build(text)
+
+
+def load_structure(text, value: Optional[Any]) -> DocumentStructure:
+    """DocumentStructure a partir de lo serializado (columnas o dict antiguo)"""
+    if isinstance(value, DocumentStructure):
+        return value
+    if not value:
+        return StructureBuilder().build(text)
+    if "kind" in value:
+        return DocumentStructure.from_columns(text, value)
+    return DocumentStructure.from_dict(text, value)
@@ -0,0 +1,167 @@
+"""
+Alineación de tablas entre documentos y diff de celdas vectorizado
+
+Cada tabla de PDFContent.tables es compacta: ``shape`` [filas, columnas] y
+``cells`` con los textos en orden fila-mayor; la primera fila es la cabecera.
+Las tablas se emparejan por similitud de cabecera, las columnas por nombre y
+las filas por la clave de la primera columna (o por posición si no es única);
+después las celdas se comparan de una vez como arrays de numpy.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def table_array(table: Dict) -> np.ndarray:
+    """Celdas de una tabla como array (filas, columnas) de strings"""
+    return np.array(table["cells"], dtype=object).reshape(table["shape"])
+
+
+def _normalize(values) -> List[str]:
+    return [" ".join(str(value).split()).lower() for value in values]
+
+
+def _header_score(header1: Sequence[str], header2: Sequence[str]) -> float:
+    """Jaccard de las celdas de cabecera, con un extra si el número de columnas coincide"""
+    set1, set2 = set(_normalize(header1)) - {""}, set(_normalize(header2)) - {""}
+    jaccard = len(set1 & set2) / len(set1 | set2) if set1 | set2 else 0.0
+    return 0.8 * jaccard + 0.2 * (len(header1) == len(header2))
+
+
+def align_tables(tables1: List[Dict], tables2: List[Dict],
+                 min_score: float = 0.5) -> List[Tuple[int, int, float]]:
+    """Emparejamiento voraz (mejor puntuación primero) de tablas de ambos documentos"""
+    headers1 = [table_array(table)[0] for table in tables1]
+    headers2 = [table_array(table)[0] for table in tables2]
+    candidates = sorted(
+        ((_header_score(h1, h2), i, j) for i, h1 in enumerate(headers1) for j, h2 in enumerate(headers2)),
+        key=lambda item: (-item[0], abs(item[1] - item[2]))
+    )
+    used1, used2, pairs = set(), set(), []
+    for score, i, j in candidates:
+        if score < min_score:
+            break
+        if i in used1 or j in used2:
+            continue
+        used1.add(i)
+        used2.add(j)
+        pairs.append((i, j, score))
+    return sorted(pairs)
+
+
+def parse_numbers(values: np.ndarray) -> np.ndarray:
+    """Valor numérico de cada celda (NaN si no es un número); admite 1.234,56 y 1,234.56"""
+    series = pd.Series(values, dtype="string").str.replace(r"[^\d,.\-]", "", regex=True)
+    comma_decimal = series.str.contains(r",\d{1,2}$", regex=True).fillna(False)
+    series = series.where(
+        ~comma_decimal,
+        series.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+    )
+    series = series.where(comma_decimal, series.str.replace(",", "", regex=False))
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+
+def _row_keys(body: np.ndarray) -> Optional[List[str]]:
+    """Claves de fila (primera columna) si son únicas y no vacías"""
+    if not body.shape[0] or not body.shape[1]:
+        return None
+    keys = _normalize(body[:, 0])
+    if "" in keys or len(set(keys)) != len(keys):
+        return None
+    return keys
+
+
+def diff_tables(table1: Dict, table2: Dict, max_changes: int = 50) -> Dict:
+    """Diff de celdas entre dos tablas emparejadas"""
+    array1, array2 = table_array(table1), table_array(table2)
+    header1, header2 = array1[0], array2[0]
+    body1, body2 = array1[1:], array2[1:]
+
+    # Columnas por nombre de cabecera (por posición si no comparten ninguno)
+    names1, names2 = _normalize(header1), _normalize(header2)
+    positions2 = {name: j for j, name in enumerate(names2) if name}
+    columns = [(i, positions2[name]) for i, name in enumerate(names1) if name in positions2]
+    if not columns:
+        columns = [(i, i) for i in range(min(len(names1), len(names2)))]
+    cols1 = [i for i, _ in columns]
+    cols2 = [j for _, j in columns]
+
+    # Filas por clave de la primera columna, o por posición
+    keys1, keys2 = _row_keys(body1), _row_keys(body2)
+    if keys1 is not None and keys2 is not None:
+        positions2 = {key: j for j, key in enumerate(keys2)}
+        rows = [(i, positions2[key]) for i, key in enumerate(keys1) if key in positions2]
+        matched1 = {i for i, _ in rows}
+        matched2 = {j for _, j in rows}
+        removed_rows = [i for i in range(len(body1)) if i not in matched1]
+        added_rows = [j for j in range(len(body2)) if j not in matched2]
+        labels = [str(body1[i, 0]) for i, _ in rows]
+    else:
+        common = min(len(body1), len(body2))
+        rows = [(i, i) for i in range(common)]
+        removed_rows = list(range(common, len(body1)))
+        added_rows = list(range(common, len(body2)))
+        labels = [str(i + 1) for i in range(common)]
+
+    changes = []
+    changed_cells = 0
+    if rows and columns:
+        rows1 = np.array([i for i, _ in rows])
+        rows2 = np.array([j for _, j in rows])
+        matrix1 = body1[np.ix_(rows1, cols1)]
+        matrix2 = body2[np.ix_(rows2, cols2)]
+        changed = matrix1 != matrix2
+        changed_cells = int(changed.sum())
+
+        row_index, column_index = np.nonzero(changed)
+        old_values = matrix1[row_index, column_index]
+        new_values = matrix2[row_index, column_index]
+        deltas = parse_numbers(new_values) - parse_numbers(old_values)
+        for r, c, old, new, delta in zip(row_index[:max_changes], column_index[:max_changes],
+                                         old_values, new_values, deltas):
+            changes.append({
+                "row": labels[r],
+                "column": str(header1[cols1[c]]),
+                "old": old,
+                "new": new,
+                "delta": None if np.isnan(delta) else float(delta)
+            })
+
+    compared = len(rows) * len(columns)
+    kept1, kept2 = set(cols1), set(cols2)
+    return {
+        "page1": table1["page"],
+        "page2": table2["page"],
+        "shape1": list(table1["shape"]),
+        "shape2": list(table2["shape"]),
+        "compared_cells": compared,
+        "changed_cells": changed_cells,
+        "cell_similarity": 1.0 - changed_cells / compared if compared else 0.0,
+        "added_columns": [str(header2[j]) for j in range(len(header2)) if j not in kept2],
+        "removed_columns": [str(header1[i]) for i in range(len(header1)) if i not in kept1],
+        "added_rows": [body2[j].tolist() for j in added_rows],
+        "removed_rows": [body1[i].tolist() for i in removed_rows],
+        "changes": changes
+    }
+
+
+def compare_tables(tables1: List[Dict], tables2: List[Dict], max_changes: int = 50) -> Dict:
+    """Empareja las tablas de dos documentos y compara sus celdas"""
+    pairs = align_tables(tables1, tables2)
+    matched = []
+    for i, j, score in pairs:
+        diff = diff_tables(tables1[i], tables2[j], max_changes)
+        matched.append({"table1": i, "table2": j, "header_score": score, **diff})
+
+    matched1 = {i for i, _, _ in pairs}
+    matched2 = {j for _, j, _ in pairs}
+    return {
+        "num_tables_doc1": len(tables1),
+        "num_tables_doc2": len(tables2),
+        "matched_tables": matched,
+        "unmatched_tables_doc1": [i for i in range(len(tables1)) if i not in matched1],
+        "unmatched_tables_doc2": [j for j in range(len(tables2)) if j not in matched2],
+        "changed_cells": sum(table["changed_cells"] for table in matched)
+    }
@@ -4,37 +4,195 @@ from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 from typing import List, Dict, Tuple
 
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import threading
+
+from src.utils.tracing import traced
+from .diff_store import line_hunks, count_changes
+from .fast_similarity import fast_similarity
+from .page_alignment import align_pages, region_texts, unchanged_chars
+from .section_tree import build_sections, align_sections, diff_section
+from .table_diff import compare_tables
+
 class TextAnalyzer:
-    def __init__(self):
+    def __init__(self, max_workers: int = None, parallel_min_sections: int = 16):
         self.tfidf_vectorizer = TfidfVectorizer(
             max_features=1000,
             ngram_range=(1, 3),
             stop_words='spanish'
         )
+        self.max_workers = max_workers
+        self.parallel_min_sections = parallel_min_sections
+        self._section_pool = None
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+    
+    @property
+    def section_pool(self) -> ProcessPoolExecutor:
+        # forkserver: los workers no heredan hilos ni locks del proceso del servidor
+        if self._pool_pid != os.getpid() or self._section_pool is None:
+            with self._pool_lock:
+                if self._pool_pid != os.getpid() or self._section_pool is None:
+                    self._section_pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("forkserver")
+                    )
+                    self._pool_pid = os.getpid()
+        return self._section_pool
+    
+    def close(self):
+        """Detiene el pool de procesos de las comparaciones por secciones"""
+        with self._pool_lock:
+            if self._section_pool is not None and self._pool_pid == os.getpid():
+                self._section_pool.shutdown(wait=False, cancel_futures=True)
+            self._section_pool = None
     
+    @traced("text.basic")
     def basic_comparison(self, text1: str, text2: str) -> Dict:
-        """Comparación básica línea por línea"""
+        """Comparación básica línea por línea (hunks como rangos de líneas)"""
         lines1 = text1.splitlines()
         lines2 = text2.splitlines()
         
-        differ = difflib.unified_diff(lines1, lines2, lineterm='')
-        diff_lines = list(differ)
+        hunks = line_hunks(lines1, lines2)
+        added_lines, removed_lines = count_changes(hunks)
         
         # Calcular ratio de similitud
         matcher = difflib.SequenceMatcher(None, text1, text2)
         similarity_ratio = matcher.ratio()
         
-        # Encontrar bloques comunes
-        matching_blocks = matcher.get_matching_blocks()
-        
         return {
             'similarity_ratio': similarity_ratio,
-            'diff_lines': diff_lines,
-            'matching_blocks': matching_blocks,
-            'added_lines': len([l for l in diff_lines if l.startswith('+')]),
-            'removed_lines': len([l for l in diff_lines if l.startswith('-')])
+            'added_lines': added_lines,
+            'removed_lines': removed_lines,
+            'num_hunks': len(hunks),
+            'hunks': hunks
+        }
+    
+    @traced("text.incremental")
+    def incremental_comparison(self, pages1: List[str], fingerprints1: List[str],
+                               pages2: List[str], fingerprints2: List[str]) -> Dict:
+        """Comparación básica que solo analiza las páginas que cambiaron
+        
+        Las páginas idénticas (por huella) o movidas cuentan como coincidencia
+        completa; el ratio agregado mantiene la definición 2*M/T de SequenceMatcher.
+        """
+        alignment = align_pages(fingerprints1, fingerprints2)
+        
+        total_chars = sum(len(p) + 1 for p in pages1) + sum(len(p) + 1 for p in pages2)
+        matched_chars = unchanged_chars(pages1, pages2, alignment)
+        
+        # Hunks en coordenadas de línea del texto completo
+        offsets1 = self._line_offsets(pages1)
+        offsets2 = self._line_offsets(pages2)
+        hunks = []
+        
+        for region, (anchor1, anchor2) in zip(alignment.changed, alignment.anchors):
+            text1, text2 = region_texts(pages1, pages2, region)
+            
+            matcher = difflib.SequenceMatcher(None, text1, text2)
+            matched_chars += 2 * sum(block.size for block in matcher.get_matching_blocks())
+            
+            region1, region2 = region
+            lines1 = [line for p in region1 for line in range(offsets1[p], offsets1[p + 1])]
+            lines2 = [line for p in region2 for line in range(offsets2[p], offsets2[p + 1])]
+            for tag, i1, i2, j1, j2 in line_hunks(text1.splitlines(), text2.splitlines()):
+                start1 = self._global_line(lines1, i1, offsets1[anchor1])
+                start2 = self._global_line(lines2, j1, offsets2[anchor2])
+                hunks.append([
+                    tag,
+                    start1, start1 + (i2 - i1),
+                    start2, start2 + (j2 - j1)
+                ])
+        
+        added_lines, removed_lines = count_changes(hunks)
+        
+        return {
+            'similarity_ratio': matched_chars / total_chars if total_chars else 1.0,
+            'added_lines': added_lines,
+            'removed_lines': removed_lines,
+            'num_hunks': len(hunks),
+            'hunks': hunks,
+            'page_alignment': alignment.summary()
+        }
+    
+    @staticmethod
+    def _line_offsets(pages: List[str]) -> List[int]:
+        """Línea del texto completo en la que empieza cada página (más el total)"""
+        offsets = [0]
+        for page in pages:
+            offsets.append(offsets[-1] + len((page + "\n").splitlines()))
+        return offsets
+    
+    @staticmethod
+    def _global_line(region_lines: List[int], index: int, anchor: int) -> int:
+        """Traduce una línea relativa a la región a línea del texto completo"""
+        if not region_lines:
+            return anchor
+        if index < len(region_lines):
+            return region_lines[index]
+        return region_lines[-1] + 1
+    
+    @traced("text.sections")
+    def section_comparison(self, pages1: List[str], structure1: Dict,
+                           pages2: List[str], structure2: Dict) -> Dict:
+        """Alinea secciones por encabezado y compara cada par por separado"""
+        sections1 = build_sections(pages1, structure1)
+        sections2 = build_sections(pages2, structure2)
+        pairs = align_sections(sections1, sections2)
+        
+        # Muchos diffs pequeños y acotados en lugar de uno gigante
+        inputs1 = [sections1[i].lines if i is not None else [] for i, _ in pairs]
+        inputs2 = [sections2[j].lines if j is not None else [] for _, j in pairs]
+        if len(pairs) >= self.parallel_min_sections:
+            diffs = list(self.section_pool.map(diff_section, inputs1, inputs2, chunksize=8))
+        else:
+            diffs = list(map(diff_section, inputs1, inputs2))
+        
+        report = []
+        for (i, j), diff in zip(pairs, diffs):
+            if i is None:
+                status = 'added'
+            elif j is None:
+                status = 'removed'
+            elif diff['added_lines'] or diff['removed_lines'] or sections1[i].heading != sections2[j].heading:
+                status = 'modified'
+            else:
+                status = 'unchanged'
+            
+            section = sections1[i] if i is not None else sections2[j]
+            report.append({
+                'heading_doc1': sections1[i].heading if i is not None else None,
+                'heading_doc2': sections2[j].heading if j is not None else None,
+                'path': section.path,
+                'page_doc1': sections1[i].page + 1 if i is not None else None,
+                'page_doc2': sections2[j].page + 1 if j is not None else None,
+                'status': status,
+                **diff
+            })
+        
+        counts = {status: len([r for r in report if r['status'] == status])
+                  for status in ('unchanged', 'modified', 'added', 'removed')}
+        
+        return {
+            'num_sections_doc1': len(sections1),
+            'num_sections_doc2': len(sections2),
+            'section_counts': counts,
+            'sections': report
         }
     
+    @traced("text.fast")
+    def fast_comparison(self, text1: str, text2: str, shingle_size: int = 5, window: int = 8) -> Dict:
+        """Similitud por shingles de palabras (Jaccard/contención) y pasajes copiados"""
+        return fast_similarity(text1, text2, shingle_size=shingle_size, window=window)
+    
+    @traced("text.tables")
+    def table_comparison(self, tables1: List[Dict], tables2: List[Dict], max_changes: int = 50) -> Dict:
+        """Empareja las tablas de ambos documentos y compara celda a celda"""
+        return compare_tables(tables1, tables2, max_changes)
+    
+    @traced("text.tfidf")
     def tfidf_analysis(self, text1: str, text2: str) -> Dict:
         """Análisis TF-IDF para encontrar términos importantes"""
         texts = [text1, text2]
@@ -77,6 +235,7 @@ class TextAnalyzer:
         top_indices = np.argsort(tfidf_scores)[-top_n:][::-1]
         return [feature_names[i] for i in top_indices if tfidf_scores[i] > 0]
     
+    @traced("text.structural")
     def structural_similarity(self, structure1: Dict, structure2: Dict) -> float:
         """Calcula similitud estructural entre documentos"""
         score = 0.0
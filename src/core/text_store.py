@@ -0,0 +1,258 @@
+"""
+Texto extraído en disco (UTF-8 con memory-map) para documentos muy grandes
+
+Para documentos de muchas páginas, PDFContent.text y PDFContent.pages son dos
+copias completas del texto en memoria. Con un TextStore el texto se escribe una
+vez en ``{directory}/{hash}.txt`` junto a un índice ``{hash}.idx.npz`` con el
+byte en que empieza cada página y cada línea (mismas líneas que
+``str.splitlines``); las páginas y líneas se decodifican solo al pedirlas.
+``str(mapped)`` materializa el documento completo cuando un analizador lo
+necesita como texto.
+
+El directorio tiene un límite de tamaño: al superarlo se borran los textos usados
+hace más tiempo. Un texto borrado se vuelve a escribir la próxima vez que se
+carga su documento; los MappedText ya abiertos siguen siendo válidos (el mmap
+mantiene el fichero aunque se elimine).
+"""
+
+from collections.abc import Sequence
+from typing import Iterator, List, Optional, Tuple, Union
+import logging
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+from src.utils.hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+class MappedPages(Sequence):
+    """Páginas de un MappedText (cada acceso decodifica solo esa página)"""
+
+    __slots__ = ("_text",)
+
+    def __init__(self, text: "MappedText"):
+        self._text = text
+
+    def __len__(self) -> int:
+        return self._text.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._text.page(i) for i in range(*index.indices(len(self)))]
+        return self._text.page(index)
+
+
+class MappedLines(Sequence):
+    """Líneas de un MappedText, equivalentes a ``text.splitlines()``"""
+
+    __slots__ = ("_text",)
+
+    def __init__(self, text: "MappedText"):
+        self._text = text
+
+    def __len__(self) -> int:
+        return self._text.line_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self._text.line(i) for i in range(start, stop, step)]
+            return self._text.line_range(start, stop)
+        return self._text.line(index)
+
+    def __iter__(self) -> Iterator[str]:
+        # Por páginas: no decodifica el documento entero de una vez
+        for page_start, page_end in zip(self._text.page_lines[:-1], self._text.page_lines[1:]):
+            yield from self._text.line_range(int(page_start), int(page_end))
+
+
+class MappedText:
+    """Texto completo de un documento leído bajo demanda desde un fichero mapeado"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with np.load(f"{path}.idx.npz") as index:
+            self.page_bytes = index["page_bytes"]
+            self.page_lines = index["page_lines"]
+            self.line_bytes = index["line_bytes"]
+            self.line_chars = index["line_chars"]
+        with open(f"{path}.txt", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_bytes) - 1
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_bytes) - 1
+
+    @property
+    def pages(self) -> MappedPages:
+        return MappedPages(self)
+
+    def __len__(self) -> int:
+        return int(self.line_chars[-1])
+
+    def _decode(self, start: int, end: int) -> str:
+        return self._buffer[start:end].decode("utf-8")
+
+    def page(self, number: int) -> str:
+        if number < 0:
+            number += self.page_count
+        if not 0 <= number < self.page_count:
+            raise IndexError("page index out of range")
+        # Cada página ocupa su texto más el "\n" que la separa de la siguiente
+        return self._decode(int(self.page_bytes[number]), int(self.page_bytes[number + 1]) - 1)
+
+    def line(self, number: int) -> str:
+        if number < 0:
+            number += self.line_count
+        if not 0 <= number < self.line_count:
+            raise IndexError("line index out of range")
+        return self.line_range(number, number + 1)[0]
+
+    def line_range(self, start: int, stop: int) -> List[str]:
+        """Líneas [start, stop) decodificando un único bloque"""
+        if start >= stop:
+            return []
+        return self._decode(int(self.line_bytes[start]), int(self.line_bytes[stop])).splitlines()
+
+    def splitlines(self) -> MappedLines:
+        return MappedLines(self)
+
+    def __getitem__(self, index) -> str:
+        """Subcadena por offsets de carácter (p. ej. textos de DocumentStructure)"""
+        if not isinstance(index, slice):
+            index = slice(index, index + 1 if index != -1 else None)
+        start, stop, step = index.indices(len(self))
+        if start >= stop:
+            return ""
+        first = int(np.searchsorted(self.line_chars, start, side="right")) - 1
+        last = int(np.searchsorted(self.line_chars, stop, side="left"))
+        block = self._decode(int(self.line_bytes[first]), int(self.line_bytes[last]))
+        offset = int(self.line_chars[first])
+        return block[start - offset:stop - offset:step]
+
+    def encode(self, encoding: str = "utf-8") -> Union[memoryview, bytes]:
+        """Bytes del texto (sin copia si es UTF-8)"""
+        if encoding.lower().replace("-", "") == "utf8":
+            return memoryview(self._buffer)
+        return str(self).encode(encoding)
+
+    def __str__(self) -> str:
+        return self._decode(0, len(self._buffer))
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+
+def text_of(value: Union[str, MappedText]) -> str:
+    """Texto completo como str (materializa un MappedText)"""
+    return value if isinstance(value, str) else str(value)
+
+
+class TextStore:
+    """Directorio de textos mapeados por hash de contenido"""
+
+    def __init__(self, directory: str, min_pages: int = 200, max_disk_mb: int = 4096):
+        self.directory = directory
+        self.min_pages = min_pages
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def open(self, key: str) -> Optional[MappedText]:
+        path = self._path(key)
+        try:
+            mapped = MappedText(path)
+            # Marca de acceso para el LRU en disco
+            os.utime(f"{path}.txt", None)
+        except FileNotFoundError:
+            # No existe o se acaba de desalojar (quizá desde otro proceso)
+            return None
+        return mapped
+
+    def write(self, text: str, pages: List[str]) -> MappedText:
+        """Guarda el texto (``"".join(p + "\\n" for p in pages)``) y su índice"""
+        key = content_hash(text)
+        mapped = self.open(key)
+        if mapped is not None:
+            return mapped
+
+        page_bytes = [0]
+        page_lines = [0]
+        line_bytes = [0]
+        line_chars = [0]
+        for page in pages:
+            for line in (page + "\n").splitlines(keepends=True):
+                line_bytes.append(line_bytes[-1] + len(line.encode("utf-8")))
+                line_chars.append(line_chars[-1] + len(line))
+            page_bytes.append(line_bytes[-1])
+            page_lines.append(len(line_bytes) - 1)
+
+        # Escritura atómica: primero el texto y el índice en temporales, después el rename
+        path = self._path(key)
+        fd, tmp_text = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(text.encode("utf-8"))
+        fd, tmp_index = tempfile.mkstemp(dir=self.directory, suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(
+                f,
+                page_bytes=np.array(page_bytes, dtype=np.int64),
+                page_lines=np.array(page_lines, dtype=np.int64),
+                line_bytes=np.array(line_bytes, dtype=np.int64),
+                line_chars=np.array(line_chars, dtype=np.int64)
+            )
+        # Primero el índice: open() no encuentra el texto hasta que está completo
+        os.replace(tmp_index, f"{path}.idx.npz")
+        os.replace(tmp_text, f"{path}.txt")
+        mapped = MappedText(path)
+        self._enforce_disk_limit(keep=key)
+        return mapped
+
+    def _enforce_disk_limit(self, keep: str):
+        """Elimina los textos usados hace más tiempo hasta respetar el límite"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".txt"):
+                continue
+            key = name[:-len(".txt")]
+            path = self._path(key)
+            try:
+                mtime = os.path.getmtime(f"{path}.txt")
+                size = os.path.getsize(f"{path}.txt") + os.path.getsize(f"{path}.idx.npz")
+            except FileNotFoundError:
+                continue
+            total += size
+            if key != keep:
+                entries.append((mtime, size, path))
+
+        entries.sort()
+        while total > self.max_disk_bytes and entries:
+            _, size, path = entries.pop(0)
+            for suffix in (".txt", ".idx.npz"):
+                try:
+                    os.remove(f"{path}{suffix}")
+                except FileNotFoundError:
+                    pass
+            total -= size
+            logger.info(f"Evicted extracted text {os.path.basename(path)}")
+
+    def map(self, text: str, pages: List[str]) -> Tuple[Union[str, MappedText], Union[List[str], MappedPages]]:
+        """(texto, páginas) en disco si el documento tiene al menos `min_pages` páginas"""
+        if len(pages) < self.min_pages:
+            return text, pages
+        mapped = self.write(text, pages)
+        return mapped, mapped.pages
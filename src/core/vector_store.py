@@ -0,0 +1,224 @@
+"""
+Almacén persistente de índices vectoriales FAISS por documento
+"""
+
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from langchain.schema import Document
+from langchain.text_splitter import TextSplitter
+from langchain.vectorstores import FAISS
+
+from src.utils.hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DocumentIndex:
+    """Índice de chunks de un documento (id del almacén o hash de contenido)"""
+    doc_hash: str
+    # None si el documento no tiene texto que trocear (FAISS no admite índices vacíos)
+    vectorstore: Optional[FAISS]
+    documents: List[Document]
+    # Hash del texto indexado: detecta documentos re-extraídos con otra configuración
+    text_hash: str = ""
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Embeddings de los chunks en el orden de `documents`"""
+        if self.vectorstore is None:
+            return np.empty((0, 0), dtype=np.float32)
+        index = self.vectorstore.index
+        return index.reconstruct_n(0, index.ntotal)
+
+
+class VectorIndexStore:
+    """Construye una vez, persiste y reutiliza el índice de cada documento"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        text_splitter: TextSplitter,
+        index_dir: str,
+        max_disk_mb: int = 2048,
+        max_memory_entries: int = 32,
+        profile: str = "",
+        encoder=None
+    ):
+        self.embeddings = embeddings
+        self.text_splitter = text_splitter
+        # DocumentEncoder opcional: reutiliza chunks y embeddings ya calculados
+        self.encoder = encoder
+        self.index_dir = index_dir
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.max_memory_entries = max_memory_entries
+        # El perfil (modelo + parámetros de chunking) invalida índices incompatibles
+        self.profile = hashlib.sha256(profile.encode("utf-8")).hexdigest()[:12]
+        self._memory: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _folder(self, doc_hash: str) -> str:
+        folder = os.path.normpath(os.path.join(self.index_dir, f"{self.profile}-{doc_hash}"))
+        # El id viene del cliente: la carpeta tiene que quedar directamente bajo index_dir
+        if os.path.dirname(folder) != os.path.normpath(self.index_dir):
+            raise ValueError(f"Invalid document id: {doc_hash!r}")
+        return folder
+
+    def _remember(self, index: DocumentIndex):
+        with self._lock:
+            self._memory[index.doc_hash] = index
+            self._memory.move_to_end(index.doc_hash)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, doc_hash: str) -> Optional[DocumentIndex]:
+        """Obtiene el índice de un documento desde memoria o disco"""
+        with self._lock:
+            index = self._memory.get(doc_hash)
+            if index is not None:
+                self._memory.move_to_end(doc_hash)
+                return index
+
+        folder = self._folder(doc_hash)
+        if not os.path.isdir(folder):
+            return None
+
+        try:
+            vectorstore = FAISS.load_local(folder, self.embeddings)
+        except Exception as e:
+            logger.warning(f"Corrupt vector index {folder}, discarding: {e}")
+            shutil.rmtree(folder, ignore_errors=True)
+            return None
+
+        # Marca de acceso para el LRU en disco
+        os.utime(folder, None)
+
+        documents = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[i])
+            for i in range(len(vectorstore.index_to_docstore_id))
+        ]
+        index = DocumentIndex(
+            doc_hash=doc_hash, vectorstore=vectorstore, documents=documents,
+            text_hash=self._read_text_hash(folder)
+        )
+        self._remember(index)
+        return index
+
+    @staticmethod
+    def _read_text_hash(folder: str) -> str:
+        try:
+            with open(os.path.join(folder, "text_hash")) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def get_or_create(self, text: str, doc_id: Optional[str] = None, persist: bool = True) -> DocumentIndex:
+        """Devuelve el índice del documento, construyéndolo si no existe
+
+        `doc_id` es el id del almacén de documentos; sin él se usa el hash del texto.
+        Con `persist=False` el índice construido no se guarda ni en disco ni en memoria.
+        """
+        text_hash = content_hash(text)
+        doc_hash = doc_id or text_hash
+        index = self.get(doc_hash)
+        if index is not None and (doc_id is None or index.text_hash == text_hash):
+            return index
+
+        start_time = time.time()
+        if self.encoder is not None:
+            chunks, vectors = self.encoder.encode(text)
+            vectors = self.embeddings.postprocess(vectors)
+            documents = [
+                Document(page_content=chunk, metadata={"doc_hash": doc_hash, "chunk": i})
+                for i, chunk in enumerate(chunks)
+            ]
+            vectorstore = FAISS.from_embeddings(
+                list(zip(chunks, vectors.tolist())),
+                self.embeddings,
+                metadatas=[doc.metadata for doc in documents]
+            ) if documents else None
+        else:
+            documents = self.text_splitter.create_documents([text])
+            for i, doc in enumerate(documents):
+                doc.metadata = {"doc_hash": doc_hash, "chunk": i}
+            vectorstore = FAISS.from_documents(documents, self.embeddings) if documents else None
+        index = DocumentIndex(doc_hash=doc_hash, vectorstore=vectorstore, documents=documents, text_hash=text_hash)
+        if not persist:
+            return index
+
+        # Un índice vacío no se guarda en disco (reconstruirlo no cuesta nada), pero
+        # sí se descarta el de un texto anterior del mismo documento
+        if vectorstore is not None:
+            self._persist(index)
+        else:
+            shutil.rmtree(self._folder(doc_hash), ignore_errors=True)
+        self._remember(index)
+        logger.info(
+            f"Built vector index for {doc_hash[:12]} "
+            f"({len(documents)} chunks, {time.time() - start_time:.2f}s)"
+        )
+        return index
+
+    def _persist(self, index: DocumentIndex):
+        """Guarda el índice en disco y aplica el límite de tamaño"""
+        folder = self._folder(index.doc_hash)
+        tmp_folder = f"{folder}.tmp{os.getpid()}"
+        try:
+            index.vectorstore.save_local(tmp_folder)
+            with open(os.path.join(tmp_folder, "text_hash"), "w") as f:
+                f.write(index.text_hash)
+            if os.path.isdir(folder) and self._read_text_hash(folder) == index.text_hash:
+                # Otro proceso ya guardó el mismo índice
+                shutil.rmtree(tmp_folder, ignore_errors=True)
+            else:
+                # Índice nuevo o de un texto anterior del mismo documento
+                shutil.rmtree(folder, ignore_errors=True)
+                os.replace(tmp_folder, folder)
+        except Exception as e:
+            logger.warning(f"Could not persist vector index {index.doc_hash[:12]}: {e}")
+            shutil.rmtree(tmp_folder, ignore_errors=True)
+            return
+
+        self._enforce_disk_limit()
+
+    def _enforce_disk_limit(self):
+        """Elimina los índices usados hace más tiempo hasta respetar el límite"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.index_dir):
+            folder = os.path.join(self.index_dir, name)
+            if not os.path.isdir(folder) or ".tmp" in name:
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(folder, f))
+                for f in os.listdir(folder)
+            )
+            entries.append((os.path.getmtime(folder), size, folder))
+            total += size
+
+        entries.sort()
+        while total > self.max_disk_bytes and entries:
+            _, size, folder = entries.pop(0)
+            shutil.rmtree(folder, ignore_errors=True)
+            total -= size
+            logger.info(f"Evicted vector index {os.path.basename(folder)}")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "memory_entries": len(self._memory),
+            "disk_entries": len([
+                n for n in os.listdir(self.index_dir)
+                if os.path.isdir(os.path.join(self.index_dir, n))
+            ])
+        }
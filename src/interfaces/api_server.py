@@ -1,24 +1,46 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, Field, validator
+from typing import List, Dict, Optional, Any, Tuple
+import asyncio
+import io
+import os
+import re
 import time
+import uuid
 from datetime import datetime
 import logging
 from prometheus_client import Counter, Histogram, Gauge, generate_latest
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 
 # Local imports
-from src.core.pdf_processor import PDFProcessor
+from src.core.pdf_processor import PDFProcessor, PDFContent
+from src.core.ocr import create_ocr_engine
 from src.core.text_analyzer import TextAnalyzer
 from src.core.embeddings import EmbeddingAnalyzer
+from src.core.chunking import encoder_from_config
 from src.core.langchain_handler import LangChainHandler
+from src.core.dedup import CorpusDeduplicator
+from src.core.diff_store import DiffStore, render_hunks
+from src.core.document_store import DocumentStore, create_document_store
+from src.core.document_vectors import DocumentVectorIndex, document_vector
+from src.core.corpus_index import CorpusIndex
+from src.core.page_alignment import align_pages, changed_texts
+from src.core.text_store import TextStore, text_of
+from src.chatbot.session_store import create_session_store
 from src.utils.config import get_settings, setup_logging
+from src.utils.serialization import dumps, pack
+from src.utils.tracing import (
+    RequestProfiler, configure_tracing, current_trace, end_request_trace,
+    start_request_trace, tracing_enabled
+)
 
 # Initialize settings and logging
 settings = get_settings()
 setup_logging(settings)
+configure_tracing(settings.enable_tracing)
 logger = logging.getLogger(__name__)
 
 # Prometheus metrics
@@ -27,6 +49,18 @@ request_duration = Histogram('pdf_comparator_request_duration_seconds', 'Request
 active_requests = Gauge('pdf_comparator_active_requests', 'Active requests')
 pdf_processing_duration = Histogram('pdf_processing_duration_seconds', 'PDF processing duration')
 analysis_duration = Histogram('pdf_analysis_duration_seconds', 'Analysis duration', ['analysis_type'])
+chat_retrieval_duration = Histogram('pdf_comparator_chat_retrieval_duration_seconds', 'Chat chunk retrieval duration')
+chat_prompt_tokens = Histogram(
+    'pdf_comparator_chat_prompt_tokens',
+    'Estimated prompt tokens per chat turn',
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192)
+)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (numpy scalars/arrays and namedtuples supported)"""
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -35,7 +69,8 @@ app = FastAPI(
     version="2.0.0",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    default_response_class=FastJSONResponse
 )
 
 # CORS middleware
@@ -48,12 +83,48 @@ app.add_middleware(
 )
 
 # Global instances
-pdf_processor = PDFProcessor()
+text_store = (
+    TextStore(settings.text_store_path, settings.text_store_min_pages, settings.text_store_max_disk_mb)
+    if settings.text_store_enabled else None
+)
+pdf_processor = PDFProcessor(
+    create_ocr_engine(**settings.get_ocr_config()),
+    settings.ocr_min_chars,
+    extract_tables=settings.table_extraction_enabled,
+    text_store=text_store
+)
 text_analyzer = TextAnalyzer()
-embedding_analyzer = EmbeddingAnalyzer()
+embedding_config = settings.get_langchain_config()["embeddings"]
+embedding_analyzer = EmbeddingAnalyzer(
+    embedding_config["model_name"],
+    encoder=encoder_from_config(embedding_config)
+)
 langchain_handler = None
+corpus_deduplicator = None
+document_store = None
+document_vectors = None
+corpus_index = None
+# One profiled request at a time: concurrent profiles would mix each other's samples
+profile_lock = asyncio.Lock()
+session_store = create_session_store(settings.session_backend, settings.redis_url)
+diff_store = DiffStore(settings.redis_url, settings.diff_ttl_seconds)
 
 # Models
+DOCUMENT_ID = re.compile(r"[0-9a-f]{64}")
+
+def validate_document_id(value: str) -> str:
+    """Document ids are sha256 hex digests; they end up in storage paths"""
+    if not DOCUMENT_ID.fullmatch(value):
+        raise ValueError("document id must be a 64-character lowercase hex sha256")
+    return value
+
+async def path_document_id(document_id: str) -> str:
+    """Path parameter dependency: same ids as the request bodies accept"""
+    try:
+        return validate_document_id(document_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 class ComparisonRequest(BaseModel):
     analysis_types: List[str] = Field(
         ["basic", "semantic", "ai"],
@@ -62,6 +133,14 @@ class ComparisonRequest(BaseModel):
     domain: str = Field("general", description="Domain for specialized analysis")
     language: str = Field("es", description="Language for analysis")
     use_cache: bool = Field(True, description="Use cached results if available")
+    session_id: Optional[str] = Field(None, description="Chat session to attach documents and results to")
+    incremental: bool = Field(True, description="Skip pages whose fingerprint is unchanged")
+
+class StoredComparisonRequest(ComparisonRequest):
+    document_id1: str = Field(..., description="Stored document id (see /api/v1/documents)")
+    document_id2: str = Field(..., description="Stored document id (see /api/v1/documents)")
+    
+    _check_document_ids = validator("document_id1", "document_id2", allow_reuse=True)(validate_document_id)
 
 class ComparisonResponse(BaseModel):
     request_id: str
@@ -74,6 +153,18 @@ class ChatMessage(BaseModel):
     message: str
     context: Optional[Dict] = None
     session_id: Optional[str] = None
+    document_ids: Optional[List[str]] = Field(
+        None,
+        description="Stored document ids (see /api/v1/documents) to retrieve context from"
+    )
+    top_k: Optional[int] = Field(None, description="Chunks to retrieve per document")
+    
+    _check_document_ids = validator("document_ids", each_item=True, allow_reuse=True)(validate_document_id)
+
+class CorpusSearchRequest(BaseModel):
+    query: str = Field(..., description="Passage or question to look for across the corpus")
+    top_k: int = Field(10, ge=1, le=100, description="Passages to return")
+    exclude_document_ids: List[str] = Field([], description="Documents to leave out of the results")
 
 class HealthResponse(BaseModel):
     status: str
@@ -109,6 +200,60 @@ async def metrics_middleware(request, call_next):
     finally:
         active_requests.dec()
 
+@app.middleware("http")
+async def tracing_middleware(request, call_next):
+    """Per-stage trace of each request (Server-Timing header) and opt-in profiling
+    
+    With ENABLE_PROFILING, a request carrying `X-Profile: cprofile|pyinstrument`
+    is profiled end to end and the response body is replaced by the profile.
+    Profiled requests are serialized per worker; a second one gets a 409.
+    """
+    profile_mode = request.headers.get("x-profile") if settings.enable_profiling else None
+    if not tracing_enabled() and not profile_mode:
+        return await call_next(request)
+    
+    if profile_mode:
+        if profile_lock.locked():
+            return FastJSONResponse(
+                {"detail": "Another profiled request is running, retry later"},
+                status_code=409
+            )
+        async with profile_lock:
+            return await traced_request(request, call_next, profile_mode)
+    return await traced_request(request, call_next, None)
+
+async def traced_request(request, call_next, profile_mode: Optional[str]):
+    """Run the request under a trace, profiled when profile_mode is given"""
+    token = start_request_trace()
+    trace = current_trace()
+    profiler = RequestProfiler(profile_mode.lower(), trace) if profile_mode else None
+    try:
+        if profiler is None:
+            response = await call_next(request)
+            if trace.spans:
+                response.headers["Server-Timing"] = trace.server_timing()
+            return response
+        
+        start_time = time.perf_counter()
+        profiler.start()
+        try:
+            response = await call_next(request)
+            # Consume the body inside the profile (streaming responses, background tasks)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        finally:
+            profile = profiler.stop()
+        return FastJSONResponse({
+            "path": request.url.path,
+            "status_code": response.status_code,
+            "duration_ms": (time.perf_counter() - start_time) * 1000,
+            "response_bytes": len(body),
+            "stages": trace.summary(),
+            "spans": trace.spans,
+            "profile": profile
+        })
+    finally:
+        end_request_trace(token)
+
 # Dependencies
 async def get_langchain_handler():
     """Dependency para obtener LangChain handler"""
@@ -117,6 +262,56 @@ async def get_langchain_handler():
         langchain_handler = LangChainHandler(settings.get_langchain_config())
     return langchain_handler
 
+async def get_document_store():
+    """Dependency para obtener el almacén de documentos"""
+    global document_store
+    if document_store is None:
+        document_store = await run_in_threadpool(
+            create_document_store, **settings.get_document_store_config(), text_store=text_store
+        )
+    return document_store
+
+async def get_corpus_deduplicator(
+    background_tasks: BackgroundTasks,
+    store: DocumentStore = Depends(get_document_store)
+):
+    """Dependency para obtener el índice de casi duplicados"""
+    global corpus_deduplicator
+    if corpus_deduplicator is None:
+        def load_text(doc_id: str) -> Optional[str]:
+            content = store.load_current_content(doc_id, pdf_processor)
+            return text_of(content.text) if content is not None else None
+
+        corpus_deduplicator = await run_in_threadpool(
+            CorpusDeduplicator, **settings.get_dedup_config(), document_loader=load_text
+        )
+        # Signatures from an older format are rebuilt after the response, not inside it
+        if await run_in_threadpool(corpus_deduplicator.pending_reindex):
+            background_tasks.add_task(run_in_threadpool, corpus_deduplicator.reindex)
+    return corpus_deduplicator
+
+def get_document_vectors() -> DocumentVectorIndex:
+    """Document-vector matrix for the current embedding model and chunking"""
+    global document_vectors
+    if document_vectors is None:
+        document_vectors = DocumentVectorIndex(
+            os.path.join(settings.document_vectors_path, embedding_analyzer.cache_key.replace("/", "__")),
+            embedding_analyzer.batcher.dimension
+        )
+    return document_vectors
+
+def get_corpus_index() -> CorpusIndex:
+    """Chunk-level vector index over every stored document"""
+    global corpus_index
+    if corpus_index is None:
+        config = settings.get_corpus_index_config()
+        corpus_index = CorpusIndex(
+            os.path.join(config.pop("path"), embedding_analyzer.cache_key.replace("/", "__")),
+            embedding_analyzer.batcher.dimension,
+            **config
+        )
+    return corpus_index
+
 # Endpoints
 @app.get("/", tags=["General"])
 async def root():
@@ -131,6 +326,12 @@ async def root():
             "/ready": "Readiness check",
             "/metrics": "Prometheus metrics",
             "/api/v1/compare": "Compare two PDFs",
+            "/api/v1/compare/batch": "Compare one baseline PDF against many candidates",
+            "/api/v1/compare/documents": "Compare two stored documents by id",
+            "/api/v1/documents": "Upload a PDF to the document store",
+            "/api/v1/search/similar": "Find stored documents semantically similar to a PDF",
+            "/api/v1/corpus/search": "Find passages across all stored documents",
+            "/api/v1/corpus/duplicates": "Find near-duplicates of a PDF in the corpus",
             "/api/v1/chat": "Chat interface",
             "/api/v1/analyze": "Analyze single PDF"
         }
@@ -190,11 +391,13 @@ async def compare_pdfs(
     pdf1: UploadFile = File(...),
     pdf2: UploadFile = File(...),
     request: ComparisonRequest = ComparisonRequest(),
-    handler: LangChainHandler = Depends(get_langchain_handler)
+    handler: LangChainHandler = Depends(get_langchain_handler),
+    store: DocumentStore = Depends(get_document_store)
 ):
     """Compare two PDF documents"""
     start_time = time.time()
-    request_id = f"req_{int(time.time() * 1000)}"
+    # Random: the id is also the key of the stored results and diff pages
+    request_id = uuid.uuid4().hex
     
     logger.info(f"Starting comparison request {request_id}")
     
@@ -203,103 +406,441 @@ async def compare_pdfs(
         if pdf1.content_type != "application/pdf" or pdf2.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="Both files must be PDFs")
         
-        # Check file size
-        pdf1_size = len(await pdf1.read())
-        pdf2_size = len(await pdf2.read())
-        await pdf1.seek(0)
-        await pdf2.seek(0)
-        
+        # Check file size without reading the uploads into memory
         max_size_bytes = settings.max_pdf_size_mb * 1024 * 1024
-        if pdf1_size > max_size_bytes or pdf2_size > max_size_bytes:
+        if upload_size(pdf1) > max_size_bytes or upload_size(pdf2) > max_size_bytes:
             raise HTTPException(
                 status_code=400,
                 detail=f"PDF size exceeds maximum of {settings.max_pdf_size_mb}MB"
             )
         
-        # Process PDFs
+        # Store PDFs (deduplicated by content hash) and reuse stored extractions
         with pdf_processing_duration.time():
-            content1 = pdf_processor.extract_text(pdf1.file)
-            content2 = pdf_processor.extract_text(pdf2.file)
+            stored_id1, content1, _ = await run_in_threadpool(store.ingest, pdf1.file, pdf_processor)
+            stored_id2, content2, _ = await run_in_threadpool(store.ingest, pdf2.file, pdf_processor)
         
-        results = {}
+        return await finish_comparison(
+            request_id, start_time, background_tasks, request, handler, store,
+            (stored_id1, content1), (stored_id2, content2)
+        )
         
-        # Basic analysis
-        if "basic" in request.analysis_types:
-            with analysis_duration.labels(analysis_type="basic").time():
-                results["basic"] = text_analyzer.basic_comparison(content1.text, content2.text)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in comparison request {request_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/compare/documents", response_model=ComparisonResponse, tags=["Analysis"])
+async def compare_stored_documents(
+    background_tasks: BackgroundTasks,
+    request: StoredComparisonRequest,
+    handler: LangChainHandler = Depends(get_langchain_handler),
+    store: DocumentStore = Depends(get_document_store)
+):
+    """Compare two documents already in the document store"""
+    start_time = time.time()
+    # Random: the id is also the key of the stored results and diff pages
+    request_id = uuid.uuid4().hex
+    
+    logger.info(f"Starting stored comparison request {request_id}")
+    
+    try:
+        documents = []
+        for doc_id in (request.document_id1, request.document_id2):
+            content = await run_in_threadpool(store.load_current_content, doc_id, pdf_processor)
+            if content is None:
+                raise HTTPException(status_code=404, detail=f"Document not found: {doc_id}")
+            documents.append((doc_id, content))
         
-        # Semantic analysis
-        if "semantic" in request.analysis_types and settings.enable_semantic_analysis:
-            with analysis_duration.labels(analysis_type="semantic").time():
-                results["semantic"] = embedding_analyzer.semantic_comparison(content1.text, content2.text)
+        return await finish_comparison(
+            request_id, start_time, background_tasks, request, handler, store, *documents
+        )
         
-        # AI analysis with LangChain
-        if "ai" in request.analysis_types:
-            with analysis_duration.labels(analysis_type="ai").time():
-                results["ai"] = await handler.compare_documents_intelligent(
-                    content1.text,
-                    content2.text,
-                    request.domain,
-                    request.language
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in comparison request {request_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/compare/batch", tags=["Analysis"])
+async def compare_batch(
+    baseline: UploadFile = File(...),
+    candidates: List[UploadFile] = File(...),
+    request: ComparisonRequest = ComparisonRequest(),
+    handler: LangChainHandler = Depends(get_langchain_handler),
+    store: DocumentStore = Depends(get_document_store)
+):
+    """Compare one baseline PDF against many candidates, streaming NDJSON results"""
+    start_time = time.time()
+    # Random: the id is also the key of the stored diff pages
+    request_id = uuid.uuid4().hex
+    max_size_bytes = settings.max_pdf_size_mb * 1024 * 1024
+    
+    if len(candidates) > settings.batch_max_candidates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many candidates (maximum {settings.batch_max_candidates})"
+        )
+    
+    for upload in [baseline] + candidates:
+        if upload.content_type != "application/pdf":
+            raise HTTPException(status_code=400, detail=f"{upload.filename} is not a PDF")
+        if upload_size(upload) > max_size_bytes:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{upload.filename} exceeds maximum of {settings.max_pdf_size_mb}MB"
+            )
+    
+    baseline_name = baseline.filename
+    logger.info(f"Starting batch request {request_id} with {len(candidates)} candidates")
+    
+    # Store, extract and embed the baseline once
+    with pdf_processing_duration.time():
+        baseline_id, baseline_content, _ = await run_in_threadpool(store.ingest, baseline.file, pdf_processor)
+    
+    # Move the candidates into the document store before streaming: the request
+    # files are closed once streaming starts, and only ids are kept in memory
+    candidate_files = []
+    for upload in candidates:
+        doc_id, _ = await run_in_threadpool(store.put_pdf, upload.file)
+        candidate_files.append((upload.filename, doc_id))
+    
+    baseline_encoded = None
+    if "semantic" in request.analysis_types and settings.enable_semantic_analysis:
+        baseline_encoded = await run_in_threadpool(encode_stored, store, baseline_id, baseline_content, baseline_name)
+    if "ai" in request.analysis_types:
+        await handler.get_document_index(text_of(baseline_content.text), baseline_id)
+    
+    semaphore = asyncio.Semaphore(settings.batch_max_concurrency)
+    
+    async def process_candidate(position: int, filename: str, doc_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            candidate_start = time.time()
+            try:
+                with pdf_processing_duration.time():
+                    content = await run_in_threadpool(store.load_current_content, doc_id, pdf_processor)
+                if content is None:
+                    raise ValueError(f"Document not found: {doc_id}")
+                result_id = f"{request_id}_{position}"
+                results = await run_analyses(
+                    baseline_content, content, request, handler, baseline_encoded, diff_id=result_id,
+                    stored_ids=(baseline_id, doc_id), store=store
                 )
+                return {
+                    "type": "result",
+                    "index": position,
+                    "result_id": result_id,
+                    "filename": filename,
+                    "document_id": doc_id,
+                    "status": "success",
+                    "similarity": ranking_score(results),
+                    "pages": len(content.pages),
+                    "results": results,
+                    "execution_time": time.time() - candidate_start
+                }
+            except Exception as e:
+                logger.error(f"Error comparing candidate {filename} in {request_id}: {str(e)}")
+                return {
+                    "type": "result",
+                    "index": position,
+                    "filename": filename,
+                    "status": "error",
+                    "error": str(e)
+                }
+    
+    async def stream_results():
+        tasks = [
+            asyncio.create_task(process_candidate(i, filename, doc_id))
+            for i, (filename, doc_id) in enumerate(candidate_files)
+        ]
+        finished = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                finished.append(item)
+                yield dumps(item) + b"\n"
+            
+            ranking = sorted(
+                (r for r in finished if r["status"] == "success" and r["similarity"] is not None),
+                key=lambda r: r["similarity"],
+                reverse=True
+            )
+            yield dumps({
+                "type": "summary",
+                "request_id": request_id,
+                "baseline": {
+                    "filename": baseline_name,
+                    "document_id": baseline_id,
+                    "pages": len(baseline_content.pages)
+                },
+                "total": len(candidate_files),
+                "succeeded": len([r for r in finished if r["status"] == "success"]),
+                "failed": len([r for r in finished if r["status"] == "error"]),
+                "ranking": [
+                    {"index": r["index"], "filename": r["filename"], "similarity": r["similarity"]}
+                    for r in ranking
+                ],
+                "execution_time": time.time() - start_time
+            }) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/api/v1/documents", tags=["Documents"])
+async def upload_document(
+    background_tasks: BackgroundTasks,
+    pdf: UploadFile = File(...),
+    store: DocumentStore = Depends(get_document_store)
+):
+    """Store a PDF under its content hash so it can be referenced by id"""
+    try:
+        if pdf.content_type != "application/pdf":
+            raise HTTPException(status_code=400, detail="File must be a PDF")
+        if upload_size(pdf) > settings.max_pdf_size_mb * 1024 * 1024:
+            raise HTTPException(
+                status_code=400,
+                detail=f"PDF size exceeds maximum of {settings.max_pdf_size_mb}MB"
+            )
         
-        # Structural analysis
-        if "structural" in request.analysis_types and settings.enable_structural_analysis:
-            with analysis_duration.labels(analysis_type="structural").time():
-                results["structural"] = text_analyzer.structural_similarity(
-                    content1.structure,
-                    content2.structure
-                )
+        with pdf_processing_duration.time():
+            doc_id, content, created = await run_in_threadpool(store.ingest, pdf.file, pdf_processor)
         
-        execution_time = time.time() - start_time
+        # Embed in the background so the document shows up in similarity search
+        if settings.enable_semantic_analysis:
+            background_tasks.add_task(encode_stored, store, doc_id, content, pdf.filename)
         
-        # Background task to cache results
-        if request.use_cache and settings.enable_caching:
-            background_tasks.add_task(cache_results, request_id, results)
+        return {
+            "document_id": doc_id,
+            "created": created,
+            "filename": pdf.filename,
+            "pages": len(content.pages),
+            "ocr": content.metadata.get("ocr")
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error storing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/documents/{document_id}", tags=["Documents"])
+async def get_document(document_id: str = Depends(path_document_id), store: DocumentStore = Depends(get_document_store)):
+    """Metadata of a stored document"""
+    content = await run_in_threadpool(store.load_content, document_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    return {
+        "document_id": document_id,
+        "pages": len(content.pages),
+        "metadata": content.metadata,
+        "structure": {key: len(items) for key, items in content.structure.items()}
+    }
+
+@app.get("/api/v1/documents/{document_id}/pdf", tags=["Documents"])
+async def download_document(document_id: str = Depends(path_document_id), store: DocumentStore = Depends(get_document_store)):
+    """Stream the original PDF from the document store"""
+    if not await run_in_threadpool(store.has_pdf, document_id):
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    return StreamingResponse(
+        store.iter_pdf(document_id),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{document_id}.pdf"'}
+    )
+
+@app.post("/api/v1/search/similar", tags=["Search"])
+async def search_similar_documents(
+    pdf: UploadFile = File(...),
+    top_k: int = 10,
+    store: DocumentStore = Depends(get_document_store)
+):
+    """Find the stored documents most similar to an uploaded PDF.
+    
+    The upload is stored and indexed; its length-weighted document vector is
+    compared against the memory-mapped matrix of all indexed documents.
+    """
+    start_time = time.time()
+    try:
+        if pdf.content_type != "application/pdf":
+            raise HTTPException(status_code=400, detail="File must be a PDF")
+        if upload_size(pdf) > settings.max_pdf_size_mb * 1024 * 1024:
+            raise HTTPException(
+                status_code=400,
+                detail=f"PDF size exceeds maximum of {settings.max_pdf_size_mb}MB"
+            )
+        top_k = max(1, min(top_k, settings.similar_search_max_k))
         
-        return ComparisonResponse(
-            request_id=request_id,
-            status="success",
-            results=results,
-            execution_time=execution_time,
-            metadata={
-                "pdf1_pages": len(content1.pages),
-                "pdf2_pages": len(content2.pages),
-                "analysis_types": request.analysis_types,
-                "language": request.language,
-                "model": settings.vllm_model_name
-            }
+        with pdf_processing_duration.time():
+            doc_id, content, _ = await run_in_threadpool(store.ingest, pdf.file, pdf_processor)
+        chunks, embeddings = await run_in_threadpool(encode_stored, store, doc_id, content, pdf.filename)
+        if not len(chunks):
+            raise HTTPException(status_code=422, detail="Document has no text to compare")
+        
+        search_start = time.time()
+        index = get_document_vectors()
+        matches = await run_in_threadpool(
+            index.search, document_vector(chunks, embeddings), top_k, [doc_id]
         )
         
+        return {
+            "document_id": doc_id,
+            "results": [{"document_id": match_id, "similarity": score} for match_id, score in matches],
+            "indexed_documents": len(index),
+            "search_time": time.time() - search_start,
+            "execution_time": time.time() - start_time
+        }
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in comparison request {request_id}: {str(e)}")
+        logger.error(f"Error searching similar documents: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/v1/corpus/search", tags=["Corpus"])
+async def search_corpus(request: CorpusSearchRequest):
+    """Find passages across all stored documents, with document and page locations"""
+    start_time = time.time()
+    try:
+        vectors = await run_in_threadpool(embedding_analyzer.batcher.encode, [request.query])
+        corpus = get_corpus_index()
+        passages = await run_in_threadpool(
+            corpus.search, vectors[0], request.top_k, request.exclude_document_ids
+        )
+        return {
+            "query": request.query,
+            "results": passages,
+            "execution_time": time.time() - start_time
+        }
+    except Exception as e:
+        logger.error(f"Error searching corpus: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/corpus/index", tags=["Corpus"])
+async def corpus_index_stats():
+    """Size of the corpus passage index and pending tombstones"""
+    return await run_in_threadpool(get_corpus_index().get_stats)
+
+@app.delete("/api/v1/corpus/index/{document_id}", tags=["Corpus"])
+async def remove_from_corpus_index(document_id: str = Depends(path_document_id)):
+    """Remove a document from passage and similar-document search.
+    
+    Its passages are tombstoned (purged on the next compaction) and the
+    exclusion is persistent: later comparisons do not index it again.
+    """
+    passages = await run_in_threadpool(get_corpus_index().delete_document, document_id)
+    vector = await run_in_threadpool(get_document_vectors().delete, document_id)
+    if not passages and not vector:
+        raise HTTPException(status_code=404, detail=f"Document not indexed: {document_id}")
+    return {"document_id": document_id, "deleted": True, "passages": passages, "document_vector": vector}
+
+@app.post("/api/v1/corpus/index/compact", tags=["Corpus"])
+async def compact_corpus_index():
+    """Rebuild the passage index without tombstoned chunks"""
+    start_time = time.time()
+    result = await run_in_threadpool(get_corpus_index().compact)
+    return {**result, "execution_time": time.time() - start_time}
+
+@app.post("/api/v1/corpus/duplicates", tags=["Corpus"])
+async def find_corpus_duplicates(
+    pdf: UploadFile = File(...),
+    register: bool = True,
+    deduplicator: CorpusDeduplicator = Depends(get_corpus_deduplicator),
+    store: DocumentStore = Depends(get_document_store)
+):
+    """Find near-duplicates of a PDF in the corpus, optionally adding it"""
+    start_time = time.time()
+    try:
+        if pdf.content_type != "application/pdf":
+            raise HTTPException(status_code=400, detail="File must be a PDF")
+        
+        with pdf_processing_duration.time():
+            doc_id, content, _ = await run_in_threadpool(store.ingest, pdf.file, pdf_processor)
+        text = text_of(content.text)
+        
+        if register:
+            matches = await run_in_threadpool(deduplicator.add, doc_id, text, pdf.filename)
+        else:
+            matches = await run_in_threadpool(deduplicator.query, text, doc_id)
+        
+        return {
+            "document_id": doc_id,
+            "registered": register,
+            "matches": matches,
+            "execution_time": time.time() - start_time
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding duplicates: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/chat", tags=["Chat"])
 async def chat(
     message: ChatMessage,
-    handler: LangChainHandler = Depends(get_langchain_handler)
+    handler: LangChainHandler = Depends(get_langchain_handler),
+    store: DocumentStore = Depends(get_document_store)
 ):
     """Chat interface for document questions"""
     try:
-        # Get context from session or message
+        session = await run_in_threadpool(session_store.get_or_create, message.session_id)
+        chat_history = session_store.render_history(session)
+        suggestions = [
+            "¿Cuáles son las principales diferencias?",
+            "¿Qué recomiendas hacer?",
+            "Explica los cambios más importantes"
+        ]
+        
+        if message.document_ids:
+            session_store.add_documents(session, message.document_ids)
+        
+        # Retrieval over cached document indexes
+        if session["documents"]:
+            await ensure_document_indexes(handler, store, session["documents"])
+            try:
+                result = await handler.answer_question_with_retrieval(
+                    message.message,
+                    session["documents"],
+                    top_k=message.top_k,
+                    chat_history=chat_history
+                )
+            except KeyError as e:
+                raise HTTPException(status_code=404, detail=f"Document not indexed: {e.args[0]}")
+            
+            chat_retrieval_duration.observe(result["retrieval"]["latency_seconds"])
+            chat_prompt_tokens.observe(result["retrieval"]["prompt_tokens"])
+            
+            session_store.append_message(session, "user", message.message)
+            session_store.append_message(session, "assistant", result["answer"])
+            await run_in_threadpool(session_store.save, session)
+            
+            return {
+                "response": result["answer"],
+                "session_id": session["session_id"],
+                "sources": result["sources"],
+                "retrieval": result["retrieval"],
+                "suggestions": suggestions
+            }
+        
+        # Get context from message
         context = message.context or {}
         
         # Generate response using LangChain
         response = await handler.answer_question(
             message.message,
-            context.get("document_content", "No document loaded")
+            context.get("document_content", "No document loaded"),
+            chat_history=chat_history
         )
         
+        session_store.append_message(session, "user", message.message)
+        session_store.append_message(session, "assistant", response)
+        await run_in_threadpool(session_store.save, session)
+        
         return {
             "response": response,
-            "session_id": message.session_id or f"session_{int(time.time())}",
-            "suggestions": [
-                "¿Cuáles son las principales diferencias?",
-                "¿Qué recomiendas hacer?",
-                "Explica los cambios más importantes"
-            ]
+            "session_id": session["session_id"],
+            "suggestions": suggestions
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -307,20 +848,27 @@ async def chat(
 @app.post("/api/v1/analyze", tags=["Analysis"])
 async def analyze_pdf(
     pdf: UploadFile = File(...),
-    analysis_type: str = "summary"
+    analysis_type: str = "summary",
+    handler: LangChainHandler = Depends(get_langchain_handler),
+    store: DocumentStore = Depends(get_document_store)
 ):
     """Analyze a single PDF document"""
     try:
         if pdf.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="File must be a PDF")
         
-        content = pdf_processor.extract_text(pdf.file)
+        doc_id, content, _ = await run_in_threadpool(store.ingest, pdf.file, pdf_processor)
+        
+        # Index the document so it can be referenced from chat
+        await handler.get_document_index(text_of(content.text), doc_id)
         
         # TODO: Implement single PDF analysis
         return {
             "status": "success",
+            "document_id": doc_id,
             "pages": len(content.pages),
-            "structure": content.structure,
+            "ocr": content.metadata.get("ocr"),
+            "structure": content.structure.to_dict(),
             "message": "Single PDF analysis coming soon"
         }
         
@@ -328,24 +876,317 @@ async def analyze_pdf(
         logger.error(f"Error analyzing PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/results/{result_id}/diff", tags=["Analysis"])
+async def get_result_diff(result_id: str, offset: int = 0, limit: Optional[int] = None):
+    """Page through the full line diff of a comparison result"""
+    limit = limit or settings.diff_page_size
+    if offset < 0 or not 0 < limit <= 1000:
+        raise HTTPException(status_code=400, detail="offset must be >= 0 and limit between 1 and 1000")
+    
+    page = await run_in_threadpool(diff_store.page, result_id, offset, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Diff not found or expired: {result_id}")
+    return page
+
 # Helper functions
+async def run_analyses(
+    content1: PDFContent,
+    content2: PDFContent,
+    request: ComparisonRequest,
+    handler: LangChainHandler,
+    encoded1: Optional[Tuple] = None,
+    diff_id: Optional[str] = None,
+    stored_ids: Optional[Tuple[str, str]] = None,
+    store: Optional[DocumentStore] = None
+) -> Dict[str, Any]:
+    """Run the requested analyses over two extracted documents.
+    
+    CPU-bound analyzers run in the threadpool so several comparisons can
+    progress concurrently. ``encoded1`` lets callers reuse the chunks and
+    embeddings of the first document across comparisons. When ``diff_id``
+    is given the full basic diff is stored for ``/api/v1/results/{id}/diff``.
+    With ``stored_ids`` and ``store`` embeddings are read from (or saved to)
+    the document store.
+    """
+    results = {}
+    
+    # Align pages by fingerprint: only changed pages go through the analyzers
+    alignment = None
+    if request.incremental and content1.page_fingerprints and content2.page_fingerprints:
+        alignment = align_pages(content1.page_fingerprints, content2.page_fingerprints)
+        if not alignment.unchanged and not alignment.moved:
+            alignment = None
+    
+    # Basic analysis
+    if "basic" in request.analysis_types:
+        with analysis_duration.labels(analysis_type="basic").time():
+            if alignment:
+                results["basic"] = await run_in_threadpool(
+                    text_analyzer.incremental_comparison,
+                    content1.pages, content1.page_fingerprints,
+                    content2.pages, content2.page_fingerprints
+                )
+            else:
+                results["basic"] = await run_in_threadpool(
+                    text_analyzer.basic_comparison, text_of(content1.text), text_of(content2.text)
+                )
+            results["basic"] = await run_in_threadpool(
+                paginate_diff, results["basic"], content1.text, content2.text, diff_id
+            )
+    
+    # Fast word-shingle similarity (no character-level alignment)
+    if "fast" in request.analysis_types:
+        with analysis_duration.labels(analysis_type="fast").time():
+            results["fast"] = await run_in_threadpool(
+                text_analyzer.fast_comparison, text_of(content1.text), text_of(content2.text)
+            )
+    
+    # Semantic analysis
+    if "semantic" in request.analysis_types and settings.enable_semantic_analysis:
+        with analysis_duration.labels(analysis_type="semantic").time():
+            if alignment:
+                results["semantic"] = await run_in_threadpool(
+                    embedding_analyzer.incremental_semantic_comparison,
+                    content1.pages, content2.pages, alignment
+                )
+            else:
+                if stored_ids and store is not None:
+                    if encoded1 is None:
+                        encoded1 = await run_in_threadpool(
+                            encode_stored, store, stored_ids[0], content1
+                        )
+                    encoded2 = await run_in_threadpool(
+                        encode_stored, store, stored_ids[1], content2
+                    )
+                else:
+                    if encoded1 is None:
+                        encoded1 = await run_in_threadpool(embedding_analyzer.encode_document, text_of(content1.text))
+                    encoded2 = await run_in_threadpool(embedding_analyzer.encode_document, text_of(content2.text))
+                results["semantic"] = await run_in_threadpool(
+                    embedding_analyzer.compare_encoded, *encoded1, *encoded2
+                )
+    
+    # AI analysis with LangChain
+    if "ai" in request.analysis_types:
+        with analysis_duration.labels(analysis_type="ai").time():
+            doc_ids, persist = stored_ids, True
+            if alignment and alignment.changed:
+                # Focus the LLM on the pages that actually changed; these one-off
+                # excerpts are not worth keeping in the index store
+                text1, text2 = changed_texts(content1.pages, content2.pages, alignment)
+                doc_ids, persist = None, False
+            else:
+                text1, text2 = text_of(content1.text), text_of(content2.text)
+            results["ai"] = await handler.compare_documents_intelligent(
+                text1,
+                text2,
+                request.domain,
+                request.language,
+                doc_ids,
+                persist=persist
+            )
+    
+    # Structural analysis
+    if "structural" in request.analysis_types and settings.enable_structural_analysis:
+        with analysis_duration.labels(analysis_type="structural").time():
+            results["structural"] = text_analyzer.structural_similarity(
+                content1.structure,
+                content2.structure
+            )
+    
+    # Section-aware alignment and per-section diff
+    if "sections" in request.analysis_types and settings.enable_structural_analysis:
+        with analysis_duration.labels(analysis_type="sections").time():
+            results["sections"] = await run_in_threadpool(
+                text_analyzer.section_comparison,
+                content1.pages, content1.structure,
+                content2.pages, content2.structure
+            )
+    
+    # Table alignment and cell-level diff (requires table extraction)
+    if "tables" in request.analysis_types:
+        if not settings.table_extraction_enabled:
+            results["tables"] = {
+                "status": "disabled",
+                "detail": "Table extraction is disabled (set TABLE_EXTRACTION_ENABLED=true)"
+            }
+        else:
+            with analysis_duration.labels(analysis_type="tables").time():
+                results["tables"] = await run_in_threadpool(
+                    text_analyzer.table_comparison,
+                    content1.tables,
+                    content2.tables
+                )
+    
+    if alignment:
+        results["page_alignment"] = alignment.summary()
+    
+    return results
+
+async def finish_comparison(
+    request_id: str,
+    start_time: float,
+    background_tasks: BackgroundTasks,
+    request: ComparisonRequest,
+    handler: LangChainHandler,
+    store: DocumentStore,
+    document1: Tuple[str, PDFContent],
+    document2: Tuple[str, PDFContent]
+) -> FastJSONResponse:
+    """Run the analyses for two extracted documents and build the response"""
+    (stored_id1, content1), (stored_id2, content2) = document1, document2
+    
+    results = await run_analyses(
+        content1, content2, request, handler,
+        diff_id=request_id, stored_ids=(stored_id1, stored_id2), store=store
+    )
+    
+    execution_time = time.time() - start_time
+    
+    # Background task to cache results
+    if request.use_cache and settings.enable_caching:
+        background_tasks.add_task(cache_results, request_id, results)
+    
+    document_ids = [stored_id1, stored_id2]
+    
+    # Index documents for retrieval-augmented chat (already done by AI analysis)
+    if "ai" not in request.analysis_types:
+        background_tasks.add_task(handler.get_document_index, text_of(content1.text), stored_id1)
+        background_tasks.add_task(handler.get_document_index, text_of(content2.text), stored_id2)
+    
+    # Attach documents and result summary to the chat session
+    if request.session_id:
+        session = await run_in_threadpool(session_store.get_or_create, request.session_id)
+        session_store.add_documents(session, document_ids)
+        session["analysis_results"] = summarize_results(results)
+        await run_in_threadpool(session_store.save, session)
+    
+    # Returned directly so the results skip FastAPI's jsonable_encoder pass
+    response = ComparisonResponse(
+        request_id=request_id,
+        status="success",
+        results=results,
+        execution_time=execution_time,
+        metadata={
+            "pdf1_pages": len(content1.pages),
+            "pdf2_pages": len(content2.pages),
+            "document_ids": document_ids,
+            "ocr": [content1.metadata.get("ocr"), content2.metadata.get("ocr")],
+            "analysis_types": request.analysis_types,
+            "language": request.language,
+            "model": settings.vllm_model_name
+        }
+    )
+    return FastJSONResponse(response.dict())
+
+def encode_stored(store: DocumentStore, doc_id: str, content: PDFContent,
+                  source: Optional[str] = None) -> Tuple:
+    """Chunks and embeddings of a stored document.
+    
+    The first time a document is encoded its vector is added to the
+    similar-document index and its chunks to the corpus passage index
+    (unless it was deleted from them).
+    """
+    text = text_of(content.text)
+    chunks, embeddings = store.get_or_encode(doc_id, text, embedding_analyzer)
+    if not len(chunks):
+        return chunks, embeddings
+    index = get_document_vectors()
+    if doc_id not in index:
+        index.add(doc_id, document_vector(chunks, embeddings))
+    corpus = get_corpus_index()
+    if doc_id not in corpus and not corpus.is_excluded(doc_id):
+        corpus.add_document(
+            doc_id, chunks, embeddings,
+            spans=embedding_analyzer.chunker.spans(text),
+            pages=content.pages,
+            source=source
+        )
+    return chunks, embeddings
+
+async def ensure_document_indexes(handler: LangChainHandler, store: DocumentStore, document_ids: List[str]):
+    """Build the chat index of stored documents that were never indexed"""
+    for doc_id in document_ids:
+        if await run_in_threadpool(handler.vector_store.get, doc_id) is not None:
+            continue
+        content = await run_in_threadpool(store.load_current_content, doc_id, pdf_processor)
+        if content is None:
+            raise HTTPException(status_code=404, detail=f"Document not found: {doc_id}")
+        await handler.get_document_index(text_of(content.text), doc_id)
+
+def upload_size(upload: UploadFile) -> int:
+    """Size of an uploaded file without reading it into memory"""
+    upload.file.seek(0, io.SEEK_END)
+    size = upload.file.tell()
+    upload.file.seek(0)
+    return size
+
+def paginate_diff(basic: Dict[str, Any], text1: str, text2: str, diff_id: Optional[str]) -> Dict[str, Any]:
+    """Store the full diff server-side and keep only its first page of hunks"""
+    page_size = settings.diff_page_size
+    compact = basic["hunks"] if diff_id else basic["hunks"][:page_size]
+    hunks = render_hunks(text1.splitlines(), text2.splitlines(), compact)
+    if diff_id:
+        diff_store.save(diff_id, hunks)
+    
+    return {
+        **basic,
+        "diff_id": diff_id,
+        "hunks": hunks[:page_size],
+        "next_offset": page_size if basic["num_hunks"] > page_size else None
+    }
+
+def ranking_score(results: Dict[str, Any]) -> Optional[float]:
+    """Similarity used to rank batch candidates (semantic > basic > fast > structural)"""
+    if "semantic" in results:
+        return results["semantic"]["overall_similarity"]
+    if "basic" in results:
+        return results["basic"]["similarity_ratio"]
+    if "fast" in results:
+        return results["fast"]["jaccard"]
+    if "structural" in results:
+        return results["structural"]
+    return None
+
+def summarize_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only scalar metrics of each analysis for the chat session"""
+    summary = {}
+    for analysis_type, result in results.items():
+        if isinstance(result, dict):
+            summary[analysis_type] = {
+                k: v for k, v in result.items()
+                if isinstance(v, (int, float, str, bool))
+            }
+        elif isinstance(result, (int, float, str, bool)):
+            summary[analysis_type] = result
+    return summary
+
 async def cache_results(request_id: str, results: Dict[str, Any]):
-    """Cache analysis results in Redis"""
+    """Cache analysis results in Redis (orjson + compression)"""
     try:
         import redis.asyncio as redis
-        import json
         
+        payload = await run_in_threadpool(
+            pack, results, settings.cache_compression, settings.cache_compression_min_bytes
+        )
         r = redis.from_url(settings.redis_url)
         await r.setex(
             f"results:{request_id}",
             3600,  # 1 hour TTL
-            json.dumps(results)
+            payload
         )
         await r.close()
         logger.info(f"Cached results for {request_id}")
     except Exception as e:
         logger.error(f"Error caching results: {str(e)}")
 
+def preload():
+    """Load models in the gunicorn master so forked workers share them copy-on-write"""
+    global langchain_handler
+    if langchain_handler is None:
+        langchain_handler = LangChainHandler(settings.get_langchain_config())
+    logger.info("Models preloaded in master process")
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
@@ -357,9 +1198,10 @@ async def startup_event():
         logger.error("Invalid configuration, exiting")
         raise RuntimeError("Invalid configuration")
     
-    # Initialize LangChain handler
+    # Initialize LangChain handler (already loaded when preloaded by gunicorn)
     global langchain_handler
-    langchain_handler = LangChainHandler(settings.get_langchain_config())
+    if langchain_handler is None:
+        langchain_handler = LangChainHandler(settings.get_langchain_config())
     
     logger.info(f"API started successfully on {settings.host}:{settings.port}")
 
@@ -367,4 +1209,9 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
-    logger.info("Shutting down PDF Comparator AI API")
\ No newline at end of file
+    logger.info("Shutting down PDF Comparator AI API")
+    if corpus_index is not None:
+        corpus_index.close()
+    if pdf_processor.ocr is not None:
+        pdf_processor.ocr.close()
+    text_analyzer.close()
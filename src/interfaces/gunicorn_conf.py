@@ -0,0 +1,56 @@
+"""
+Configuración de gunicorn para producción
+
+La app se importa una sola vez en el proceso master (preload_app) junto con
+los modelos (EmbeddingAnalyzer, LangChainHandler); los workers uvicorn se
+crean con fork y comparten esas páginas copy-on-write.
+
+Uso:
+    gunicorn -c src/interfaces/gunicorn_conf.py src.interfaces.api_server:app
+"""
+
+import gc
+import os
+
+from src.utils.config import get_settings
+
+settings = get_settings()
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.workers
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = settings.worker_timeout_seconds
+graceful_timeout = 30
+keepalive = 5
+# Reciclar workers cada N peticiones (0 = nunca)
+max_requests = settings.worker_max_requests
+max_requests_jitter = settings.worker_max_requests // 10
+accesslog = "-"
+loglevel = settings.log_level.lower()
+
+
+def when_ready(server):
+    """Carga los modelos en el master antes de crear los workers"""
+    from src.interfaces import api_server
+    api_server.preload()
+
+
+def pre_fork(server, worker):
+    # Mueve los objetos del master a la generación permanente: el GC de los
+    # workers no los recorre y no ensucia (copia) las páginas compartidas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Repartir los núcleos entre workers en lugar de que cada uno use todos
+    # (salvo que EMBEDDING_NUM_THREADS fije el número de hilos)
+    threads = settings.embedding_num_threads or max(1, (os.cpu_count() or 1) // server.cfg.workers)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from src.core.embedding_batcher import set_inference_threads
+    set_inference_threads(threads)
+    server.log.info(f"Worker {worker.pid} forked from preloaded master")
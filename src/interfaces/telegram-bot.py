@@ -1,19 +1,43 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+import io
 import os
 from src.core.pdf_processor import PDFProcessor
+from src.core.ocr import create_ocr_engine
+from src.core.document_store import create_document_store
 from src.chatbot.conversation_manager import ConversationManager
+from src.chatbot.session_store import create_session_store
+from src.utils.config import get_settings
 
 class TelegramBot:
     def __init__(self, token: str):
         self.token = token
-        self.pdf_processor = PDFProcessor()
-        self.conversations = {}
+        settings = get_settings()
+        # Misma configuración de extracción que la API: comparten el almacén de documentos
+        self.pdf_processor = PDFProcessor(
+            create_ocr_engine(**settings.get_ocr_config()),
+            settings.ocr_min_chars,
+            extract_tables=settings.table_extraction_enabled
+        )
+        self.sessions = create_session_store(settings.session_backend, settings.redis_url)
+        self.documents = create_document_store(**settings.get_document_store_config())
+    
+    def _load_conversation(self, user_id: int) -> ConversationManager:
+        """Recupera la conversación del usuario desde el almacén de sesiones"""
+        session = self.sessions.get(f"telegram_{user_id}")
+        if session is None:
+            return ConversationManager()
+        return ConversationManager.from_session(session)
+    
+    def _save_conversation(self, user_id: int, conv: ConversationManager):
+        """Guarda la conversación del usuario en el almacén de sesiones"""
+        session = self.sessions.get_or_create(f"telegram_{user_id}")
+        self.sessions.save(conv.to_session(session))
     
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /start"""
         user_id = update.effective_user.id
-        self.conversations[user_id] = ConversationManager()
+        self._save_conversation(user_id, ConversationManager())
         
         keyboard = [
             [InlineKeyboardButton("📄 Comparar PDFs", callback_data='compare')],
@@ -52,30 +76,25 @@ class TelegramBot:
     async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Maneja documentos PDF enviados"""
         user_id = update.effective_user.id
-        
-        if user_id not in self.conversations:
-            self.conversations[user_id] = ConversationManager()
+        conv = self._load_conversation(user_id)
         
         document = update.message.document
         
         if document.mime_type == 'application/pdf':
             await update.message.reply_text("📥 Recibiendo PDF...")
             
-            # Descargar archivo
+            # Descargar en memoria y guardar en el almacén de documentos
             file = await context.bot.get_file(document.file_id)
-            file_path = f"temp_{user_id}_{document.file_name}"
-            await file.download_to_drive(file_path)
-            
-            # Procesar PDF
-            content = self.pdf_processor.extract_text(file_path)
+            buffer = io.BytesIO()
+            await file.download_to_memory(buffer)
+            buffer.seek(0)
             
-            # Agregar a la conversación
-            conv = self.conversations[user_id]
-            doc_id = f"doc{len(conv.documents) + 1}"
-            conv.add_document(doc_id, content)
+            # Procesar PDF (reutiliza la extracción si ya estaba almacenado)
+            stored_id, _, _ = self.documents.ingest(buffer, self.pdf_processor)
             
-            # Limpiar archivo temporal
-            os.remove(file_path)
+            # Agregar a la conversación (por id del almacén, el mismo que usa la API)
+            conv.add_document(f"doc{len(conv.documents) + 1}", stored_id)
+            self._save_conversation(user_id, conv)
             
             if len(conv.documents) < 2:
                 await update.message.reply_text(
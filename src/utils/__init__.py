@@ -29,6 +29,11 @@ def ensure_directories():
         settings.cache_dir,
         os.path.join(settings.cache_dir, "models"),
         os.path.join(settings.cache_dir, "embeddings"),
+        os.path.join(settings.cache_dir, "vector_indexes"),
+        settings.document_store_path,
+        settings.document_vectors_path,
+        settings.corpus_index_path,
+        settings.text_store_path,
     ]
     
     for directory in directories:
@@ -38,6 +38,29 @@ class Settings(BaseSettings):
     minio_bucket_name: str = Field("pdf-documents", env="MINIO_BUCKET_NAME")
     minio_secure: bool = Field(False, env="MINIO_SECURE")
     
+    # Document Store
+    document_store_backend: str = Field("minio", env="DOCUMENT_STORE_BACKEND")
+    document_store_path: str = Field("/app/cache/documents", env="DOCUMENT_STORE_PATH")
+    
+    # Extracted Text Store (texto de documentos grandes en disco, memory-mapped)
+    text_store_enabled: bool = Field(False, env="TEXT_STORE_ENABLED")
+    text_store_path: str = Field("/app/cache/text", env="TEXT_STORE_PATH")
+    text_store_min_pages: int = Field(200, env="TEXT_STORE_MIN_PAGES")
+    text_store_max_disk_mb: int = Field(4096, env="TEXT_STORE_MAX_DISK_MB")
+    
+    # Similar Document Search
+    document_vectors_path: str = Field("/app/cache/document_vectors", env="DOCUMENT_VECTORS_PATH")
+    similar_search_max_k: int = Field(100, env="SIMILAR_SEARCH_MAX_K")
+    
+    # Corpus Passage Index
+    corpus_index_path: str = Field("/app/cache/corpus_index", env="CORPUS_INDEX_PATH")
+    corpus_index_type: str = Field("hnsw", env="CORPUS_INDEX_TYPE")  # hnsw | ivf
+    corpus_index_hnsw_m: int = Field(32, env="CORPUS_INDEX_HNSW_M")
+    corpus_index_ef_search: int = Field(64, env="CORPUS_INDEX_EF_SEARCH")
+    corpus_index_nlist: int = Field(1024, env="CORPUS_INDEX_NLIST")
+    corpus_index_nprobe: int = Field(16, env="CORPUS_INDEX_NPROBE")
+    corpus_index_save_every: int = Field(1024, env="CORPUS_INDEX_SAVE_EVERY")
+    
     # Analysis Settings
     max_pdf_size_mb: int = Field(50, env="MAX_PDF_SIZE_MB")
     default_chunk_size: int = Field(1000, env="DEFAULT_CHUNK_SIZE")
@@ -45,14 +68,81 @@ class Settings(BaseSettings):
     similarity_threshold: float = Field(0.7, env="SIMILARITY_THRESHOLD")
     max_analysis_time_seconds: int = Field(300, env="MAX_ANALYSIS_TIME_SECONDS")
     supported_languages: list = Field(["es", "en", "pt"], env="SUPPORTED_LANGUAGES")
+    batch_max_candidates: int = Field(200, env="BATCH_MAX_CANDIDATES")
+    batch_max_concurrency: int = Field(4, env="BATCH_MAX_CONCURRENCY")
     
     # Feature Flags
     enable_caching: bool = Field(True, env="ENABLE_CACHING")
     enable_metrics: bool = Field(True, env="ENABLE_METRICS")
     enable_tracing: bool = Field(True, env="ENABLE_TRACING")
+    # Perfilado por petición con la cabecera X-Profile (solo para diagnóstico)
+    enable_profiling: bool = Field(False, env="ENABLE_PROFILING")
     enable_semantic_analysis: bool = Field(True, env="ENABLE_SEMANTIC_ANALYSIS")
     enable_structural_analysis: bool = Field(True, env="ENABLE_STRUCTURAL_ANALYSIS")
     
+    # Corpus Deduplication
+    dedup_db_path: str = Field("/app/cache/corpus_signatures.db", env="DEDUP_DB_PATH")
+    dedup_threshold: float = Field(0.8, env="DEDUP_THRESHOLD")
+    dedup_num_perm: int = Field(128, env="DEDUP_NUM_PERM")
+    dedup_bands: int = Field(16, env="DEDUP_BANDS")
+    
+    # Chat Sessions
+    session_backend: str = Field("redis", env="SESSION_BACKEND")
+    
+    # Chat Retrieval
+    chat_top_k: int = Field(4, env="CHAT_TOP_K")
+    chat_max_context_tokens: int = Field(1500, env="CHAT_MAX_CONTEXT_TOKENS")
+    
+    # AI Comparison
+    unique_sections_max: int = Field(20, env="UNIQUE_SECTIONS_MAX")
+    
+    # Embedding Batching
+    embedding_batch_max_size: int = Field(64, env="EMBEDDING_BATCH_MAX_SIZE")
+    embedding_batch_max_wait_ms: float = Field(5.0, env="EMBEDDING_BATCH_MAX_WAIT_MS")
+    embedding_batch_timeout: float = Field(120.0, env="EMBEDDING_BATCH_TIMEOUT")
+    
+    # Embedding Inference Backend
+    embedding_backend: str = Field("torch", env="EMBEDDING_BACKEND")  # torch | onnx
+    embedding_onnx_quantize: bool = Field(False, env="EMBEDDING_ONNX_QUANTIZE")
+    embedding_onnx_min_cosine: float = Field(0.98, env="EMBEDDING_ONNX_MIN_COSINE")
+    embedding_num_threads: int = Field(0, env="EMBEDDING_NUM_THREADS")
+    
+    # Embedding Chunking
+    embedding_chunk_max_tokens: int = Field(0, env="EMBEDDING_CHUNK_MAX_TOKENS")  # 0 = longitud máxima del modelo
+    embedding_chunk_overlap_tokens: int = Field(32, env="EMBEDDING_CHUNK_OVERLAP_TOKENS")
+    embedding_cache_entries: int = Field(64, env="EMBEDDING_CACHE_ENTRIES")
+    
+    # Vector Index Store
+    vector_index_max_disk_mb: int = Field(2048, env="VECTOR_INDEX_MAX_DISK_MB")
+    
+    # LLM Response Cache
+    llm_cache_enabled: bool = Field(True, env="LLM_CACHE_ENABLED")
+    llm_cache_max_entries: int = Field(512, env="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_ttl_seconds: int = Field(86400, env="LLM_CACHE_TTL_SECONDS")
+    llm_semantic_cache_enabled: bool = Field(False, env="LLM_SEMANTIC_CACHE_ENABLED")
+    llm_semantic_cache_threshold: float = Field(0.95, env="LLM_SEMANTIC_CACHE_THRESHOLD")
+    
+    # Result Diffs
+    diff_page_size: int = Field(50, env="DIFF_PAGE_SIZE")
+    diff_ttl_seconds: int = Field(3600, env="DIFF_TTL_SECONDS")
+    
+    # OCR (páginas escaneadas)
+    ocr_enabled: bool = Field(True, env="OCR_ENABLED")
+    ocr_workers: int = Field(2, env="OCR_WORKERS")
+    ocr_language: str = Field("spa+eng", env="OCR_LANGUAGE")
+    ocr_dpi: int = Field(300, env="OCR_DPI")
+    ocr_min_chars: int = Field(20, env="OCR_MIN_CHARS")
+    ocr_timeout_seconds: float = Field(120.0, env="OCR_TIMEOUT_SECONDS")
+    ocr_tesseract_cmd: str = Field("tesseract", env="OCR_TESSERACT_CMD")
+    ocr_tesseract_config: str = Field("", env="OCR_TESSERACT_CONFIG")
+    
+    # Tablas (detección opcional: tiene coste por página)
+    table_extraction_enabled: bool = Field(False, env="TABLE_EXTRACTION_ENABLED")
+    
+    # Cache Serialization
+    cache_compression: str = Field("zstd", env="CACHE_COMPRESSION")
+    cache_compression_min_bytes: int = Field(1024, env="CACHE_COMPRESSION_MIN_BYTES")
+    
     # Monitoring
     metrics_port: int = Field(9090, env="METRICS_PORT")
     
@@ -64,6 +154,8 @@ class Settings(BaseSettings):
     host: str = Field("0.0.0.0", env="HOST")
     port: int = Field(8000, env="PORT")
     workers: int = Field(1, env="WORKERS")
+    worker_max_requests: int = Field(0, env="WORKER_MAX_REQUESTS")
+    worker_timeout_seconds: int = Field(330, env="WORKER_TIMEOUT_SECONDS")
     
     class Config:
         env_file = ".env"
@@ -174,13 +266,89 @@ Config = get_settings() v.split(",")
             "embeddings": {
                 "model_name": "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
                 "cache_folder": self.cache_dir,
+                "batch_max_size": self.embedding_batch_max_size,
+                "batch_max_wait_ms": self.embedding_batch_max_wait_ms,
+                "batch_timeout": self.embedding_batch_timeout,
+                "backend": self.embedding_backend,
+                "num_threads": self.embedding_num_threads,
+                "onnx_dir": os.path.join(self.cache_dir, "onnx"),
+                "onnx_quantize": self.embedding_onnx_quantize,
+                "onnx_min_cosine": self.embedding_onnx_min_cosine,
+                "chunk_max_tokens": self.embedding_chunk_max_tokens,
+                "chunk_overlap_tokens": self.embedding_chunk_overlap_tokens,
+                "cache_entries": self.embedding_cache_entries,
             },
             "text_splitter": {
                 "chunk_size": self.default_chunk_size,
                 "chunk_overlap": self.chunk_overlap,
+            },
+            "chat": {
+                "top_k": self.chat_top_k,
+                "max_context_tokens": self.chat_max_context_tokens,
+            },
+            "comparison": {
+                "max_unique_sections": self.unique_sections_max,
+            },
+            "vector_store": {
+                "index_dir": os.path.join(self.cache_dir, "vector_indexes"),
+                "max_disk_mb": self.vector_index_max_disk_mb,
+            },
+            "cache": {
+                "enabled": self.enable_caching and self.llm_cache_enabled,
+                "max_entries": self.llm_cache_max_entries,
+                "ttl_seconds": self.llm_cache_ttl_seconds,
+                "redis_url": self.redis_url,
+                "semantic_enabled": self.llm_semantic_cache_enabled,
+                "semantic_threshold": self.llm_semantic_cache_threshold,
             }
         }
     
+    def get_dedup_config(self) -> Dict[str, Any]:
+        """Configuración del índice de casi duplicados"""
+        return {
+            "db_path": self.dedup_db_path,
+            "num_perm": self.dedup_num_perm,
+            "bands": self.dedup_bands,
+            "threshold": self.dedup_threshold,
+        }
+    
+    def get_ocr_config(self) -> Dict[str, Any]:
+        """Configuración del OCR de páginas escaneadas (Tesseract)"""
+        return {
+            "enabled": self.ocr_enabled,
+            "command": self.ocr_tesseract_cmd,
+            "config": self.ocr_tesseract_config,
+            "cache_dir": os.path.join(self.cache_dir, "ocr"),
+            "workers": self.ocr_workers,
+            "language": self.ocr_language,
+            "dpi": self.ocr_dpi,
+            "timeout_seconds": self.ocr_timeout_seconds,
+        }
+    
+    def get_corpus_index_config(self) -> Dict[str, Any]:
+        """Configuración del índice de pasajes del corpus (FAISS + SQLite)"""
+        return {
+            "path": self.corpus_index_path,
+            "index_type": self.corpus_index_type,
+            "hnsw_m": self.corpus_index_hnsw_m,
+            "ef_search": self.corpus_index_ef_search,
+            "nlist": self.corpus_index_nlist,
+            "nprobe": self.corpus_index_nprobe,
+            "save_every": self.corpus_index_save_every,
+        }
+    
+    def get_document_store_config(self) -> Dict[str, Any]:
+        """Configuración del almacén de documentos (MinIO o sistema de ficheros)"""
+        return {
+            "backend": self.document_store_backend,
+            "local_path": self.document_store_path,
+            "endpoint": self.minio_endpoint,
+            "access_key": self.minio_access_key,
+            "secret_key": self.minio_secret_key,
+            "bucket": self.minio_bucket_name,
+            "secure": self.minio_secure,
+        }
+    
     def validate_config(self) -> bool:
         """Valida la configuración esencial"""
         try:
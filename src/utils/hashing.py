@@ -0,0 +1,15 @@
+"""
+Funciones de hash de contenido para identificar documentos
+"""
+
+from typing import Union
+import hashlib
+
+
+def content_hash(data: Union[str, bytes]) -> str:
+    """Hash SHA-256 (hex) de un texto o bloque de bytes"""
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        # str o texto mapeado en disco (MappedText)
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
@@ -10,6 +10,8 @@ import pandas as pd
 from docx import Document
 from docx.shared import Inches, Pt
 
+from .tracing import span
+
 class ReportGenerator:
     def __init__(self):
         self.styles = getSampleStyleSheet()
@@ -18,14 +20,15 @@ class ReportGenerator:
                 include_options: Dict, format: str) -> bytes:
         """Genera reporte en el formato especificado"""
         
-        if format == "PDF":
-            return self._generate_pdf(results, report_type, include_options)
-        elif format == "HTML":
-            return self._generate_html(results, report_type, include_options)
-        elif format == "DOCX":
-            return self._generate_docx(results, report_type, include_options)
-        elif format == "JSON":
-            return self._generate_json(results, report_type, include_options)
+        with span("report.generate", format=format):
+            if format == "PDF":
+                return self._generate_pdf(results, report_type, include_options)
+            elif format == "HTML":
+                return self._generate_html(results, report_type, include_options)
+            elif format == "DOCX":
+                return self._generate_docx(results, report_type, include_options)
+            elif format == "JSON":
+                return self._generate_json(results, report_type, include_options)
     
     def _generate_pdf(self, results: Dict, report_type: str, options: Dict) -> bytes:
         """Genera reporte PDF"""
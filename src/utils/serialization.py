@@ -0,0 +1,128 @@
+"""
+Serialización JSON rápida (orjson, con soporte de numpy) y compresión de payloads de caché
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import dataclasses
+import json
+import logging
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: no cover - dependencia opcional
+    lz4_frame = None
+
+
+def _default(obj: Any) -> Any:
+    """Tipos que orjson/json no serializan de forma nativa"""
+    if isinstance(obj, tuple) and hasattr(obj, "_asdict"):
+        # namedtuple (p. ej. difflib.Match) como lista, igual que json
+        return list(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "dict") and callable(obj.dict):
+        # Modelos pydantic
+        return obj.dict()
+    if hasattr(obj, "tolist"):
+        # Tensores de torch
+        return obj.tolist()
+    return str(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serializa a JSON (bytes UTF-8)"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def loads(data) -> Any:
+        return orjson.loads(data)
+else:
+    def dumps(obj: Any) -> bytes:
+        """Serializa a JSON (bytes UTF-8)"""
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data) -> Any:
+        return json.loads(data)
+
+
+# Prefijo de un byte que identifica el códec del payload
+CODEC_NONE = b"\x00"
+CODEC_ZLIB = b"\x01"
+CODEC_LZ4 = b"\x02"
+CODEC_ZSTD = b"\x03"
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(data)
+
+
+def _zstd_decompress(data: bytes) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+_CODECS: Dict[bytes, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    CODEC_NONE: (lambda data: data, lambda data: data),
+    CODEC_ZLIB: (lambda data: zlib.compress(data, 1), zlib.decompress),
+}
+if lz4_frame is not None:
+    _CODECS[CODEC_LZ4] = (lz4_frame.compress, lz4_frame.decompress)
+if zstandard is not None:
+    _CODECS[CODEC_ZSTD] = (_zstd_compress, _zstd_decompress)
+
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "lz4": CODEC_LZ4, "zstd": CODEC_ZSTD}
+
+
+def resolve_codec(name: str) -> bytes:
+    """Códec pedido, o el mejor disponible si su librería no está instalada"""
+    codec = CODEC_NAMES.get(name, CODEC_ZSTD)
+    for candidate in (codec, CODEC_ZSTD, CODEC_LZ4, CODEC_ZLIB):
+        if candidate in _CODECS:
+            return candidate
+    return CODEC_ZLIB
+
+
+def compress(data: bytes, codec: str = "zstd", min_size: int = 1024) -> bytes:
+    """Comprime con prefijo de códec; los payloads pequeños se guardan sin comprimir"""
+    prefix = CODEC_NONE if len(data) < min_size else resolve_codec(codec)
+    return prefix + _CODECS[prefix][0](data)
+
+
+def decompress(payload: bytes) -> bytes:
+    prefix, data = payload[:1], payload[1:]
+    if prefix not in _CODECS:
+        raise ValueError(f"Unknown or unavailable compression codec: {prefix!r}")
+    return _CODECS[prefix][1](data)
+
+
+def pack(obj: Any, codec: str = "zstd", min_size: int = 1024) -> bytes:
+    """Serializa y comprime un objeto para guardarlo en caché"""
+    return compress(dumps(obj), codec, min_size)
+
+
+def unpack(payload: Optional[bytes]) -> Any:
+    if payload is None:
+        return None
+    return loads(decompress(payload))
@@ -0,0 +1,226 @@
+"""
+Trazas por etapa del pipeline de comparación y perfilado opcional por petición
+
+``span("pdf.extract")`` mide una etapa: observa el histograma de Prometheus
+``pdf_comparator_stage_duration_seconds{stage=...}``, abre un span de
+OpenTelemetry si la API está instalada (el exportador lo configura el
+despliegue, p. ej. con ``opentelemetry-instrument``) y lo anota en la traza de
+la petición en curso, que la API resume en la cabecera ``Server-Timing``.
+Con ENABLE_TRACING=false los spans no hacen nada.
+
+El perfilado (cabecera ``X-Profile``) usa cProfile o, si está instalado,
+pyinstrument. cProfile solo ve el hilo que lo activa (el del event loop); el
+trabajo que va al threadpool se perfila abriendo un perfil propio en cada span
+de primer nivel de otro hilo, y al final se suman todos.
+"""
+
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import cProfile
+import functools
+import inspect
+import io
+import logging
+import pstats
+import threading
+import time
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - dependencia opcional
+    otel_trace = None
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - dependencia opcional
+    pyinstrument = None
+
+stage_duration = Histogram(
+    'pdf_comparator_stage_duration_seconds',
+    'Duration of each comparison pipeline stage',
+    ['stage'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+_enabled = True
+_tracer = None
+_local = threading.local()
+
+
+class RequestTrace:
+    """Spans de una petición (y perfiles de cProfile de otros hilos si se está perfilando)"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.profiles: List[cProfile.Profile] = []
+        # Hilo con el perfil principal de cProfile (None si no se perfila con cProfile)
+        self.profile_thread: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, seconds: float, attributes: Dict[str, Any]):
+        with self._lock:
+            self.spans.append({
+                "stage": name,
+                "start_ms": round((start - self.start) * 1000, 3),
+                "duration_ms": round(seconds * 1000, 3),
+                "thread": threading.current_thread().name,
+                **({"attributes": attributes} if attributes else {})
+            })
+
+    def add_profile(self, profile: cProfile.Profile):
+        with self._lock:
+            self.profiles.append(profile)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Tiempo total y número de spans por etapa"""
+        stages: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for item in self.spans:
+                stage = stages.setdefault(item["stage"], {"count": 0, "total_ms": 0.0})
+                stage["count"] += 1
+                stage["total_ms"] = round(stage["total_ms"] + item["duration_ms"], 3)
+        return stages
+
+    def server_timing(self) -> str:
+        """Valor de la cabecera Server-Timing (una métrica por etapa)"""
+        return ", ".join(
+            f"{name};dur={stage['total_ms']}" for name, stage in self.summary().items()
+        )
+
+
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def configure_tracing(enabled: bool = True, service_name: str = "pdf-comparator"):
+    """Activa o desactiva los spans (Settings.enable_tracing)"""
+    global _enabled, _tracer
+    _enabled = enabled
+    _tracer = otel_trace.get_tracer(service_name) if enabled and otel_trace is not None else None
+
+
+def tracing_enabled() -> bool:
+    return _enabled
+
+
+def start_request_trace() -> Token:
+    """Traza nueva para la petición en curso; devuelve el token para restaurar el contexto"""
+    return _current.set(RequestTrace())
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+def end_request_trace(token: Token):
+    _current.reset(token)
+
+
+def _start_thread_profile(trace: Optional[RequestTrace]) -> Optional[cProfile.Profile]:
+    """Perfil propio para un span de primer nivel fuera del hilo del perfil principal"""
+    if trace is None or trace.profile_thread is None:
+        return None
+    if trace.profile_thread == threading.get_ident() or getattr(_local, "profile", None) is not None:
+        return None
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+: un único perfilador activo por intérprete
+        return None
+    _local.profile = profile
+    return profile
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Mide una etapa (Prometheus, OpenTelemetry y traza de la petición)"""
+    if not _enabled:
+        yield
+        return
+    trace = _current.get()
+    profile = _start_thread_profile(trace)
+    otel_span = _tracer.start_as_current_span(name, attributes=attributes) if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    try:
+        with otel_span:
+            yield
+    finally:
+        seconds = time.perf_counter() - start
+        stage_duration.labels(stage=name).observe(seconds)
+        if trace is not None:
+            trace.add(name, start, seconds, attributes)
+        if profile is not None:
+            profile.disable()
+            _local.profile = None
+            trace.add_profile(profile)
+
+
+def traced(name: str) -> Callable:
+    """Decorador: cada llamada a la función (síncrona o async) es un span"""
+    def decorator(fn: Callable) -> Callable:
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RequestProfiler:
+    """Perfil de una petición con cProfile (por defecto) o pyinstrument"""
+
+    MODES = ("cprofile", "pyinstrument")
+
+    def __init__(self, mode: str = "cprofile", trace: Optional[RequestTrace] = None, limit: int = 40):
+        if mode not in self.MODES:
+            mode = "cprofile"
+        if mode == "pyinstrument" and pyinstrument is None:
+            logger.warning("pyinstrument not installed, profiling with cProfile")
+            mode = "cprofile"
+        self.mode = mode
+        self.trace = trace
+        self.limit = limit
+        self._profiler = None
+
+    def start(self):
+        if self.mode == "pyinstrument":
+            self._profiler = pyinstrument.Profiler(async_mode="enabled")
+            self._profiler.start()
+            return
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        if self.trace is not None:
+            self.trace.profile_thread = threading.get_ident()
+
+    def stop(self) -> Dict[str, Any]:
+        """Detiene el perfil y devuelve el informe en texto"""
+        if self.mode == "pyinstrument":
+            self._profiler.stop()
+            return {"profiler": self.mode, "report": self._profiler.output_text(unicode=True, color=False)}
+
+        self._profiler.disable()
+        if self.trace is not None:
+            self.trace.profile_thread = None
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        for profile in (self.trace.profiles if self.trace is not None else []):
+            stats.add(profile)
+        stats.sort_stats("cumulative").print_stats(self.limit)
+        return {
+            "profiler": self.mode,
+            "threads_profiled": 1 + (len(self.trace.profiles) if self.trace is not None else 0),
+            "report": stream.getvalue()
+        }